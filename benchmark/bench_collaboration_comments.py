@@ -0,0 +1,77 @@
+"""
+协作笔记评论基准测试: 在有大量评论的合成协作笔记上, 对比每次查找子评论都遍历全部评论和预先按 groupId 分组的耗时.
+
+运行: python -m benchmark.bench_collaboration_comments [--blocks 2000] [--comments 5000] [--group-size 5]
+"""
+import argparse
+import json
+import logging
+import time
+from unittest.mock import patch
+
+from log import log
+from sync.collaboration_note_parser import CollaborationNoteParser, MarkdownConverter, TextStrategy
+
+
+class LegacyTextStrategy(TextStrategy):
+    # 之前的实现: 每个带评论的文本都遍历全部评论
+    def get_sub_comments(self, group_id, main_comment_id):
+        sub_comments = []
+        for comment_id, comment_data in self.data.get('comments', {}).items():
+            if comment_data.get('groupId') == group_id and comment_id != main_comment_id:
+                sub_comments.append(self.format_comment(comment_data))
+        return sub_comments
+
+
+def make_document(blocks, comments, group_size):
+    """
+    生成协作笔记: 每个 block 一段文本, 每组评论的第一条挂在一个 block 上
+    """
+    data = {'blocks': [], 'comments': {}}
+    for i in range(comments):
+        group = i // group_size
+        data['comments'][f'c{i}'] = {
+            'groupId': f'g{group}', 'displayName': f'user{i % 7}', 'created': 1700000000000 + i * 1000,
+            'blocks': [{'text': [{'insert': f'comment {i}'}]}],
+        }
+    groups = (comments + group_size - 1) // group_size
+    for i in range(blocks):
+        text = [{'insert': f'paragraph {i} '}]
+        if i < groups:
+            text.append({'insert': 'commented', 'attributes': {f'comment-c{i * group_size}': f'c{i * group_size}'}})
+        data['blocks'].append({'type': 'text', 'text': text})
+    return json.dumps({'data': {'data': data}})
+
+
+def run(content, legacy):
+    parser = CollaborationNoteParser()
+    strategy_map = dict(MarkdownConverter.STRATEGY_MAP, text=LegacyTextStrategy) if legacy else MarkdownConverter.STRATEGY_MAP
+    with patch.dict(MarkdownConverter.STRATEGY_MAP, strategy_map):
+        start = time.perf_counter()
+        output = parser.parse(content)
+        return time.perf_counter() - start, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description='协作笔记评论基准测试')
+    parser.add_argument('--blocks', type=int, default=2000)
+    parser.add_argument('--comments', type=int, default=5000)
+    parser.add_argument('--group-size', type=int, default=5, help='每组评论数')
+    args = parser.parse_args()
+
+    # 避免日志影响计时
+    log.setLevel(logging.WARNING)
+
+    content = make_document(args.blocks, args.comments, args.group_size)
+    legacy_elapsed, legacy_output = run(content, legacy=True)
+    grouped_elapsed, grouped_output = run(content, legacy=False)
+    assert legacy_output == grouped_output
+
+    print(f'blocks={args.blocks}, comments={args.comments}, group size={args.group_size}')
+    print(f'{"implementation":<20}{"elapsed(ms)":>12}')
+    print(f'{"scan all comments":<20}{legacy_elapsed * 1000:>12.1f}')
+    print(f'{"grouped by groupId":<20}{grouped_elapsed * 1000:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
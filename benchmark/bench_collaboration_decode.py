@@ -0,0 +1,112 @@
+"""
+大协作笔记解析基准测试: 对比一次 json.loads 整篇文档和逐个 block 解析转换的耗时、内存峰值, 以及原始内容写入日志的字符数.
+fetch 列在逐个 block 解析之前加上编辑器会话读取 f 响应: 整条消息 json.loads 后匹配, 对比只读取顶层的 a / d / error.
+
+运行: python -m benchmark.bench_collaboration_decode [--blocks 2000,5000,20000]
+"""
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+
+from benchmark.bench_collaboration_render import make_document
+from log import log, payload_summary
+from sync.collaboration_editor_session import CollaborationEditorSession
+from sync.collaboration_note_parser import CollaborationNoteParser, DocumentRenderer
+
+
+def full_decode(origin_content):
+    data = json.loads(origin_content)['data']['data']
+    return DocumentRenderer(data).render(data["blocks"])
+
+
+class _ReplayWebSocket:
+    """
+    依次返回准备好的消息, 代替编辑器的连接
+    """
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.idx = 0
+
+    def settimeout(self, timeout):
+        pass
+
+    def recv(self):
+        message = self.messages[self.idx % len(self.messages)]
+        self.idx += 1
+        return message
+
+
+class _ReplayConnection:
+
+    def __init__(self, messages):
+        self.ws = _ReplayWebSocket(messages)
+
+
+class _FullDecodeSession(CollaborationEditorSession):
+    """
+    匹配 f 响应前把整条消息 json.loads 的会话
+    """
+    read_header = staticmethod(json.loads)
+
+
+def fetch_and_parse(session_class, parse):
+    session = session_class.__new__(session_class)
+
+    def run(frame):
+        conn = _ReplayConnection(['{"a": "p", "d": "doc"}', frame])
+        content = session._recv_until(conn, time.monotonic() + 60,
+                                      lambda msg: msg.get('a') == 'f' and msg.get('d') == 'doc', raw=True)
+        return parse(content)
+
+    return run
+
+
+def measure(parse, origin_content):
+    """
+    :return: (耗时毫秒, 内存峰值 MB, 输出)
+    """
+    start = time.perf_counter()
+    output = parse(origin_content)
+    elapsed = time.perf_counter() - start
+    # 内存峰值单独测量, tracemalloc 会拖慢解析
+    tracemalloc.start()
+    parse(origin_content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 1024 / 1024, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description='大协作笔记解析基准测试')
+    parser.add_argument('--blocks', default='2000,5000,20000', help='文档的 block 数, 逗号分隔')
+    parser.add_argument('--snapshots', type=int, default=0)
+    args = parser.parse_args()
+
+    # 避免日志影响计时
+    log.setLevel(logging.WARNING)
+
+    print(f'{"blocks":>8}{"payload MB":>12}{"log chars":>12}{"full ms":>10}{"full MB":>10}{"incr ms":>10}{"incr MB":>10}'
+          f'{"loads+incr ms":>15}{"loads+incr MB":>15}{"scan+incr ms":>15}{"scan+incr MB":>15}')
+    for blocks in (int(item) for item in args.blocks.split(',')):
+        origin_content = make_document(blocks, args.snapshots, 20, 20)
+        full_ms, full_mb, full_output = measure(full_decode, origin_content)
+        incremental_ms, incremental_mb, incremental_output = measure(CollaborationNoteParser._parse_incremental,
+                                                                     origin_content)
+        assert full_output == incremental_output
+        # 编辑器的 f 响应: data 之后是 a / c / d
+        frame = origin_content[:origin_content.rindex('}')] + ', "a": "f", "c": "kb", "d": "doc"}'
+        loads_ms, loads_mb, loads_output = measure(
+            fetch_and_parse(_FullDecodeSession, CollaborationNoteParser._parse_incremental), frame)
+        scan_ms, scan_mb, scan_output = measure(
+            fetch_and_parse(CollaborationEditorSession, CollaborationNoteParser._parse_incremental), frame)
+        assert loads_output == scan_output == full_output
+        print(f'{blocks:>8}{len(origin_content) / 1024 / 1024:>12.1f}{len(payload_summary(origin_content)):>12}'
+              f'{full_ms:>10.0f}{full_mb:>10.1f}{incremental_ms:>10.0f}{incremental_mb:>10.1f}'
+              f'{loads_ms:>15.0f}{loads_mb:>15.1f}{scan_ms:>15.0f}{scan_mb:>15.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+协作笔记转换基准测试: 在有大量表格和快照的合成协作笔记上, 对比之前逐个 block 创建策略对象的转换和 DocumentRenderer 的耗时.
+
+运行: python -m benchmark.bench_collaboration_render [--blocks 20000] [--snapshots 500] [--distinct-snapshots 20]
+"""
+import argparse
+import json
+import logging
+import time
+
+from log import log
+from sync.collaboration_note_parser import DocumentRenderer, EmbedStrategy, MarkdownConverter, TableStrategy
+
+
+class LegacyTableStrategy(TableStrategy):
+    # 之前的实现: 用 += 拼接表格
+    def to_text(self, row):
+        cols = row["cols"]
+        children_text = []
+        for child_id in row["children"]:
+            text_ = self.data[child_id][0]["text"][0]['insert'] if self.data[child_id][0]["text"] else ''
+            children_text.append(text_)
+        headers = children_text[:cols]
+        body = children_text[cols:]
+
+        markdown_table = "|".join(headers)
+        markdown_table = "|" + markdown_table + "|\n"
+        markdown_table += "| " + " | ".join(["-----"] * cols) + " |\n"
+        body_rows = [body[i:i + cols] for i in range(0, len(body), cols)]
+        for body_row in body_rows:
+            markdown_table += "|" + "|".join(body_row) + "|\n"
+        return '\n' + markdown_table + '\n'
+
+
+class LegacyEmbedStrategy(EmbedStrategy):
+    # 之前的实现: 快照每次出现都重新解析
+    def handle_snapshot(self, embed_data):
+        doc_content = embed_data.get("doc", "")
+        if not doc_content:
+            return self.SNAPSHOT_EMPTY
+        try:
+            return self.quote_snapshot(legacy_render(json.loads(doc_content)))
+        except (json.JSONDecodeError, KeyError) as e:
+            log.error(f"解析snapshot嵌入内容失败: {e}")
+            return self.SNAPSHOT_FAILED
+
+
+LEGACY_STRATEGY_MAP = dict(MarkdownConverter.STRATEGY_MAP, table=LegacyTableStrategy, embed=LegacyEmbedStrategy)
+
+
+def legacy_render(data):
+    # 之前 CollaborationNoteParser.parse 的实现: 每个 block 创建一个策略对象
+    comment_groups = MarkdownConverter.group_comments(data)
+    return ''.join(LEGACY_STRATEGY_MAP[block_row["type"]](data, comment_groups, None).to_text(block_row)
+                   for block_row in data.get("blocks", []))
+
+
+def make_blocks(data, prefix, count, table_rows):
+    blocks = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            blocks.append({'type': 'text', 'text': [{'insert': f'{prefix} paragraph {i} '},
+                                                    {'insert': 'bold', 'attributes': {'style-bold': True}}]})
+        elif kind == 1:
+            blocks.append({'type': 'list', 'level': 1, 'text': [{'insert': f'{prefix} item {i}'}]})
+        elif kind == 2:
+            cols = 4
+            children = []
+            for cell in range(cols * (table_rows + 1)):
+                cell_id = f'{prefix}-t{i}-{cell}'
+                data[cell_id] = [{'text': [{'insert': f'cell {cell}'}] if cell % 7 else []}]
+                children.append(cell_id)
+            blocks.append({'type': 'table', 'cols': cols, 'rows': table_rows + 1, 'children': children})
+        else:
+            code_id = f'{prefix}-c{i}'
+            data[code_id] = [{'text': [{'insert': f'print({n})'}]} for n in range(5)]
+            blocks.append({'type': 'code', 'language': 'python', 'children': [code_id]})
+    return blocks
+
+
+def make_snapshot(seed, blocks, table_rows):
+    doc = {'comments': {}}
+    doc['blocks'] = make_blocks(doc, f's{seed}', blocks, table_rows)
+    return json.dumps(doc)
+
+
+def make_document(blocks, snapshots, distinct_snapshots, table_rows):
+    """
+    生成协作笔记: 文本、列表、表格、代码块交替, 再均匀插入快照, 快照 doc 在 distinct_snapshots 个之间重复
+    """
+    data = {'comments': {}}
+    data['blocks'] = make_blocks(data, 'd', blocks, table_rows)
+    docs = [make_snapshot(i, 40, table_rows) for i in range(max(1, distinct_snapshots))]
+    step = max(1, blocks // max(1, snapshots))
+    for i in range(snapshots):
+        snapshot = {'type': 'embed', 'embedType': 'snapshot', 'embedData': {'doc': docs[i % len(docs)]}}
+        data['blocks'].insert(min(i * step + i, len(data['blocks'])), snapshot)
+    return json.dumps({'data': {'data': data}})
+
+
+def timed(func, data, repeat):
+    """
+    :return: (最短耗时, 输出)
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def render(data):
+    return DocumentRenderer(data).render(data["blocks"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='协作笔记转换基准测试')
+    parser.add_argument('--blocks', type=int, default=20000)
+    parser.add_argument('--table-rows', type=int, default=20, help='每个表格的行数')
+    parser.add_argument('--snapshots', type=int, default=500)
+    parser.add_argument('--distinct-snapshots', type=int, default=20, help='不同快照 doc 的数量')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数, 取最短耗时')
+    args = parser.parse_args()
+
+    # 避免日志影响计时
+    log.setLevel(logging.WARNING)
+
+    content = make_document(args.blocks, args.snapshots, args.distinct_snapshots, args.table_rows)
+    data = json.loads(content)['data']['data']
+    legacy_elapsed, legacy_output = timed(legacy_render, data, args.repeat)
+    renderer_elapsed, renderer_output = timed(render, data, args.repeat)
+    assert legacy_output == renderer_output
+
+    print(f'blocks={args.blocks}, table rows={args.table_rows}, snapshots={args.snapshots}, '
+          f'distinct snapshots={args.distinct_snapshots}, output={len(renderer_output) // 1024}KB')
+    print(f'{"implementation":<24}{"elapsed(ms)":>12}')
+    print(f'{"strategy per block":<24}{legacy_elapsed * 1000:>12.1f}')
+    print(f'{"DocumentRenderer":<24}{renderer_elapsed * 1000:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
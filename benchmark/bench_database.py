@@ -0,0 +1,67 @@
+"""
+数据库写入基准测试: 在 10k 篇笔记的合成数据库上, 对比默认模式和性能模式下同步状态的写入速度.
+
+运行: python -m benchmark.bench_database [--notes 10000] [--images 2]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from log import log
+from sync.database import Database
+
+
+def _wiz_note(i):
+    return {'docGuid': f'doc{i}', 'type': 'document', 'title': f'note {i}', 'category': '/bench/',
+            'created': 0, 'accessed': i, 'url': '', 'version': i}
+
+
+def run(performance_mode, notes, images):
+    """
+    按同步一篇笔记的写入顺序写入每篇笔记: 图片记录, 图片状态, 内容 hash, 笔记状态
+    :return: (耗时秒数, 写入次数, 提交次数)
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(os.path.join(tmp_dir, 'sync.db'), performance_mode=performance_mode)
+        with db:
+            db.init()
+            db.insert_note_list([_wiz_note(i) for i in range(notes)])
+            db.commit_count = 0
+
+            writes = 0
+            start = time.perf_counter()
+            for i in range(notes):
+                doc_guid = f'doc{i}'
+                for j in range(images):
+                    db.create_image_upload_record(doc_guid, f'{j}.png')
+                    db.update_img_sync_status(doc_guid, f'{j}.png', sync_status=True, fail_reason='', upload_url=f'./images/{j}.png')
+                db.update_note_content_hash(doc_guid, 'hash')
+                db.update_note_sync_status(doc_guid, sync_status=True, fail_reason='')
+                writes += images * 2 + 2
+            db.flush()
+            elapsed = time.perf_counter() - start
+            commits = db.commit_count
+    return elapsed, writes, commits
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库写入基准测试')
+    parser.add_argument('--notes', type=int, default=10000)
+    parser.add_argument('--images', type=int, default=2, help='每篇笔记的图片数')
+    args = parser.parse_args()
+
+    # 避免 sql 日志影响计时
+    log.setLevel(logging.WARNING)
+
+    print(f'notes={args.notes}, images/note={args.images}')
+    print(f'{"mode":<12}{"elapsed(s)":>12}{"writes/s":>12}{"notes/s":>12}{"commits":>10}{"commits/s":>12}')
+    for name, performance_mode in (('default', False), ('performance', True)):
+        elapsed, writes, commits = run(performance_mode, args.notes, args.images)
+        print(f'{name:<12}{elapsed:>12.2f}{writes / elapsed:>12.0f}{args.notes / elapsed:>12.0f}'
+              f'{commits:>10}{commits / elapsed:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+普通笔记 html 转 markdown 的基准测试: 对比之前的 html2text.html2text() 和可配置的转换引擎,
+输出每篇笔记的平均耗时以及与之前结果不同的笔记数和行数.
+
+语料默认为 test/1.html 和合成的 html 笔记, 也可以用 --corpus-dir 指定为知导出的 html 笔记目录.
+
+运行: python -m benchmark.bench_html_engine [--notes 50] [--corpus-dir DIR] [--options body_width=0]
+"""
+import argparse
+import difflib
+import logging
+import os
+import time
+
+import html2text
+
+from benchmark.bench_parse import make_html_note
+from log import log
+from sync.html_note_parser import HtmlNoteParser
+from sync.html_to_markdown import create_engine
+from sync.note_fixer import NoteFixer
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_corpus(notes, corpus_dir=None):
+    if corpus_dir:
+        corpus = []
+        for name in sorted(os.listdir(corpus_dir)):
+            if name.endswith('.html'):
+                with open(os.path.join(corpus_dir, name), encoding='utf-8') as file:
+                    corpus.append(file.read())
+        return corpus
+    with open(os.path.join(_APP_ROOT, 'test', '1.html'), encoding='utf-8') as file:
+        corpus = [file.read()]
+    return corpus + [make_html_note(i, 200) for i in range(notes - 1)]
+
+
+def legacy_parse(content):
+    # 之前 HtmlNoteParser 的实现
+    return NoteFixer.fix(html2text.html2text(content))
+
+
+def run(parse, corpus, baseline):
+    """
+    :return: (每篇耗时毫秒, 输出不同的笔记数, 不同的行数)
+    """
+    start = time.perf_counter()
+    outputs = [parse(content) for content in corpus]
+    elapsed = time.perf_counter() - start
+    changed_notes = 0
+    changed_lines = 0
+    for output, expected in zip(outputs, baseline):
+        if output == expected:
+            continue
+        changed_notes += 1
+        changed_lines += sum(1 for line in difflib.unified_diff(expected.splitlines(), output.splitlines(), lineterm='', n=0)
+                             if line[:1] in '+-' and not line.startswith(('+++', '---')))
+    return elapsed * 1000 / len(corpus), changed_notes, changed_lines
+
+
+def parse_options(text):
+    options = {}
+    for item in filter(None, (item.strip() for item in text.split(','))):
+        key, _, value = item.partition('=')
+        if value.lower() in ('true', 'false'):
+            options[key] = value.lower() == 'true'
+        elif value.lstrip('-').isdigit():
+            options[key] = int(value)
+        else:
+            options[key] = value
+    return options
+
+
+def main():
+    parser = argparse.ArgumentParser(description='html 转 markdown 引擎基准测试')
+    parser.add_argument('--notes', type=int, default=50, help='语料中的笔记数(未指定 --corpus-dir 时)')
+    parser.add_argument('--corpus-dir', help='html 笔记目录')
+    parser.add_argument('--options', default='body_width=0', help='对比的引擎选项, 格式为 选项=值, 逗号分隔')
+    args = parser.parse_args()
+
+    # 避免日志影响计时
+    log.setLevel(logging.WARNING)
+
+    corpus = load_corpus(args.notes, args.corpus_dir)
+    baseline = [legacy_parse(content) for content in corpus]
+    candidates = [
+        ('legacy html2text()', legacy_parse),
+        ('html2text engine', HtmlNoteParser(create_engine('html2text')).parse_content),
+        (f'html2text {args.options}', HtmlNoteParser(create_engine('html2text', parse_options(args.options))).parse_content),
+    ]
+
+    print(f'notes={len(corpus)}')
+    print(f'{"engine":<32}{"ms/note":>10}{"changed notes":>16}{"changed lines":>16}')
+    for name, parse in candidates:
+        ms_per_note, changed_notes, changed_lines = run(parse, corpus, baseline)
+        print(f'{name:<32}{ms_per_note:>10.2f}{changed_notes:>16}{changed_lines:>16}')
+
+
+if __name__ == '__main__':
+    main()
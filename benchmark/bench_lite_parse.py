@@ -0,0 +1,56 @@
+"""
+轻量笔记解析基准测试: 对比 BeautifulSoup 构建整棵 DOM 树和正则快速路径截取 pre 文本的吞吐和内存峰值.
+
+运行: python -m benchmark.bench_lite_parse [--size-mib 4] [--repeat 5]
+"""
+import argparse
+import time
+import tracemalloc
+
+from sync.lite_note_parser import LiteNoteParser
+
+
+def make_lite_note(size_bytes):
+    """
+    生成一篇合成的轻量笔记: body 下一个 pre 中是转义后的 markdown 原文
+    """
+    block = ('# 标题\n\n一段中文内容, 包含 **加粗** 和 `code` &amp; 链接 [wiz](https://example.com?a=1&amp;b=2)\n\n'
+             '- 列表 &lt;item&gt;\n- &quot;引号&quot;\n\n```python\nif a &lt; b and c &gt; d:\n    pass\n```\n\n')
+    markdown = block * max(1, size_bytes // len(block.encode('utf-8')))
+    return f'<!DOCTYPE html><html><head><title>lite</title></head><body><pre>{markdown}</pre></body></html>'
+
+
+def measure(func, content, repeat):
+    """
+    :return: (平均耗时秒数, 内存峰值字节数)
+    """
+    tracemalloc.start()
+    func(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(content)
+    return (time.perf_counter() - start) / repeat, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='轻量笔记解析基准测试')
+    parser.add_argument('--size-mib', type=float, default=4, help='笔记大小(MiB)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    content = make_lite_note(int(args.size_mib * 1024 * 1024))
+    size_mib = len(content.encode('utf-8')) / 1024 / 1024
+    assert LiteNoteParser._parse_fast(content) == LiteNoteParser._parse_with_soup(content)
+
+    print(f'note size={size_mib:.1f}MiB, repeat={args.repeat}')
+    print(f'{"parser":<16}{"avg(ms)":>10}{"MiB/s":>10}{"notes/s":>10}{"peak(MiB)":>12}')
+    for name, func in (('beautifulsoup', LiteNoteParser._parse_with_soup), ('fast path', LiteNoteParser._parse_fast)):
+        elapsed, peak = measure(func, content, args.repeat)
+        print(f'{name:<16}{elapsed * 1000:>10.1f}{size_mib / elapsed:>10.1f}{1 / elapsed:>10.1f}{peak / 1024 / 1024:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
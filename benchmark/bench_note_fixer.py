@@ -0,0 +1,61 @@
+"""
+NoteFixer 基准测试: 在大笔记上对比之前多次遍历全文的实现和单次逐行扫描的耗时和内存峰值.
+
+运行: python -m benchmark.bench_note_fixer [--notes 20] [--paragraphs 400] [--repeat 10]
+"""
+import argparse
+import time
+import tracemalloc
+
+import html2text
+
+from benchmark.bench_parse import make_html_note
+from sync.note_fixer import NoteFixer, fix_markdown_code_block, fix_markdown_list, fix_markdown_title
+
+
+def fix_multi_pass(markdown_content):
+    # 之前 NoteFixer.fix 的实现: 逐个修复, 多次遍历全文
+    file_content = fix_markdown_title(markdown_content)
+    file_content = fix_markdown_code_block(file_content)
+    file_content = fix_markdown_list(file_content)
+    # 将四个 \n 替换为两个 \n
+    file_content = file_content.replace('\n\n\n\n', '\n\n')
+    file_content = file_content.replace('\n\n \n\n', '\n\n').replace('\n\n \n\n', '\n\n')
+    return file_content
+
+
+def measure(func, content, repeat):
+    """
+    :return: (平均耗时秒数, 内存峰值字节数)
+    """
+    tracemalloc.start()
+    func(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(content)
+    return (time.perf_counter() - start) / repeat, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NoteFixer 基准测试')
+    parser.add_argument('--notes', type=int, default=20, help='拼接成一篇大笔记的合成笔记数')
+    parser.add_argument('--paragraphs', type=int, default=400, help='每篇合成笔记的段落数')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    content = ''.join(html2text.html2text(make_html_note(i, args.paragraphs)) for i in range(args.notes))
+    assert NoteFixer.fix(content) == fix_multi_pass(content)
+    size_mib = len(content.encode('utf-8')) / 1024 / 1024
+
+    print(f'note size={size_mib:.1f}MiB, lines={content.count(chr(10)) + 1}, repeat={args.repeat}')
+    print(f'{"implementation":<16}{"avg(ms)":>10}{"MiB/s":>10}{"peak(MiB)":>12}')
+    for name, func in (('multi pass', fix_multi_pass), ('single pass', NoteFixer.fix)):
+        elapsed, peak = measure(func, content, args.repeat)
+        print(f'{name:<16}{elapsed * 1000:>10.1f}{size_mib / elapsed:>10.1f}{peak / 1024 / 1024:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+笔记解析基准测试: 在合成的 html 笔记上, 对比在线程中解析和在不同进程数的进程池中解析的吞吐(篇/秒).
+
+同步时多个线程同时解析笔记, 这里用同样数量的线程提交解析任务. 进程数为 0 表示在线程中解析, 受 GIL 限制.
+
+运行: python -m benchmark.bench_parse [--notes 200] [--paragraphs 400] [--threads 8] [--processes 0,1,2,4]
+"""
+import argparse
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from log import log
+from sync.note_parse_pool import NoteParsePool
+
+
+def make_html_note(seed, paragraphs):
+    """
+    生成一篇合成的为知 html 笔记: 标题、段落、列表、表格、代码、图片和链接
+    """
+    rnd = random.Random(seed)
+    words = ['wiz', 'obsidian', '笔记', '同步', 'markdown', 'python', '图片', 'table', 'list', 'code']
+    parts = [f'<html><head><title>note {seed}</title></head><body>']
+    for i in range(paragraphs):
+        text = ' '.join(rnd.choice(words) for _ in range(30))
+        kind = i % 8
+        if kind == 0:
+            parts.append(f'<h2>section {i}</h2>')
+        elif kind == 1:
+            parts.append('<ul>' + ''.join(f'<li>{text[:40]} <b>{j}</b></li>' for j in range(5)) + '</ul>')
+        elif kind == 2:
+            rows = ''.join(f'<tr><td>{j}</td><td>{text[:20]}</td><td>{j * 2}</td></tr>' for j in range(4))
+            parts.append(f'<table><tr><th>a</th><th>b</th><th>c</th></tr>{rows}</table>')
+        elif kind == 3:
+            parts.append(f'<pre><code>def f{i}():\n    return "{text[:30]}"\n</code></pre>')
+        elif kind == 4:
+            parts.append(f'<p><img src="index_files/{seed}_{i}.png"> <a href="https://example.com/{i}">link</a></p>')
+        else:
+            parts.append(f'<div><p>{text} <i>{i}</i> &amp; <span style="color:red">{text[:15]}</span></p></div>')
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def run(corpus, threads, processes):
+    """
+    :return: (耗时秒数, 解析的篇数)
+    """
+    with NoteParsePool(processes) as pool:
+        # 预热子进程, 不计入启动进程和导入模块的耗时
+        with ThreadPoolExecutor(max_workers=max(1, processes)) as executor:
+            list(executor.map(lambda content: pool.parse('document', 'warmup', content), corpus[:max(1, processes)]))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            parsed = list(executor.map(lambda content: pool.parse('document', 'bench', content), corpus))
+        elapsed = time.perf_counter() - start
+    return elapsed, len(parsed)
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    default_processes = sorted({0, 1, 2, 4, cpu_count})
+    parser = argparse.ArgumentParser(description='笔记解析基准测试')
+    parser.add_argument('--notes', type=int, default=200)
+    parser.add_argument('--paragraphs', type=int, default=400, help='每篇笔记的段落数')
+    parser.add_argument('--threads', type=int, default=8, help='提交解析任务的线程数')
+    parser.add_argument('--processes', default=','.join(map(str, default_processes)), help='逗号分隔的进程数')
+    args = parser.parse_args()
+
+    # 避免日志影响计时
+    log.setLevel(logging.WARNING)
+
+    corpus = [make_html_note(i, args.paragraphs) for i in range(args.notes)]
+    size_kib = sum(len(content) for content in corpus) / len(corpus) / 1024
+    print(f'notes={args.notes}, avg size={size_kib:.0f}KiB, threads={args.threads}, cpus={cpu_count}')
+    print(f'{"processes":<12}{"elapsed(s)":>12}{"notes/s":>12}{"speedup":>10}')
+    baseline = None
+    for processes in (int(value) for value in args.processes.split(',')):
+        elapsed, count = run(corpus, args.threads, processes)
+        rate = count / elapsed
+        baseline = baseline or rate
+        print(f'{processes:<12}{elapsed:>12.2f}{rate:>12.1f}{rate / baseline:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
+import hashlib
 import logging.config
 import logging.handlers
 import yaml
@@ -43,4 +44,27 @@ config['handlers']['file']['filename'] = log_file
 logging.config.dictConfig(config)
 
 # 创建 log 对象
-log = logging.getLogger()
\ No newline at end of file
+log = logging.getLogger()
+
+
+# 日志中报文最多记录的字符数, 超过时只记录长度、sha256 和开头部分
+PAYLOAD_LOG_MAX_CHARS = 1000
+# 计算 sha256 时每次编码的字符数, 避免为很大的报文再复制一份完整的 bytes
+_PAYLOAD_HASH_CHUNK_CHARS = 1024 * 1024
+
+
+def payload_summary(payload, max_chars=PAYLOAD_LOG_MAX_CHARS):
+    """
+    报文在日志中的内容. 协作笔记的报文可能有几十 MB, 超过 max_chars 时不完整写入日志
+    :param payload: str 或 bytes
+    :return: 短报文原样返回, 长报文返回长度、sha256 和前 max_chars 个字符
+    """
+    if payload is None or len(payload) <= max_chars:
+        return payload
+    digest = hashlib.sha256()
+    if isinstance(payload, str):
+        for start in range(0, len(payload), _PAYLOAD_HASH_CHUNK_CHARS):
+            digest.update(payload[start:start + _PAYLOAD_HASH_CHUNK_CHARS].encode('utf-8', 'surrogatepass'))
+    else:
+        digest.update(payload)
+    return f'len={len(payload)}, sha256={digest.hexdigest()}, prefix={payload[:max_chars]!r}...'
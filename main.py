@@ -1,7 +1,15 @@
+import asyncio
+import multiprocessing
 from sync.note_synchronizer import NoteSynchronizer
 from sync.database import Database
+from sync.sql_profiler import SqlProfiler
+from sync.blob_store import BlobStore
+from sync.note_parse_pool import NoteParsePool
+from sync.html_to_markdown import configure_engine
+from sync.file_manager import FileManager
 from sync.config import Config
 from sync.wiz_open_api import WizOpenApi
+from sync.async_wiz_open_api import AsyncWizOpenApi
 from sync.init_dirs import init_output_dirs
 from log import log
 import unittest
@@ -24,16 +32,38 @@ def main():
     # 实例化API客户端
     api_client = WizOpenApi(config)
 
-    # 实例化数据库
-    with Database() as db:
+    # sql 统计, 默认关闭
+    profiler = SqlProfiler(json_path=config.sql_profile_output or None) if config.sql_profile else None
+
+    # 普通笔记 html 转 markdown 的引擎, 需要在创建解析进程池之前设置
+    configure_engine(config.html_engine, config.html_engine_options)
+
+    # 实例化数据库和笔记解析进程池, 进程池默认不开启
+    with Database(performance_mode=config.db_performance_mode, profiler=profiler) as db, \
+            NoteParsePool(config.parse_processes) as parse_pool:
         db.init()
+        # 图片和附件按内容去重存储
+        blob_store = BlobStore(FileManager.get_blob_directory(), db)
         # 实例化同步器
-        synchronizer = NoteSynchronizer(api_client, db)
+        synchronizer = NoteSynchronizer(api_client, db, workers=config.sync_workers,
+                                        resource_workers=config.resource_workers, blob_store=blob_store,
+                                        parse_pool=parse_pool)
 
         # 执行同步笔记
-        synchronizer.synchronize_notes()
+        if config.sync_async:
+            asyncio.run(synchronize_notes_async(synchronizer, api_client))
+        elif config.sync_pipeline:
+            synchronizer.synchronize_notes_pipeline(config.pipeline_workers, config.pipeline_queue_size)
+        else:
+            synchronizer.synchronize_notes()
+    api_client.close()
     log.info("Sync finished")
 
+async def synchronize_notes_async(synchronizer, api_client):
+    # 复用同步客户端的登录凭证
+    async with AsyncWizOpenApi.from_sync_client(api_client) as async_api_client:
+        await synchronizer.synchronize_notes_async(async_api_client)
+
 def test_main():
     # 初始化目录结构
     init_output_dirs()
@@ -57,6 +87,8 @@ def test_main():
 
 
 if __name__ == "__main__":
+    # 打包后的可执行文件启动解析子进程时需要
+    multiprocessing.freeze_support()
     if len(sys.argv) > 1 and sys.argv[1] == 'test':
         test_main()
     else:
@@ -0,0 +1,408 @@
+from log import log, payload_summary
+import aiohttp
+import asyncio
+import json
+import time
+import ssl
+import certifi
+
+from sync.collaboration_editor_session import CollaborationEditorSession, FetchRejected, HandshakeRejected
+from sync.config import Config
+from sync.token_cache import TokenCache
+from sync.wiz_open_api import WizOpenApi, WizAuthError
+
+
+class AsyncWizOpenApi:
+    """
+    WizOpenApi 的 asyncio 版本, 方法与 WizOpenApi 一一对应.
+    所有请求共用同一个事件循环上的 aiohttp.ClientSession, 单线程即可同时发起大量请求.
+    """
+    # account server
+    AS_URL = WizOpenApi.AS_URL
+
+    ATTACHMENT_CONNECT_TIMEOUT_S = WizOpenApi.ATTACHMENT_CONNECT_TIMEOUT_S
+    ATTACHMENT_READ_TIMEOUT_S = WizOpenApi.ATTACHMENT_READ_TIMEOUT_S
+    ATTACHMENT_CHUNK_SIZE = WizOpenApi.ATTACHMENT_CHUNK_SIZE
+    ATTACHMENT_PROGRESS_LOG_INTERVAL_S = WizOpenApi.ATTACHMENT_PROGRESS_LOG_INTERVAL_S
+    # 单篇协作笔记从建立连接到拿到内容的超时时间
+    COLLABORATION_REQUEST_TIMEOUT_S = CollaborationEditorSession.REQUEST_TIMEOUT_S
+
+    # 同时建立的最大连接数
+    DEFAULT_CONCURRENCY = 100
+
+    def __init__(self, config: Config = None, concurrency=DEFAULT_CONCURRENCY):
+        self.user_id = config.user_id if config else ''
+        self.password = config.password if config else ''
+        self.group_name = config.group_name if config else ''
+        self.token = ''
+        # 知识库服务(knowledge base)
+        self.kb_server = ''
+        self.kb_guid = ''
+        self.user_guid = ''
+        self.concurrency = concurrency
+        self._session = None
+        # 协作笔记编辑器 token 缓存, key 为 doc_guid
+        self.collaboration_tokens = TokenCache(ttl_s=WizOpenApi.COLLABORATION_TOKEN_TTL_S)
+
+    @classmethod
+    async def create(cls, config: Config, concurrency=DEFAULT_CONCURRENCY):
+        """
+        创建客户端并完成登录
+        """
+        api = cls(config, concurrency=concurrency)
+        await api.auth()
+        return api
+
+    @classmethod
+    def from_sync_client(cls, api_client: WizOpenApi, concurrency=DEFAULT_CONCURRENCY):
+        """
+        复用已登录的 WizOpenApi 的凭证, 避免重复登录
+        """
+        api = cls(concurrency=concurrency)
+        api.user_id = api_client.user_id
+        api.password = api_client.password
+        api.group_name = api_client.group_name
+        api.token = api_client.token
+        api.kb_server = api_client.kb_server
+        api.kb_guid = api_client.kb_guid
+        api.user_guid = api_client.user_guid
+        # 与同步客户端共用 token 缓存, 获取内容时拿到的 token 在下载图片时复用
+        api.collaboration_tokens = api_client.collaboration_tokens
+        return api
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _get_session(self):
+        # ClientSession 需要在事件循环中创建, 延迟到第一次请求时创建
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, ssl=self._ssl_context())
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    @staticmethod
+    def _ssl_context():
+        return ssl.create_default_context(cafile=certifi.where())
+
+    async def _request_json(self, method, url, error_message, **kwargs):
+        """
+        发送请求并校验 http 状态码和业务状态码
+        :param error_message: 失败时异常信息的前缀
+        :return: 响应报文
+        """
+        async with self._get_session().request(method, url, **kwargs) as response:
+            if response.status != 200:
+                raise Exception(f'{error_message}: http状态码为:{response.status}')
+            data = await response.json(content_type=None)
+        if data['returnCode'] != 200:
+            raise Exception(f'{error_message}: 为知响应报文为:{data}')
+        return data
+
+    async def _login(self):
+        login_url = f'{self.AS_URL}/as/user/login'
+        data = await self._request_json('POST', login_url, '登录失败',
+                                        data={'userId': self.user_id, 'password': self.password})
+        log.info(f'login 为知响应报文为:{json.dumps(data)}')
+        return data
+
+    async def get_group_list(self):
+        """
+        获取群组知识库列表
+        """
+        group_list_url = f'{self.AS_URL}/as/user/groups'
+        data = await self._request_json('GET', group_list_url, '获取群组列表失败',
+                                        headers={'X-Wiz-Token': self.token})
+        log.info(f'get_group_list 为知响应报文为:{json.dumps(data)}')
+        return data
+
+    async def auth(self):
+        data = await self._login()
+        self.token = data['result']['token']
+        self.kb_server = data['result']['kbServer']
+        self.kb_guid = data['result']['kbGuid']
+        self.user_guid = data['result']['userGuid']
+        # 设置群组笔记配置
+        await self.set_group_config()
+
+    async def set_group_config(self):
+        """
+        如果配置文件中配置了 group_name & 不为空, 开始默认导出群组笔记
+        """
+        if self.group_name is None or self.group_name == '':
+            return
+        group_list_data = await self.get_group_list()
+
+        matching_group = next((group for group in group_list_data['result'] if group['name'] == self.group_name), None)
+
+        if not matching_group:
+            raise Exception(f'配置的群组名称:{self.group_name} 不存在, 请检查配置文件')
+
+        self.kb_guid = matching_group['kbGuid']
+        self.kb_server = matching_group['kbServer']
+
+    async def get_note_list(self, version, count):
+        note_list_url = f'{self.kb_server}/ks/note/list/version/{self.kb_guid}'
+        data = await self._request_json('GET', note_list_url, '获取笔记列表失败',
+                                        params={'version': version, 'count': count},
+                                        headers={'X-Wiz-Token': self.token})
+        return data['result']
+
+    async def get_note_detail(self, doc_guid):
+        note_download_url = f'{self.kb_server}/ks/note/download/{self.kb_guid}/{doc_guid}?downloadInfo=0&downloadData=1'
+        return await self._request_json('GET', note_download_url, '下载笔记失败',
+                                        headers={'X-Wiz-Token': self.token})
+
+    async def get_note_count(self):
+        url = f'{self.kb_server}/ks/kb/info/{self.kb_guid}'
+        data = await self._request_json('GET', url, '获取笔记总数失败', headers={'X-Wiz-Token': self.token})
+        log.info(f'获取笔记总数 response: {json.dumps(data)}')
+        return data['result']['noteCount']
+
+    # 获取协作笔记token, 同一篇笔记在缓存有效期内只请求一次
+    async def get_collaboration_token(self, doc_guid):
+        return await self.collaboration_tokens.get_or_fetch_async(
+            doc_guid, lambda: self._fetch_collaboration_token(doc_guid))
+
+    def invalidate_collaboration_token(self, doc_guid):
+        """
+        token 失效时移除缓存, 下次获取时重新请求
+        """
+        self.collaboration_tokens.invalidate(doc_guid)
+
+    async def _fetch_collaboration_token(self, doc_guid):
+        url = f'{self.kb_server}/ks/note/{self.kb_guid}/{doc_guid}/tokens'
+        data = await self._request_json('POST', url, '获取协作笔记token失败', headers={'X-Wiz-Token': self.token})
+        return data['result']['editorToken']
+
+    # 升级笔记
+    async def upgrade_note(self, doc_guid):
+        detail_resp = await self.get_note_detail(doc_guid)
+        url = f'{self.kb_server}/ks/note/upload/{self.kb_guid}/{doc_guid}'
+        payload = detail_resp['info']
+        payload['collaborationStatus'] = 'normal'
+        payload['status'] = 'localDataModified'
+        payload['type'] = 'lite/markdown'
+        log.info(f'升级笔记 payload: {json.dumps(payload)}')
+        data = await self._request_json('POST', url, '升级笔记失败', headers={'X-Wiz-Token': self.token}, json=payload)
+        log.info(f'升级笔记 response: {json.dumps(data)}')
+        return data
+
+    async def get_note_attachments(self, doc_guid):
+        """
+        获取笔记附件列表
+        :param doc_guid: 笔记GUID
+        :return: 附件列表数据
+        """
+        url = f'{self.kb_server}/ks/note/attachments/{self.kb_guid}/{doc_guid}'
+        params = {
+            'extra': '1',
+            'clientType': 'web',
+            'clientVersion': '4.0',
+            'lang': 'zh-cn'
+        }
+        data = await self._request_json('GET', url, '获取笔记附件列表失败',
+                                        params=params, headers={'X-Wiz-Token': self.token})
+        return data['result']
+
+    # 获取协作笔记内容
+    async def get_collaboration_content(self, editor_token, doc_guid):
+        """
+        与 CollaborationEditorSession 一致: 握手一次后发送 f 请求, 从建立连接到拿到内容不超过 COLLABORATION_REQUEST_TIMEOUT_S
+        :return: f 请求返回的原始报文
+        """
+        try:
+            return await asyncio.wait_for(self._fetch_collaboration_content(editor_token, doc_guid),
+                                          self.COLLABORATION_REQUEST_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            raise asyncio.TimeoutError(f'获取协作笔记内容超时: doc_guid={doc_guid}') from None
+
+    async def _fetch_collaboration_content(self, editor_token, doc_guid):
+        url = CollaborationEditorSession.editor_url(self.kb_server, self.kb_guid, doc_guid)
+        async with self._get_session().ws_connect(url, max_msg_size=0) as ws:
+            await ws.send_str(json.dumps(
+                CollaborationEditorSession.handshake_request(self.kb_guid, self.user_guid, doc_guid, editor_token)))
+            reply = await self._receive_until(ws, lambda msg: msg.get('a') == 'hs')
+            if reply.get('error'):
+                raise HandshakeRejected(f'协作笔记握手失败: {reply["error"]}')
+
+            await ws.send_str(json.dumps(CollaborationEditorSession.fetch_request(self.kb_guid, doc_guid)))
+            return await self._receive_until(
+                ws, lambda msg: msg.get('a') == 'f' and msg.get('d') == doc_guid, raw=True)
+
+    @staticmethod
+    async def _receive_until(ws, matcher, raw=False):
+        """
+        读取消息直到匹配目标响应, 跳过服务端推送的其他消息. 只解析顶层的 a / d / error 用于匹配
+        :param raw: 是否返回原始字符串
+        """
+        while True:
+            message = await ws.receive_str()
+            try:
+                msg = CollaborationEditorSession.read_header(message)
+            except (TypeError, ValueError):
+                log.info(payload_summary(message))
+                continue
+            if not matcher(msg):
+                log.info(payload_summary(message))
+                continue
+            if msg.get('a') == 'f' and msg.get('error'):
+                raise FetchRejected(f'获取协作笔记内容失败: {msg["error"]}')
+            log.info(payload_summary(message))
+            return message if raw else msg
+
+    # 获取协作笔记图片
+    async def get_collaboration_image_byte(self, editor_token, doc_guid, image_name):
+        buf = bytearray()
+        await self.get_collaboration_resource_to(buf, editor_token, doc_guid, image_name)
+        return bytes(buf)
+
+    async def get_collaboration_resource_to(self, out, editor_token, doc_guid, image_name):
+        """
+        分块下载协作笔记资源(图片/附件), 每个分块直接写入 out, 内存占用与资源大小无关
+        :param out: 支持 write/extend 的对象, 例如打开的文件
+        :return: 下载的字节数
+        """
+        url = f'{self.kb_server}/editor/{self.kb_guid}/{doc_guid}/resources/{image_name}'
+        headers = {
+            'cookie': f'x-live-editor-token={editor_token}',
+            'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        }
+        return await self._download(out, url, headers, None, '协作资源', image_name, f'doc_guid={doc_guid}')
+
+    async def download_attachment(self, doc_guid, att_guid, att_name=None):
+        """
+        下载笔记附件
+        :param doc_guid: 笔记GUID
+        :param att_guid: 附件GUID
+        :param att_name: 附件文件名(可选, 用于日志)
+        :return: 附件的二进制内容
+        """
+        buf = bytearray()
+        await self.download_attachment_to(buf, doc_guid, att_guid, att_name=att_name)
+        return bytes(buf)
+
+    async def download_attachment_to(self, out, doc_guid, att_guid, att_name=None):
+        """
+        分块下载笔记附件, 每个分块直接写入 out, 内存占用与附件大小无关
+        :param out: 支持 write/extend 的对象, 例如打开的文件
+        :param doc_guid: 笔记GUID
+        :param att_guid: 附件GUID
+        :param att_name: 附件文件名(可选, 用于日志)
+        :return: 下载的字节数
+        """
+        url = f'{self.kb_server}/ks/attachment/download/{self.kb_guid}/{doc_guid}/{att_guid}'
+        params = {
+            'clientType': 'web',
+            'clientVersion': '4.0',
+            'lang': 'zh-cn'
+        }
+        attachment_label = att_name if att_name else att_guid
+        return await self._download(out, url, {'X-Wiz-Token': self.token}, params, '附件', attachment_label,
+                                    f'doc_guid={doc_guid}, att_guid={att_guid}')
+
+    async def _download(self, out, url, headers, params, kind, label, context):
+        """
+        分块下载资源并写入 out, 定期打印下载进度. 与 WizOpenApi._download 一致, out 为 PartialFile 时断点续传
+        :param kind: 资源类型, 用于日志和异常信息
+        :param label: 资源名称, 用于日志
+        :param context: 附加的日志上下文
+        :return: 下载的字节数
+        """
+        timeout = aiohttp.ClientTimeout(sock_connect=self.ATTACHMENT_CONNECT_TIMEOUT_S,
+                                        sock_read=self.ATTACHMENT_READ_TIMEOUT_S)
+        chunk_size = self.ATTACHMENT_CHUNK_SIZE
+        progress_interval = self.ATTACHMENT_PROGRESS_LOG_INTERVAL_S
+        write = out.write if hasattr(out, 'write') else out.extend
+
+        log.info(
+            f"开始下载{kind}: {label} ({context}, "
+            f"timeout={self.ATTACHMENT_CONNECT_TIMEOUT_S}/{self.ATTACHMENT_READ_TIMEOUT_S}s, chunk_size={chunk_size})"
+        )
+
+        # out 为 PartialFile 时, 从已接收的位置续传
+        offset = getattr(out, 'offset', 0)
+        if offset:
+            headers = dict(headers or {})
+            headers['Range'] = f'bytes={offset}-'
+            if getattr(out, 'validator', None):
+                headers['If-Range'] = out.validator
+            log.info(f"续传{kind}: {label} 从 {offset} bytes 开始")
+
+        downloaded_bytes = 0
+        total_bytes = None
+        resumed_bytes = 0
+        start_time = time.monotonic()
+        last_progress_log_time = start_time
+
+        try:
+            async with self._get_session().get(url, headers=headers, params=params, timeout=timeout) as response:
+                if response.status == 401:
+                    raise WizAuthError(f'下载{kind}失败: http状态码为:{response.status}')
+                if offset and response.status == 416:
+                    # 请求的起始位置超出文件大小: 已接收完整文件, 否则丢弃已接收内容后重试
+                    if out.is_complete():
+                        log.info(f"{kind}已下载完整: {label} bytes={offset}")
+                        return 0
+                    out.restart()
+                    raise Exception(f'下载{kind}失败: 续传位置无效, http状态码为:{response.status}')
+                if response.status not in (200, 206) or (response.status == 206 and not offset):
+                    raise Exception(f'下载{kind}失败: http状态码为:{response.status}')
+
+                total_bytes = response.content_length
+                if offset:
+                    if response.status == 206:
+                        range_start, range_total = WizOpenApi._parse_content_range(response.headers.get('Content-Range'))
+                        if range_start != offset:
+                            out.restart()
+                            raise Exception(f'下载{kind}失败: 续传位置不一致, Content-Range={response.headers.get("Content-Range")}')
+                        total_bytes = range_total
+                    else:
+                        # 服务端不支持 Range 或文件已变化, 返回了完整内容
+                        out.restart()
+                if hasattr(out, 'set_validator'):
+                    out.set_validator(response.headers.get('ETag') or response.headers.get('Last-Modified'), total_bytes)
+                resumed_bytes = getattr(out, 'offset', 0)
+
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    write(chunk)
+                    downloaded_bytes += len(chunk)
+
+                    now = time.monotonic()
+                    if now - last_progress_log_time >= progress_interval:
+                        elapsed = now - start_time
+                        speed_mib_s = (downloaded_bytes / elapsed) / (1024 * 1024) if elapsed > 0 else 0.0
+                        if total_bytes:
+                            received_bytes = resumed_bytes + downloaded_bytes
+                            pct = received_bytes * 100.0 / total_bytes
+                            log.info(
+                                f"{kind}下载中: {label} {received_bytes}/{total_bytes} bytes "
+                                f"({pct:.1f}%), {speed_mib_s:.2f} MiB/s, elapsed={elapsed:.1f}s"
+                            )
+                        else:
+                            log.info(
+                                f"{kind}下载中: {label} {downloaded_bytes} bytes, "
+                                f"{speed_mib_s:.2f} MiB/s, elapsed={elapsed:.1f}s"
+                            )
+                        last_progress_log_time = now
+        except (Exception, asyncio.TimeoutError) as e:
+            elapsed = time.monotonic() - start_time
+            log.warning(
+                f"{kind}下载失败: {label} ({context}) "
+                f"downloaded={downloaded_bytes} bytes, elapsed={elapsed:.1f}s, error={type(e).__name__}: {e}"
+            )
+            raise
+
+        elapsed = time.monotonic() - start_time
+        if total_bytes is not None and resumed_bytes + downloaded_bytes < total_bytes:
+            # 连接提前结束, 保留已接收的部分等待续传
+            raise Exception(f'下载{kind}不完整: {label} {resumed_bytes + downloaded_bytes}/{total_bytes} bytes')
+        log.info(f"{kind}下载完成: {label} bytes={downloaded_bytes}, elapsed={elapsed:.1f}s")
+        return downloaded_bytes
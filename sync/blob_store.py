@@ -0,0 +1,115 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import Counter
+
+from log import log
+
+
+class BlobStore:
+    """
+    按内容寻址的图片/附件存储.
+    资源内容按 sha256 保存在 output/blobs/<前两位>/<sha256>, 笔记目录下的文件是指向它的硬链接(不支持时复制),
+    多篇笔记引用相同的图片或附件时只占用一份磁盘空间.
+    数据库记录资源标识到 sha256 的映射, 已下载过的资源直接链接到笔记目录, 不再重复下载.
+    """
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, root, db):
+        """
+        :param root: 存储目录
+        :param db: Database, 保存资源索引
+        """
+        self.root = root
+        self.db = db
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name, value=1):
+        with self._stats_lock:
+            self._stats[name] += value
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def link_known(self, resource_key, dest_path):
+        """
+        资源已下载过且内容仍在存储中时, 直接链接到目标路径
+        :param resource_key: 资源标识
+        :param dest_path: 笔记目录下的目标文件路径
+        :return: 是否已链接, False 时需要下载
+        """
+        known = self.db.get_resource_blob(resource_key)
+        if not known:
+            return False
+        sha256, size = known
+        blob_path = self.blob_path(sha256)
+        if not os.path.exists(blob_path):
+            return False
+        self._link(blob_path, dest_path)
+        self._count('downloads_skipped')
+        self._count('download_bytes_saved', size or 0)
+        self._count('disk_bytes_saved', size or 0)
+        log.info(f'资源已存在, 跳过下载: {resource_key} -> {dest_path}')
+        return True
+
+    def ingest(self, resource_key, file_path):
+        """
+        把刚下载的文件放入存储: 内容已存在时改为链接到已有内容, 否则把文件链接进存储, 并记录资源索引
+        :param resource_key: 资源标识
+        :param file_path: 下载完成的文件路径
+        :return: 内容的 sha256
+        """
+        sha256, size = self._hash_file(file_path)
+        blob_path = self.blob_path(sha256)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        if os.path.exists(blob_path):
+            if not os.path.samefile(blob_path, file_path):
+                self._link(blob_path, file_path)
+                self._count('disk_bytes_saved', size)
+                self._count('blobs_reused')
+        else:
+            self._link(file_path, blob_path)
+            self._count('blobs_stored')
+        self.db.save_resource_blob(resource_key, sha256, size)
+        return sha256
+
+    @staticmethod
+    def _link(src_path, dest_path):
+        """
+        在目标目录创建临时硬链接(跨设备或文件系统不支持时复制)后替换目标文件
+        """
+        directory_path, file_name = os.path.split(dest_path)
+        os.makedirs(directory_path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f'.{file_name}.', suffix='.tmp', dir=directory_path)
+        os.close(fd)
+        os.remove(tmp_path)
+        try:
+            try:
+                os.link(src_path, tmp_path)
+            except OSError:
+                shutil.copyfile(src_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def _hash_file(cls, file_path):
+        sha256 = hashlib.sha256()
+        size = 0
+        with open(file_path, 'rb') as file:
+            while True:
+                chunk = file.read(cls.HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                size += len(chunk)
+        return sha256.hexdigest(), size
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
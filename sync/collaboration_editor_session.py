@@ -0,0 +1,246 @@
+import json
+import queue
+import ssl
+import threading
+import time
+
+import certifi
+from websocket import create_connection, WebSocketException, WebSocketTimeoutException
+
+from log import log, payload_summary
+from sync.json_scanner import JsonScanner
+
+
+class HandshakeRejected(Exception):
+    """
+    编辑器服务拒绝了 hs 握手
+    """
+
+
+class FetchRejected(Exception):
+    """
+    编辑器服务对 f 请求返回了 error
+    """
+
+
+class _EditorConnection:
+
+    def __init__(self, ws, doc_guid):
+        self.ws = ws
+        # 建立连接时使用的笔记, 连接地址中包含该笔记的 doc_guid
+        self.doc_guid = doc_guid
+        # 在这条连接上成功获取的笔记数, 大于 0 时表示连接被复用
+        self.fetches = 0
+
+    def close(self):
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+
+class CollaborationEditorSession:
+    """
+    协作笔记编辑器的长连接会话.
+    维护一个小的 websocket 连接池, 多篇协作笔记复用同一条连接获取内容, 每次获取都有超时时间, 连接断开时自动重连.
+    """
+    DEFAULT_POOL_SIZE = 2
+    MAX_POOL_SIZE = 4
+    CONNECT_TIMEOUT_S = 10
+    # 单篇笔记从握手到拿到内容的超时时间
+    REQUEST_TIMEOUT_S = 60
+    # 连接断开或被拒绝时, 重新建立连接的次数
+    MAX_ATTEMPTS = 2
+
+    def __init__(self, kb_server, kb_guid, user_guid, pool_size=DEFAULT_POOL_SIZE, request_timeout_s=REQUEST_TIMEOUT_S):
+        self.kb_server = kb_server
+        self.kb_guid = kb_guid
+        self.user_guid = user_guid
+        self.pool_size = max(1, min(pool_size, self.MAX_POOL_SIZE))
+        self.request_timeout_s = request_timeout_s
+        # 空闲连接, 后进先出, 优先复用刚用过的连接
+        self._idle = queue.LifoQueue()
+        # 限制同时存在的连接数
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self.connections_opened = 0
+        self.fetch_count = 0
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def editor_url(kb_server, kb_guid, doc_guid):
+        # kb_server 为 http 时(本地替身服务)使用 ws, 否则使用 wss
+        scheme = 'ws' if kb_server.startswith('http://') else 'wss'
+        domain = kb_server.replace('https://', '').replace('http://', '')
+        return f"{scheme}://{domain}/editor/{kb_guid}/{doc_guid}"
+
+    @staticmethod
+    def handshake_request(kb_guid, user_guid, doc_guid, editor_token):
+        return {
+            "a": "hs",
+            "id": None,
+            "auth": {
+                "appId": kb_guid,
+                "docId": doc_guid,
+                "userId": user_guid,
+                "permission": "w",
+                "token": editor_token
+            }
+        }
+
+    @staticmethod
+    def fetch_request(kb_guid, doc_guid):
+        return {
+            "a": "f",
+            "c": kb_guid,
+            "d": doc_guid,
+            "v": None
+        }
+
+    def _connect(self, doc_guid):
+        ws = create_connection(
+            self.editor_url(self.kb_server, self.kb_guid, doc_guid),
+            timeout=self.CONNECT_TIMEOUT_S,
+            sslopt={
+                'cert_reqs': ssl.CERT_REQUIRED,
+                'ca_certs': certifi.where(),
+            },
+        )
+        with self._stats_lock:
+            self.connections_opened += 1
+        log.info(f'协作笔记编辑器连接已建立: doc_guid={doc_guid}')
+        return _EditorConnection(ws, doc_guid)
+
+    def _acquire(self, doc_guid, deadline, fresh=False):
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise WebSocketTimeoutException('等待协作笔记编辑器连接超时')
+        try:
+            if not fresh:
+                try:
+                    return self._idle.get_nowait()
+                except queue.Empty:
+                    pass
+            return self._connect(doc_guid)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, conn):
+        self._idle.put(conn)
+        self._slots.release()
+
+    def _discard(self, conn):
+        conn.close()
+        self._slots.release()
+
+    def fetch(self, doc_guid, editor_token):
+        """
+        获取协作笔记内容.
+        复用其他笔记的连接时, 编辑器不一定接受这条连接上的其他笔记: 复用的连接上失败或超时,
+        都使用该笔记自己的地址建立新连接重试一次, 超时后重试时重新计时
+        :param doc_guid: 笔记GUID
+        :param editor_token: 该笔记的编辑器 token
+        :return: f 请求返回的原始报文
+        """
+        deadline = time.monotonic() + self.request_timeout_s
+        fresh = False
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            conn = self._acquire(doc_guid, deadline, fresh=fresh)
+            reused = conn.fetches > 0
+            try:
+                content = self._fetch_on(conn, doc_guid, editor_token, deadline)
+            except (HandshakeRejected, FetchRejected, WebSocketException, OSError) as e:
+                self._discard(conn)
+                timed_out = isinstance(e, WebSocketTimeoutException)
+                if timed_out or isinstance(e, FetchRejected):
+                    # 超时和 f 请求失败只在复用的连接上重试, 新连接上的失败与复用无关, 直接抛出
+                    retry = reused
+                else:
+                    # 握手被拒绝或连接断开时, 在截止时间前重新连接
+                    retry = time.monotonic() < deadline
+                if attempt >= self.MAX_ATTEMPTS or not retry:
+                    raise
+                if timed_out:
+                    # 超时的请求已用完截止时间, 新连接重新计时
+                    deadline = time.monotonic() + self.request_timeout_s
+                log.warning(f'协作笔记编辑器连接异常, 重新连接: doc_guid={doc_guid}, 复用连接: {reused}, '
+                            f'错误: {type(e).__name__}: {e}')
+                fresh = True
+                continue
+            except BaseException:
+                self._discard(conn)
+                raise
+            conn.fetches += 1
+            self._release(conn)
+            with self._stats_lock:
+                self.fetch_count += 1
+            return content
+
+    def _fetch_on(self, conn, doc_guid, editor_token, deadline):
+        hs_request = self.handshake_request(self.kb_guid, self.user_guid, doc_guid, editor_token)
+        f_request = self.fetch_request(self.kb_guid, doc_guid)
+
+        # 编辑器 token 按笔记签发, 每篇笔记都需要在连接上握手一次
+        conn.ws.send(json.dumps(hs_request))
+        reply = self._recv_until(conn, deadline, lambda msg: msg.get('a') == 'hs')
+        if reply.get('error'):
+            raise HandshakeRejected(f'协作笔记握手失败: {reply["error"]}')
+
+        conn.ws.send(json.dumps(f_request))
+        return self._recv_until(
+            conn, deadline,
+            lambda msg: msg.get('a') == 'f' and msg.get('d') == doc_guid,
+            raw=True,
+        )
+
+    def _recv_until(self, conn, deadline, matcher, raw=False):
+        """
+        读取消息直到匹配目标响应, 跳过服务端推送的其他消息
+        :param raw: 是否返回原始字符串. 此时只解析顶层的 a / d / error 用于匹配
+        """
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise WebSocketTimeoutException('获取协作笔记内容超时')
+            conn.ws.settimeout(remaining)
+            message = conn.ws.recv()
+            try:
+                msg = self.read_header(message) if raw else json.loads(message)
+            except (TypeError, ValueError):
+                log.info(payload_summary(message))
+                continue
+            if not isinstance(msg, dict) or not matcher(msg):
+                log.info(payload_summary(message))
+                continue
+            if msg.get('a') == 'f' and msg.get('error'):
+                raise FetchRejected(f'获取协作笔记内容失败: {msg["error"]}')
+            log.info(payload_summary(message))
+            return message if raw else msg
+
+    @staticmethod
+    def read_header(message):
+        """
+        只解析顶层的 a / d / error, 跳过其他成员.
+        f 响应的 data 有几 MB, 交给 CollaborationNoteParser 解析, 这里不再完整解析一遍
+        """
+        if isinstance(message, bytes):
+            message = message.decode('utf-8')
+        scanner = JsonScanner(message)
+        header = {}
+        for key in scanner.members():
+            if key in ('a', 'd', 'error'):
+                header[key] = scanner.value()
+            else:
+                scanner.skip()
+        scanner.end()
+        return header
+
+    def stats(self):
+        with self._stats_lock:
+            return {'connections_opened': self.connections_opened, 'fetches': self.fetch_count}
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
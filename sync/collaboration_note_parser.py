@@ -1,5 +1,6 @@
 import json
-from log import log
+from log import log, payload_summary
+from sync.json_scanner import JsonScanner, LazyJsonObject
 from sync.note_parser import NoteParser
 from sync.note_fixer import NoteFixer
 
@@ -7,8 +8,12 @@ from sync.note_fixer import NoteFixer
 
 class BaseStrategy:
 
-    def __init__(self, data):
+    def __init__(self, data, comment_groups, renderer):
         self.data = data
+        # 按 groupId 分组的评论, 同一篇文档的所有 block 共用
+        self.comment_groups = comment_groups
+        # 所属的 DocumentRenderer
+        self.renderer = renderer
 
     def to_text(self, block_row):
         pass
@@ -92,11 +97,8 @@ class TextStrategy(BaseStrategy):
     def get_sub_comments(self, group_id, main_comment_id):
         """获取同一组中的其他评论（子评论）"""
         sub_comments = []
-        all_comments = self.data.get('comments', {})
-        
-        for comment_id, comment_data in all_comments.items():
-            if (comment_data.get('groupId') == group_id and 
-                comment_id != main_comment_id):
+        for comment_id, comment_data in self.comment_groups.get(group_id, ()):
+            if comment_id != main_comment_id:
                 sub_comment_text = self.format_comment(comment_data)
                 sub_comments.append(sub_comment_text)
         
@@ -168,8 +170,8 @@ class ListStrategy(BaseStrategy):
 
 class CodeStrategy(BaseStrategy):
 
-    def __init__(self, data):
-        super().__init__(data)
+    def __init__(self, data, comment_groups, renderer):
+        super().__init__(data, comment_groups, renderer)
 
     def to_text(self, row):
         # 解析 language
@@ -185,9 +187,11 @@ class CodeStrategy(BaseStrategy):
 
 
 class EmbedStrategy(BaseStrategy):
+    SNAPSHOT_EMPTY = "\n\n> **嵌入快照**: 无内容\n\n"
+    SNAPSHOT_FAILED = "\n\n> **嵌入快照**: 解析失败\n\n"
 
-    def __init__(self, data):
-        super().__init__(data)
+    def __init__(self, data, comment_groups, renderer):
+        super().__init__(data, comment_groups, renderer)
 
     def to_text(self, row):
         embed_type = row["embedType"]
@@ -226,39 +230,17 @@ class EmbedStrategy(BaseStrategy):
 
     def handle_snapshot(self, embed_data):
         """处理快照嵌入类型 - 递归解析完整内容并格式化为引用块"""
-        try:
-            # 解析嵌套的doc内容
-            doc_content = embed_data.get("doc", "")
-            if doc_content:
-                doc_json = json.loads(doc_content)
-                
-                # 递归解析嵌套doc的blocks
-                nested_blocks = doc_json.get("blocks", [])
-                nested_content = []
-                
-                for block in nested_blocks:
-                    # 使用现有的MarkdownConverter解析每个block
-                    block_content = MarkdownConverter.to_text(doc_json, block)
-                    nested_content.append(block_content)
-                
-                # 将解析的内容组合并转换为引用块格式
-                combined_content = ''.join(nested_content).strip()
-                
-                # 按行分割并为每行添加引用前缀
-                lines = combined_content.split('\n')
-                quoted_lines = []
-                
-                for line in lines:
-                    # 为每一行添加 "> " 前缀，包括空行
-                    quoted_lines.append(f"> {line}")
-                
-                result = "\n\n" + '\n'.join(quoted_lines) + "\n\n"
-                return result
-            else:
-                return "\n\n> **嵌入快照**: 无内容\n\n"
-        except (json.JSONDecodeError, KeyError) as e:
-            log.error(f"解析snapshot嵌入内容失败: {e}")
-            return "\n\n> **嵌入快照**: 解析失败\n\n"
+        # 解析嵌套的doc内容
+        doc_content = embed_data.get("doc", "")
+        if not doc_content:
+            return self.SNAPSHOT_EMPTY
+        # 同一篇文档中相同的快照只解析一次
+        return self.renderer.render_snapshot(doc_content)
+
+    @staticmethod
+    def quote_snapshot(content):
+        """把快照内容的每一行(包括空行)加上引用前缀"""
+        return "\n\n> " + content.strip().replace('\n', '\n> ') + "\n\n"
 
     def handle_webpage(self, embed_data):
         """处理网页嵌入类型"""
@@ -290,8 +272,8 @@ class EmbedStrategy(BaseStrategy):
 
 class TableStrategy(BaseStrategy):
 
-    def __init__(self, data):
-        super().__init__(data)
+    def __init__(self, data, comment_groups, renderer):
+        super().__init__(data, comment_groups, renderer)
 
     def to_text(self, row):
         cols = row["cols"]
@@ -299,23 +281,19 @@ class TableStrategy(BaseStrategy):
         children = row["children"]
 
         # 下面的代码需要考虑 self.data[child_id][0]["text"] 是 空的情况
+        data = self.data
         children_text = []
+        append = children_text.append
         for child_id in children:
-            text_ = self.data[child_id][0]["text"][0]['insert'] if self.data[child_id][0]["text"] else ''
-            children_text.append(text_)
-        headers = children_text[:cols]
-        body = children_text[cols:]
-
-        markdown_table = "|".join(headers)
-        markdown_table = "|" + markdown_table + "|\n"
-        markdown_table += "| " + " | ".join(["-----"] * cols) + " |\n"
+            cell_text = data[child_id][0]["text"]
+            append(cell_text[0]['insert'] if cell_text else '')
 
+        table = ['\n|', '|'.join(children_text[:cols]), '|\n', '| ', ' | '.join(['-----'] * cols), ' |\n']
         # 对 body 按照 cols slice
-        body_rows = [body[i:i + cols] for i in range(0, len(body), cols)]
-
-        for body_row in body_rows:
-            markdown_table += "|" + "|".join(body_row) + "|\n"
-        return '\n' + markdown_table + '\n'
+        for i in range(cols, len(children_text), cols):
+            table += ('|', '|'.join(children_text[i:i + cols]), '|\n')
+        table.append('\n')
+        return ''.join(table)
 
 
 class BlockTextConverter:
@@ -423,30 +401,118 @@ class MarkdownConverter:
 
     @staticmethod
     def to_text(data, block_row):
-        strategy: BaseStrategy = MarkdownConverter.create_strategy(data, block_row)
-        return strategy.to_text(block_row)
+        """
+        转换单个 block, 转换整篇文档时使用 DocumentRenderer, 所有 block 共用策略对象和快照缓存
+        """
+        return DocumentRenderer(data).render((block_row,))
 
     @staticmethod
-    def create_strategy(data, json_data):
-        strategy_type = json_data["type"]
-        strategy_class = MarkdownConverter.STRATEGY_MAP.get(strategy_type)
-        if strategy_class:
-            return strategy_class(data)
-        else:
-            log.error(f"Unsupported type: {strategy_type}")
+    def group_comments(data):
+        """
+        把文档的评论按 groupId 分组, 查找同组的评论时不再遍历全部评论
+        :return: {groupId: [(评论id, 评论), ...]}, 组内保持评论在文档中的顺序
+        """
+        comment_groups = {}
+        for comment_id, comment_data in data.get('comments', {}).items():
+            comment_groups.setdefault(comment_data.get('groupId'), []).append((comment_id, comment_data))
+        return comment_groups
+
+
+class DocumentRenderer:
+    """
+    把一篇协作文档的 blocks 转成 markdown.
+    每种 block 类型只创建一个策略对象, 按类型分发到策略的 to_text, 所有 block 的输出写入同一个列表后一次拼接.
+    快照的解析结果按 doc 原文缓存, 嵌套的快照共用同一个缓存
+    """
+
+    def __init__(self, data, snapshot_cache=None):
+        self.data = data
+        comment_groups = MarkdownConverter.group_comments(data)
+        self._dispatch = {block_type: strategy_class(data, comment_groups, self).to_text
+                          for block_type, strategy_class in MarkdownConverter.STRATEGY_MAP.items()}
+        self._snapshot_cache = {} if snapshot_cache is None else snapshot_cache
+
+    def render(self, blocks):
+        dispatch = self._dispatch
+        output = []
+        append = output.append
+        for block_row in blocks:
+            to_text = dispatch.get(block_row["type"])
+            if to_text is None:
+                log.error(f"Unsupported type: {block_row['type']}")
+                raise Exception(f'不支持的协作笔记 block 类型: {block_row["type"]}')
+            append(to_text(block_row))
+        return ''.join(output)
+
+    def render_snapshot(self, doc_content):
+        """
+        :param doc_content: 快照的 doc 原文
+        :return: 引用块格式的快照内容
+        """
+        content = self._snapshot_cache.get(doc_content)
+        if content is None:
+            try:
+                doc_json = json.loads(doc_content)
+                # 嵌套 doc 有自己的数据和评论
+                nested = DocumentRenderer(doc_json, self._snapshot_cache)
+                content = EmbedStrategy.quote_snapshot(nested.render(doc_json.get("blocks", [])))
+            except (json.JSONDecodeError, KeyError) as e:
+                log.error(f"解析snapshot嵌入内容失败: {e}")
+                content = EmbedStrategy.SNAPSHOT_FAILED
+            self._snapshot_cache[doc_content] = content
+        return content
 
 
 class CollaborationNoteParser(NoteParser):
+    # 原始内容超过这个字符数时逐个 block 解析和转换, 不一次解析整篇文档
+    INCREMENTAL_DECODE_MIN_CHARS = 4 * 1024 * 1024
+
     def parse_content(self, origin_content):
         markdown_content = self.parse(origin_content)
         file_content = NoteFixer.fix(markdown_content)
         return file_content
 
     def parse(self, origin_content):
-        log.info(f'协作笔记解析笔记 原始内容: \n {origin_content}')
+        log.info(f'协作笔记解析笔记 原始内容: \n {payload_summary(origin_content)}')
+        if len(origin_content) >= self.INCREMENTAL_DECODE_MIN_CHARS:
+            return self._parse_incremental(origin_content)
         json_content = json.loads(origin_content)
-        text = []
-        for block_row in json_content['data']['data']["blocks"]:
-            text.append(MarkdownConverter.to_text(json_content['data']['data'], block_row))
-        content = ''.join(text)
-        return content
\ No newline at end of file
+        data = json_content['data']['data']
+        return DocumentRenderer(data).render(data["blocks"])
+
+    @staticmethod
+    def _parse_incremental(origin_content):
+        """
+        先扫描一遍 data.data, 只记录 blocks 中每个 block 和其他成员(表格单元格、代码块、评论等)的位置,
+        扫描时跳过的值不保留解析后的对象; 转换时再按位置逐个解析. 同一时间只持有一个 block 和少量成员解析后的对象
+        """
+        scanner = JsonScanner(origin_content)
+        offsets = None
+        block_offsets = None
+        for key in scanner.members():
+            if key != 'data':
+                scanner.skip()
+                continue
+            for doc_key in scanner.members():
+                if doc_key != 'data':
+                    scanner.skip()
+                    continue
+                offsets = {}
+                block_offsets = None
+                for data_key in scanner.members():
+                    # 已经逐个遍历到每个值, 跳过时不需要再逐层展开
+                    if data_key == 'blocks':
+                        block_offsets = []
+                        for block_idx in scanner.items():
+                            block_offsets.append(block_idx)
+                            scanner.skip(depth=0)
+                    else:
+                        offsets[data_key] = scanner.idx
+                        scanner.skip(depth=0)
+        scanner.end()
+        if offsets is None:
+            raise KeyError('data')
+        if block_offsets is None:
+            raise KeyError('blocks')
+        data = LazyJsonObject(origin_content, offsets)
+        return DocumentRenderer(data).render(JsonScanner(origin_content, idx).value() for idx in block_offsets)
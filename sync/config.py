@@ -21,12 +21,117 @@ if not os.path.exists(dotenv_path):
 log.info(f"环境变量文件路径: {dotenv_path}")
 load_dotenv(dotenv_path)
 
+
+def _get_int_env(name, default):
+    """
+    读取整数类型的环境变量, 未配置或格式错误时返回默认值
+    """
+    value = os.getenv(name)
+    if value is None or value.strip() == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        log.warning(f'环境变量 {name}={value} 不是合法的整数, 使用默认值 {default}')
+        return default
+
+
+def _get_bool_env(name, default):
+    """
+    读取布尔类型的环境变量, 支持 true/false, 1/0, yes/no
+    """
+    value = os.getenv(name)
+    if value is None or value.strip() == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _get_stage_workers_env(name):
+    """
+    读取流水线各阶段的线程数, 格式为 阶段=线程数, 多个阶段用逗号分隔, 例如 content=8,parse=2
+    """
+    value = os.getenv(name)
+    if value is None or value.strip() == '':
+        return {}
+    stage_workers = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        stage, _, workers = item.partition('=')
+        try:
+            stage_workers[stage.strip()] = max(1, int(workers))
+        except ValueError:
+            log.warning(f'环境变量 {name} 中的 {item.strip()} 不是合法的 阶段=线程数, 已忽略')
+    return stage_workers
+
+
+def _get_options_env(name):
+    """
+    读取 选项=值 格式的环境变量, 多个选项用逗号分隔, 例如 body_width=0,inline_links=false.
+    值为整数或 true/false 时转换为对应的类型, 其他保留为字符串
+    """
+    value = os.getenv(name)
+    if value is None or value.strip() == '':
+        return {}
+    options = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        option, separator, option_value = item.partition('=')
+        if not separator or not option.strip():
+            log.warning(f'环境变量 {name} 中的 {item.strip()} 不是合法的 选项=值, 已忽略')
+            continue
+        option_value = option_value.strip()
+        if option_value.lower() in ('true', 'false'):
+            option_value = option_value.lower() == 'true'
+        else:
+            try:
+                option_value = int(option_value)
+            except ValueError:
+                pass
+        options[option.strip()] = option_value
+    return options
+
+
 class Config:
+    # 默认同步并发数
+    DEFAULT_SYNC_WORKERS = 4
+    # 默认每篇笔记同时下载的图片/附件数
+    DEFAULT_RESOURCE_WORKERS = 4
+    # 默认流水线每个阶段的队列长度
+    DEFAULT_PIPELINE_QUEUE_SIZE = 16
 
-    def __init__(self, user_id, password, group_name):
+    def __init__(self, user_id, password, group_name, sync_workers=DEFAULT_SYNC_WORKERS, sync_async=False,
+                 resource_workers=DEFAULT_RESOURCE_WORKERS, db_performance_mode=False, sql_profile=False,
+                 sql_profile_output='', sync_pipeline=False, pipeline_workers=None,
+                 pipeline_queue_size=DEFAULT_PIPELINE_QUEUE_SIZE, parse_processes=0, html_engine='html2text',
+                 html_engine_options=None):
         self.user_id = user_id
         self.password = password
         self.group_name = group_name
+        # 同时同步的笔记数, 1 表示逐条同步
+        self.sync_workers = max(1, sync_workers)
+        # 是否使用 asyncio 客户端并发获取笔记列表和笔记内容
+        self.sync_async = sync_async
+        # 每篇笔记同时下载的图片/附件数, 1 表示逐个下载
+        self.resource_workers = max(1, resource_workers)
+        # 数据库性能模式: WAL, synchronous=NORMAL, 同步状态合并提交
+        self.db_performance_mode = db_performance_mode
+        # 是否统计 sql 执行次数和耗时, 结束时输出汇总
+        self.sql_profile = sql_profile
+        # sql 统计汇总写入的 json 文件, 为空时打印到日志
+        self.sql_profile_output = sql_profile_output
+        # 是否按阶段流水线同步笔记
+        self.sync_pipeline = sync_pipeline
+        # 流水线各阶段的线程数, 未配置的阶段使用默认值
+        self.pipeline_workers = pipeline_workers or {}
+        # 流水线每个阶段的队列长度, 决定在途笔记数的上限
+        self.pipeline_queue_size = max(1, pipeline_queue_size)
+        # 解析笔记的子进程数, 0 表示在同步线程中解析
+        self.parse_processes = max(0, parse_processes)
+        # 普通笔记 html 转 markdown 的引擎和选项
+        self.html_engine = html_engine
+        self.html_engine_options = html_engine_options or {}
 
     @classmethod
     def load(cls):
@@ -34,11 +139,29 @@ class Config:
         user_id = os.getenv("WIZ_USER_ID")
         password = os.getenv("WIZ_PASSWORD")
         group_name = os.getenv("WIZ_GROUP_NAME")
+        sync_workers = _get_int_env("WIZ_SYNC_WORKERS", cls.DEFAULT_SYNC_WORKERS)
+        sync_async = _get_bool_env("WIZ_SYNC_ASYNC", False)
+        resource_workers = _get_int_env("WIZ_RESOURCE_WORKERS", cls.DEFAULT_RESOURCE_WORKERS)
+        db_performance_mode = _get_bool_env("WIZ_DB_PERFORMANCE_MODE", False)
+        sql_profile = _get_bool_env("WIZ_SQL_PROFILE", False)
+        sql_profile_output = os.getenv("WIZ_SQL_PROFILE_OUTPUT", "")
+        sync_pipeline = _get_bool_env("WIZ_SYNC_PIPELINE", False)
+        pipeline_workers = _get_stage_workers_env("WIZ_PIPELINE_WORKERS")
+        pipeline_queue_size = _get_int_env("WIZ_PIPELINE_QUEUE_SIZE", cls.DEFAULT_PIPELINE_QUEUE_SIZE)
+        parse_processes = _get_int_env("WIZ_PARSE_PROCESSES", 0)
+        html_engine = os.getenv("WIZ_HTML_ENGINE", "").strip() or "html2text"
+        html_engine_options = _get_options_env("WIZ_HTML_ENGINE_OPTIONS")
 
         if not user_id or not password:
             raise ValueError("请在 .env 文件中设置 WIZ_USER_ID 和 WIZ_PASSWORD")
         
         # group_name 是可选的
-        return cls(user_id, password, group_name if group_name else "")
+        return cls(user_id, password, group_name if group_name else "", sync_workers=sync_workers,
+                   sync_async=sync_async, resource_workers=resource_workers,
+                   db_performance_mode=db_performance_mode, sql_profile=sql_profile,
+                   sql_profile_output=sql_profile_output, sync_pipeline=sync_pipeline,
+                   pipeline_workers=pipeline_workers, pipeline_queue_size=pipeline_queue_size,
+                   parse_processes=parse_processes, html_engine=html_engine,
+                   html_engine_options=html_engine_options)
 
-config = Config.load()
\ No newline at end of file
+config = Config.load()
@@ -4,16 +4,58 @@ import os
 import json
 import datetime
 import sys
+import threading
+import time
+from functools import wraps
+
+from sync.db_migrations import migrate
+
+
+def synchronized(func):
+    """
+    多个同步线程共用同一个数据库连接, 通过连接级别的锁串行化所有数据库操作
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return func(self, *args, **kwargs)
+    return wrapper
 
 
 class Database:
+    # 性能模式下合并提交: 每同步 N 篇笔记或距上次提交超过 T 秒时提交一次
+    COMMIT_EVERY_NOTES = 50
+    COMMIT_INTERVAL_S = 2.0
+    # 性能模式下的页缓存大小(KiB)
+    CACHE_SIZE_KIB = 64 * 1024
+    # 单条语句绑定的参数上限, SQLite 旧版本默认为 999
+    MAX_SQL_VARIABLES = 900
+
+    def __init__(self, db_path=None, performance_mode=False, commit_every_notes=COMMIT_EVERY_NOTES,
+                 commit_interval_s=COMMIT_INTERVAL_S, profiler=None):
+        """
+        :param db_path: 数据库文件路径, 为空时使用 output/db/sync.db
+        :param performance_mode: 性能模式, 使用 WAL 和 synchronous=NORMAL, 同步状态的写入合并提交.
+            进程异常退出时可能丢失最后一批未提交的同步状态, 这些笔记会在下次运行时重新同步
+        :param commit_every_notes: 性能模式下每同步多少篇笔记提交一次
+        :param commit_interval_s: 性能模式下最长多少秒提交一次
+        :param profiler: SqlProfiler, 不为空时统计每条 sql 的执行次数和耗时, 关闭连接时输出汇总
+        """
+        self.db_path = db_path
+        self.conn = None
+        self.lock = threading.RLock()
+        self.performance_mode = performance_mode
+        self.commit_every_notes = max(1, commit_every_notes)
+        self.commit_interval_s = commit_interval_s
+        # 未提交的笔记同步状态数
+        self._pending_notes = 0
+        self._last_commit_time = time.monotonic()
+        # 同步状态写入实际提交的次数
+        self.commit_count = 0
+        self.profiler = profiler
 
     @staticmethod
-    def trace_callback(statement):
-        log.info(f"{statement}")
-
-    def __enter__(self):
-        log.info(os.getcwd())
+    def default_db_path():
         # 获取应用程序的根目录路径
         if getattr(sys, "frozen", False):
             # 如果是打包后的可执行文件
@@ -21,26 +63,98 @@ class Database:
         else:
             # 如果是开发环境
             application_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            
+
         # 确保数据库目录存在
         db_dir = os.path.join(application_path, 'output', 'db')
         os.makedirs(db_dir, exist_ok=True)
-        
+        return os.path.join(db_dir, 'sync.db')
+
+    def __enter__(self):
+        log.info(os.getcwd())
         # 连接数据库并返回实例以供使用
-        db_path = os.path.join(db_dir, 'sync.db')
+        db_path = self.db_path or Database.default_db_path()
         log.info(f"数据库路径: {db_path}")
-        self.conn = sqlite3.connect(db_path)
-        self.conn.set_trace_callback(Database.trace_callback)
+        # 连接会被同步线程池中的多个线程使用, 由 self.lock 保证串行访问
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        if self.performance_mode:
+            self._apply_performance_pragmas()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         # 关闭连接，即使遇到异常也会执行
-        self.conn.close()
+        with self.lock:
+            try:
+                # 提交合并中的同步状态
+                self.flush()
+            finally:
+                self.conn.close()
+                if self.profiler is not None:
+                    self.profiler.report()
+
+    def _apply_performance_pragmas(self):
+        # WAL 模式下 synchronous=NORMAL 只在检查点时 fsync, 断电不会损坏数据库, 只可能丢失最近的提交
+        journal_mode = self.conn.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(f'PRAGMA cache_size=-{self.CACHE_SIZE_KIB}')
+        self.conn.execute('PRAGMA temp_store=MEMORY')
+        log.info(f'数据库性能模式: journal_mode={journal_mode}, synchronous=NORMAL, cache_size={self.CACHE_SIZE_KIB}KiB')
+
+    @synchronized
+    def flush(self):
+        """
+        立即提交合并中的写入
+        """
+        if self.conn.in_transaction:
+            self.conn.commit()
+            self.commit_count += 1
+        self._pending_notes = 0
+        self._last_commit_time = time.monotonic()
+
+    def _run(self, cursor, sql, params=(), many=False, fetch=None):
+        """
+        执行 sql, 开启 sql 统计时记录耗时和返回/影响的行数
+        :param many: 是否使用 executemany, 此时 params 为参数列表
+        :param fetch: 'one' 或 'all' 时返回查询结果, 否则返回 cursor
+        """
+        start = time.perf_counter() if self.profiler is not None else 0.0
+        if many:
+            cursor.executemany(sql, params)
+        else:
+            cursor.execute(sql, params)
+        if fetch == 'one':
+            result = cursor.fetchone()
+            rows = 0 if result is None else 1
+        elif fetch == 'all':
+            result = cursor.fetchall()
+            rows = len(result)
+        else:
+            result = cursor
+            rows = cursor.rowcount
+        if self.profiler is not None:
+            self.profiler.record(sql, time.perf_counter() - start, rows)
+        return result
 
-    def execute(self, query):
+    def _commit(self, notes=0):
+        """
+        提交同步状态的写入. 普通模式下立即提交; 性能模式下累计到 commit_every_notes 篇笔记或超过 commit_interval_s 秒才提交
+        :param notes: 本次写入完成的笔记数
+        """
+        if not self.performance_mode:
+            self.conn.commit()
+            self.commit_count += 1
+            return
+        self._pending_notes += notes
+        if (self._pending_notes >= self.commit_every_notes
+                or time.monotonic() - self._last_commit_time >= self.commit_interval_s):
+            self.flush()
+
+    @synchronized
+    def execute(self, query, params=()):
+        # 先提交合并中的写入, 出错回滚时不影响它们
+        self.flush()
         cursor = self.conn.cursor()
         try:
-            cursor.execute(query)
+            self._run(cursor, query, params)
             self.conn.commit()
         except Exception as e:
             log.exception(f"execute error occurred: ")
@@ -48,12 +162,18 @@ class Database:
         finally:
             cursor.close()
 
-    def query(self, query):
+    @synchronized
+    def query(self, query, params=()):
+        """
+        执行查询
+        :param query: sql, 使用 ? 占位符
+        :param params: 占位符对应的参数
+        :return: 字典列表
+        """
         cursor = self.conn.cursor()
         results = None
         try:
-            cursor.execute(query)
-            results = cursor.fetchall()
+            results = self._run(cursor, query, params, fetch='all')
             # 获取列名
             columns = [col[0] for col in cursor.description]
 
@@ -66,65 +186,57 @@ class Database:
         finally:
             cursor.close()
 
+    @synchronized
+    def query_in(self, query, values, params=()):
+        """
+        执行带 IN 列表的查询, values 按 SQLite 变量数上限分批绑定
+        :param query: sql, 其中的 {placeholders} 会替换为 IN 列表的占位符, 例如 WHERE doc_guid IN ({placeholders})
+        :param values: IN 列表的值
+        :param params: IN 列表之前的其他参数
+        :return: 所有批次结果合并后的字典列表
+        """
+        values = list(values)
+        rows = []
+        chunk_size = self.MAX_SQL_VARIABLES - len(params)
+        for start in range(0, len(values), chunk_size):
+            chunk = values[start:start + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            rows.extend(self.query(query.format(placeholders=placeholders), (*params, *chunk)))
+        return rows
+
+    @synchronized
     def init(self):
-        cursor = self.conn.cursor()
-
-        # 创建笔记同步记录表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS note_sync_rec (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, -- 记录的唯一标识符，自增主键
-                doc_guid TEXT NOT NULL UNIQUE, -- 文档的全局唯一标识符
-                type TEXT, -- 文档的类型
-                title TEXT NOT NULL, -- 文档的标题
-                category TEXT, -- 文档的分类
-                created INTEGER, -- 文档创建时间
-                accessed INTEGER, -- 最后访问时间
-                url TEXT, -- 文档的链接
-                sync_status INTEGER, -- 同步状态（0为未同步，1为已同步）
-                fail_reason TEXT, -- 同步失败的原因
-                sync_time TEXT,-- 同步成功时间
-                create_time TIMESTAMP default (datetime('now', 'localtime')),
-                update_time TIMESTAMP default (datetime('now', 'localtime'))
-            )
-        ''')
-
-        # 创建笔记图片同步记录表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS note_image_sync_rec (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, -- 图片的唯一标识符，自增主键
-                doc_guid TEXT NOT NULL, -- 关联文档的全局唯一标识符
-                file_name TEXT NOT NULL, -- 图片名称
-                upload_url TEXT,-- 上传图片地址
-                created INTEGER, -- 图片添加时间
-                sync_status INTEGER, -- 同步状态（0为未同步，1为已同步）
-                fail_reason TEXT, -- 同步失败的原因
-                sync_time TEXT,-- 同步成功时间
-                create_time TIMESTAMP default (datetime('now', 'localtime')),
-                update_time TIMESTAMP default (datetime('now', 'localtime'))
-            )
-        ''')
-
-        # 提交创建表的事务
-        self.conn.commit()
-        # 使用完后，关闭cursor
-        cursor.close()
+        """
+        创建或升级数据库结构
+        """
+        # 先提交合并中的写入, 结构变更在单独的事务中执行
+        self.flush()
+        version = migrate(self.conn)
+        log.info(f'数据库结构版本: {version}')
 
+    @synchronized
     def get_pending_sync_note_list(self, wiz_note_list):
+        """
+        获取数据库中还不存在的笔记
+        :param wiz_note_list: 为知笔记列表
+        :return: 需要插入的笔记
+        """
         # 如果wiz_note_list 是空, 直接返回空集合
         if not wiz_note_list:
             return []
 
-        # wiz_note_list map doc_guid, 去数据库中查询是否存在, 获取不存在的笔记id集合
-        doc_guids = ','.join(map(lambda note: f"'{note['docGuid']}'", wiz_note_list))
-        not_in_db_notes = self.query(f"SELECT doc_guid FROM note_sync_rec WHERE doc_guid IN ({doc_guids})")
-
-        log.info(f"not_in_db_notes: {not_in_db_notes}")
-        if not not_in_db_notes:
-            return wiz_note_list
+        # 查询已存在的 doc_guid
+        rows = self.query_in(
+            "SELECT doc_guid FROM note_sync_rec WHERE doc_guid IN ({placeholders})",
+            {note['docGuid'] for note in wiz_note_list},
+        )
+        in_db_doc_guids = {row['doc_guid'] for row in rows}
+        log.info(f"in_db_notes: {len(in_db_doc_guids)}/{len(wiz_note_list)}")
 
         # wiz_note_list filter 不存在的笔记id, 返回过滤后的笔记
-        return list(filter(lambda note: note['docGuid'] not in not_in_db_notes, wiz_note_list))
+        return [note for note in wiz_note_list if note['docGuid'] not in in_db_doc_guids]
 
+    @synchronized
     def insert_note_list(self, note_list):
         if not note_list:
             return
@@ -132,17 +244,18 @@ class Database:
         # 将 note_list 转换为 data, 为了 executemany
         data = list(map(lambda note: (note['docGuid'], note['type'], note['title'],
                                       note['category'], note['created'], note['accessed'],
-                                      note['url'], 0),
+                                      note['url'], 0, note.get('version')),
                         note_list))
 
         # 将note_list中的笔记插入到数据库中
+        self.flush()
         cursor = self.conn.cursor()
-        cursor.execute('BEGIN TRANSACTION')
+        self._run(cursor, 'BEGIN TRANSACTION')
         try:
-            cursor.executemany('''
-                INSERT OR IGNORE INTO note_sync_rec (doc_guid, type, title, category, created, accessed, url, sync_status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', data)
+            self._run(cursor, '''
+                INSERT OR IGNORE INTO note_sync_rec (doc_guid, type, title, category, created, accessed, url, sync_status, version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', data, many=True)
             self.conn.commit()
         except Exception as e:
             log.exception(f"insert_note_list error occurred: ")
@@ -150,15 +263,120 @@ class Database:
         finally:
             cursor.close()
 
-    def get_unsync_note_list(self, max_version, page_size):
-        rows = self.query(f'''
-            SELECT id, doc_guid, type, title, category, created, accessed, url FROM note_sync_rec
-            WHERE sync_status in (0, -1) and id > {max_version}
-            LIMIT {page_size}
-        ''')
-        return [dict(row) for row in rows]
+    @synchronized
+    def mark_updated_notes_for_resync(self, note_list):
+        """
+        为知中版本号比记录中新的笔记(笔记被编辑过)和没有版本号的旧记录, 更新笔记信息并重置为未同步
+        :param note_list: 为知笔记列表
+        :return: 需要重新同步的笔记数
+        """
+        if not note_list:
+            return 0
+
+        self.flush()
+        cursor = self.conn.cursor()
+        try:
+            data = [{'type': note['type'], 'title': note['title'], 'category': note['category'],
+                     'created': note['created'], 'accessed': note['accessed'], 'url': note['url'],
+                     'version': note['version'], 'doc_guid': note['docGuid']}
+                    for note in note_list]
+            # 已写入过本地的笔记标题或分类变化时, 记录旧的标题和分类, 写入新文件后删除旧文件.
+            # 多次变化但还没有重新写入时保留最早的记录, 中间的路径没有写入过文件
+            self._run(cursor, '''
+                UPDATE note_sync_rec
+                SET prev_title = CASE WHEN prev_title IS NULL AND (content_hash IS NOT NULL OR sync_status = 1)
+                        AND (title IS NOT :title OR category IS NOT :category) THEN title ELSE prev_title END,
+                    prev_category = CASE WHEN prev_title IS NULL AND (content_hash IS NOT NULL OR sync_status = 1)
+                        AND (title IS NOT :title OR category IS NOT :category) THEN category ELSE prev_category END,
+                    type = :type, title = :title, category = :category, created = :created, accessed = :accessed,
+                    url = :url, version = :version,
+                    sync_status = 0, fail_reason = NULL, update_time = datetime('now', 'localtime')
+                WHERE doc_guid = :doc_guid AND (version < :version OR version IS NULL)
+            ''', data, many=True)
+            # 旧版本的记录没有版本号, 不知道上次同步后是否编辑过, 补齐版本号时重新同步一次
+            resync_count = cursor.rowcount
+            self.conn.commit()
+            return resync_count
+        except Exception as e:
+            log.exception(f"mark_updated_notes_for_resync error occurred: ")
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _watermark_key(kb_guid):
+        # 个人知识库和群组知识库共用同一个数据库, 版本号按知识库分别记录
+        return f'wiz_version:{kb_guid}'
+
+    @synchronized
+    def get_sync_watermark(self, kb_guid):
+        """
+        获取知识库已同步到的最大为知笔记版本号, 从未同步过返回 None
+        """
+        cursor = self.conn.cursor()
+        try:
+            row = self._run(cursor, "SELECT value FROM sync_meta WHERE key = ?", (self._watermark_key(kb_guid),),
+                            fetch='one')
+            return int(row[0]) if row else None
+        finally:
+            cursor.close()
+
+    @synchronized
+    def set_sync_watermark(self, kb_guid, version):
+        cursor = self.conn.cursor()
+        try:
+            self._run(cursor, '''
+                INSERT INTO sync_meta (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value, update_time = datetime('now', 'localtime')
+            ''', (self._watermark_key(kb_guid), str(version)))
+            self.conn.commit()
+        finally:
+            cursor.close()
+
+    @synchronized
+    def get_resource_blob(self, resource_key):
+        """
+        获取资源对应的内容 sha256 和大小
+        :return: (sha256, size), 没有记录时返回 None
+        """
+        cursor = self.conn.cursor()
+        try:
+            row = self._run(cursor, "SELECT sha256, size FROM resource_blob WHERE resource_key = ?", (resource_key,), fetch='one')
+            return (row[0], row[1]) if row else None
+        finally:
+            cursor.close()
 
+    @synchronized
+    def save_resource_blob(self, resource_key, sha256, size):
+        cursor = self.conn.cursor()
+        try:
+            self._run(cursor, '''
+                INSERT INTO resource_blob (resource_key, sha256, size) VALUES (?, ?, ?)
+                ON CONFLICT(resource_key) DO UPDATE SET sha256 = excluded.sha256, size = excluded.size,
+                    update_time = datetime('now', 'localtime')
+            ''', (resource_key, sha256, size))
+            self._commit()
+        finally:
+            cursor.close()
 
+    @synchronized
+    def get_unsync_note_list(self, last_id, page_size):
+        """
+        按 id 顺序获取 id 大于 last_id 的未同步或同步失败的笔记
+        :param last_id: 上一页最后一条记录的 id, 第一页为 0
+        :param page_size: 每页的数量
+        """
+        rows = self.query('''
+            SELECT id, doc_guid, type, title, category, created, accessed, url, content_hash, prev_title, prev_category
+            FROM note_sync_rec
+            WHERE sync_status in (0, -1) and id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, page_size))
+        return [dict(row) for row in rows]
+
+    @synchronized
     def get_uploaded_images(self, doc_guid, need_upload_images):
         """
         获取已经上传过的图片(即使上传失败了)
@@ -166,16 +384,31 @@ class Database:
         :param need_upload_images:
         :return:
         """
-        # need_upload_images 需要 join,
-        need_upload_images = ','.join(map(lambda image: f"'{image}'", need_upload_images))
-
-        rows = self.query(f'''
+        if not need_upload_images:
+            return []
+        rows = self.query_in('''
             SELECT file_name FROM note_image_sync_rec
-            WHERE doc_guid = '{doc_guid}' and file_name in ({need_upload_images})
-        ''')
+            WHERE doc_guid = ? and file_name in ({placeholders})
+        ''', need_upload_images, params=(doc_guid,))
         # 提取其中的 file_name 作为list 返回
-        return list(map(lambda row: row['file_name'], rows))
+        return [row['file_name'] for row in rows]
 
+    @synchronized
+    def get_uploaded_image_urls(self, doc_guid, img_file_names):
+        """
+        获取已经处理成功的图片地址, 笔记重新同步时复用
+        :return: <图片名称, 图片地址>
+        """
+        if not img_file_names:
+            return {}
+        rows = self.query_in('''
+            SELECT file_name, upload_url FROM note_image_sync_rec
+            WHERE doc_guid = ? AND sync_status = 1 AND upload_url IS NOT NULL AND upload_url != ''
+            AND file_name IN ({placeholders})
+        ''', img_file_names, params=(doc_guid,))
+        return {row['file_name']: row['upload_url'] for row in rows}
+
+    @synchronized
     def create_image_upload_record(self, doc_guid, img_file_name):
         """
         插入同步图片记录, 初始化同步状态为0
@@ -184,12 +417,14 @@ class Database:
         :return:
         """
         cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO note_image_sync_rec (doc_guid, file_name, sync_status)
+        # 重新同步时图片记录已存在, 沿用已有记录
+        self._run(cursor, '''
+            INSERT OR IGNORE INTO note_image_sync_rec (doc_guid, file_name, sync_status)
             VALUES (?, ?, 0)
         ''', (doc_guid, img_file_name))
-        self.conn.commit()
+        self._commit()
 
+    @synchronized
     def update_note_sync_status(self, doc_guid, sync_status, fail_reason):
         log.info(f"update_note_sync_status: {doc_guid}, {sync_status}, {fail_reason}")
 
@@ -200,17 +435,53 @@ class Database:
             # 同步成功
             # 根据你的具体数据表结构和字段名，执行更新同步时间的操作
             update_query = "UPDATE note_sync_rec SET sync_time = datetime('now'), sync_status = 1 WHERE doc_guid = ?"
-            cursor.execute(update_query, (doc_guid,))
+            self._run(cursor, update_query, (doc_guid,))
         else:
             # 同步失败
             # 根据你的具体数据表结构和字段名，执行更新同步失败原因的操作
             update_query = "UPDATE note_sync_rec SET fail_reason = ? , sync_status = -1 WHERE doc_guid = ?"
-            cursor.execute(update_query, (fail_reason, doc_guid))
+            self._run(cursor, update_query, (fail_reason, doc_guid))
 
         # 提交事务
-        self.conn.commit()
+        self._commit(notes=1)
         cursor.close()
 
+    @synchronized
+    def clear_note_previous_path(self, doc_guid):
+        """
+        旧路径的文件已处理, 清除记录的旧标题和分类
+        """
+        cursor = self.conn.cursor()
+        self._run(cursor, "UPDATE note_sync_rec SET prev_title = NULL, prev_category = NULL WHERE doc_guid = ?",
+                  (doc_guid,))
+        self._commit()
+        cursor.close()
+
+    @synchronized
+    def is_note_path_used(self, category, title, doc_guid):
+        """
+        :return: 除 doc_guid 以外是否还有笔记使用这个标题和分类, 有时旧路径的文件属于其他笔记, 不能删除
+        """
+        cursor = self.conn.cursor()
+        try:
+            row = self._run(cursor, '''
+                SELECT 1 FROM note_sync_rec WHERE category = ? AND title = ? AND doc_guid != ? LIMIT 1
+            ''', (category, title, doc_guid), fetch='one')
+            return row is not None
+        finally:
+            cursor.close()
+
+    @synchronized
+    def update_note_content_hash(self, doc_guid, content_hash):
+        """
+        记录写入本地的笔记内容的 hash
+        """
+        cursor = self.conn.cursor()
+        self._run(cursor, "UPDATE note_sync_rec SET content_hash = ? WHERE doc_guid = ?", (content_hash, doc_guid))
+        self._commit()
+        cursor.close()
+
+    @synchronized
     def update_img_sync_status(self, doc_guid,img_file_name, sync_status, fail_reason, upload_url):
         log.info(f"update_img_sync_status: {doc_guid}, {img_file_name}, {sync_status}, {fail_reason}")
 
@@ -222,25 +493,24 @@ class Database:
             current_time = datetime.datetime.now()
             # 根据你的具体数据表结构和字段名，执行更新同步时间的操作
             update_query = "UPDATE note_image_sync_rec SET sync_time = datetime('now'),upload_url = ?, sync_status = 1 WHERE doc_guid = ? and file_name = ?"
-            cursor.execute(update_query, (upload_url, doc_guid, img_file_name))
+            self._run(cursor, update_query, (upload_url, doc_guid, img_file_name))
         else:
             # 同步失败
             # 根据你的具体数据表结构和字段名，执行更新同步失败原因的操作
             update_query = "UPDATE note_image_sync_rec SET fail_reason = ? , sync_status = -1 WHERE doc_guid = ? and file_name = ?"
-            cursor.execute(update_query, (fail_reason, doc_guid, img_file_name))
+            self._run(cursor, update_query, (fail_reason, doc_guid, img_file_name))
         cursor.close()
 
+    @synchronized
     def get_note_count(self):
-        return self.query(f'''
+        return self.query('''
             SELECT count(*) as cnt FROM note_sync_rec
         ''')[0]['cnt']
 
+    @synchronized
     def select_by_guid(self, doc_guid):
-        rows = self.query(f'''
-            SELECT id, doc_guid, type, title, category, created, accessed, url FROM note_sync_rec
-            WHERE doc_guid = '{doc_guid}'
-        ''')
+        rows = self.query('''
+            SELECT id, doc_guid, type, title, category, created, accessed, url, content_hash FROM note_sync_rec
+            WHERE doc_guid = ?
+        ''', (doc_guid,))
         return rows[0]
-
-
-
@@ -0,0 +1,173 @@
+from log import log
+
+
+def _create_sync_tables(cursor):
+    # 创建笔记同步记录表
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS note_sync_rec (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, -- 记录的唯一标识符，自增主键
+            doc_guid TEXT NOT NULL UNIQUE, -- 文档的全局唯一标识符
+            type TEXT, -- 文档的类型
+            title TEXT NOT NULL, -- 文档的标题
+            category TEXT, -- 文档的分类
+            created INTEGER, -- 文档创建时间
+            accessed INTEGER, -- 最后访问时间
+            url TEXT, -- 文档的链接
+            sync_status INTEGER, -- 同步状态（0为未同步，1为已同步）
+            fail_reason TEXT, -- 同步失败的原因
+            sync_time TEXT,-- 同步成功时间
+            create_time TIMESTAMP default (datetime('now', 'localtime')),
+            update_time TIMESTAMP default (datetime('now', 'localtime'))
+        )
+    ''')
+
+    # 创建笔记图片同步记录表
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS note_image_sync_rec (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, -- 图片的唯一标识符，自增主键
+            doc_guid TEXT NOT NULL, -- 关联文档的全局唯一标识符
+            file_name TEXT NOT NULL, -- 图片名称
+            upload_url TEXT,-- 上传图片地址
+            created INTEGER, -- 图片添加时间
+            sync_status INTEGER, -- 同步状态（0为未同步，1为已同步）
+            fail_reason TEXT, -- 同步失败的原因
+            sync_time TEXT,-- 同步成功时间
+            create_time TIMESTAMP default (datetime('now', 'localtime')),
+            update_time TIMESTAMP default (datetime('now', 'localtime'))
+        )
+    ''')
+
+
+def _create_sync_meta_table(cursor):
+    # 同步元数据表, 记录已同步到的为知笔记版本号等
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_meta (
+            key TEXT PRIMARY KEY, -- 元数据名称
+            value TEXT, -- 元数据值
+            update_time TIMESTAMP default (datetime('now', 'localtime'))
+        )
+    ''')
+
+
+def _add_note_version(cursor):
+    # 旧版本创建的表没有 version 列
+    _add_column_if_absent(cursor, 'note_sync_rec', 'version', 'INTEGER')
+
+
+def _add_note_content_hash(cursor):
+    # 写入本地的笔记内容的 sha256, 内容不变时不再重写文件
+    _add_column_if_absent(cursor, 'note_sync_rec', 'content_hash', 'TEXT')
+
+
+def _create_resource_blob_table(cursor):
+    # 资源索引表, 记录为知图片/附件对应的内容 sha256, 已下载过的资源直接从内容存储中链接
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS resource_blob (
+            resource_key TEXT PRIMARY KEY, -- 资源标识, 例如 attachment:<doc_guid>/<att_guid>
+            sha256 TEXT NOT NULL, -- 资源内容的 sha256
+            size INTEGER, -- 资源大小(字节)
+            update_time TIMESTAMP default (datetime('now', 'localtime'))
+        )
+    ''')
+
+
+def _unique_image_record(cursor):
+    # 笔记重新同步时会重复插入图片记录, 每个 (doc_guid, file_name) 只保留一条: 优先保留已上传的, 其次保留最新的
+    cursor.execute('''
+        DELETE FROM note_image_sync_rec WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY doc_guid, file_name ORDER BY sync_status = 1 DESC, id DESC
+                ) AS rn
+                FROM note_image_sync_rec
+            ) WHERE rn = 1
+        )
+    ''')
+    log.info(f'删除重复的图片同步记录: {cursor.rowcount} 条')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS uk_note_image_sync_rec_doc_file
+        ON note_image_sync_rec (doc_guid, file_name)
+    ''')
+
+
+def _index_unsync_notes(cursor):
+    # 按 id 分页读取未同步的笔记. 部分索引只包含待同步的记录且按 id 有序, 分页查询不需要再排序;
+    # WHERE 条件必须和 Database.get_unsync_note_list 的查询条件一致才会被使用
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_note_sync_rec_unsync_id
+        ON note_sync_rec (id) WHERE sync_status IN (0, -1)
+    ''')
+
+
+def _add_note_previous_path(cursor):
+    # 标题或分类变化后, 记录上次写入本地时的标题和分类, 写入新路径后删除旧文件
+    _add_column_if_absent(cursor, 'note_sync_rec', 'prev_title', 'TEXT')
+    _add_column_if_absent(cursor, 'note_sync_rec', 'prev_category', 'TEXT')
+
+
+def _remove_global_watermark(cursor):
+    # 之前的版本号不区分知识库, 无法判断属于哪个知识库, 删除后各知识库从头获取一次笔记列表
+    cursor.execute("DELETE FROM sync_meta WHERE key = 'wiz_version'")
+
+
+def _add_column_if_absent(cursor, table, column, column_type):
+    columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()]
+    if column not in columns:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+
+
+# 数据库结构的变更步骤, 按版本号顺序执行, 已发布的步骤不能修改, 新的变更追加到末尾.
+# 引入版本管理之前创建的数据库已有部分表和列, 所以前几个步骤需要可以重复执行
+MIGRATIONS = [
+    (1, '创建笔记和图片同步记录表', _create_sync_tables),
+    (2, 'note_sync_rec 增加 version 列', _add_note_version),
+    (3, '创建同步元数据表 sync_meta', _create_sync_meta_table),
+    (4, 'note_sync_rec 增加 content_hash 列', _add_note_content_hash),
+    (5, '创建资源索引表 resource_blob', _create_resource_blob_table),
+    (6, 'note_image_sync_rec 去重并建立 (doc_guid, file_name) 唯一索引', _unique_image_record),
+    (7, 'note_sync_rec 建立待同步记录的 id 部分索引', _index_unsync_notes),
+    (8, 'note_sync_rec 增加 prev_title, prev_category 列', _add_note_previous_path),
+    (9, 'sync_meta 删除不区分知识库的 wiz_version', _remove_global_watermark),
+]
+
+
+def get_schema_version(conn):
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def migrate(conn, migrations=None):
+    """
+    执行还没有执行过的变更步骤, 每个步骤在单独的事务中执行并记录到 schema_version
+    :param conn: sqlite3 连接
+    :param migrations: 变更步骤, 默认为 MIGRATIONS
+    :return: 执行后的版本号
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY, -- 变更步骤的版本号
+            description TEXT, -- 变更内容
+            applied_time TIMESTAMP default (datetime('now', 'localtime'))
+        )
+    ''')
+    conn.commit()
+
+    current_version = get_schema_version(conn)
+    for version, description, step in migrations:
+        if version <= current_version:
+            continue
+        log.info(f'数据库结构升级: {current_version} -> {version} {description}')
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN')
+            step(cursor)
+            cursor.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)', (version, description))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f'数据库结构升级失败: version={version} {description}, 错误: {e}') from e
+        finally:
+            cursor.close()
+        current_version = version
+    return current_version
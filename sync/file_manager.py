@@ -1,12 +1,21 @@
 import os
 import sys
+import tempfile
+import threading
+from contextlib import ExitStack, contextmanager, nullcontext
 from log import log
+from sync.partial_file import PartialFile
 import requests
 
 
 class FileManager:
     # 应用程序根目录缓存
     _app_root = None
+    # 输出路径 -> 锁, 避免多个同步线程同时写同一个文件
+    _path_locks = {}
+    _path_locks_guard = threading.Lock()
+    # 流式下载每次写入的分块大小
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
     @staticmethod
     def get_app_root():
@@ -20,21 +29,83 @@ class FileManager:
                 FileManager._app_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         return FileManager._app_root
 
+    @staticmethod
+    def path_lock(path):
+        """
+        获取输出路径对应的锁, 同一路径总是返回同一把锁
+        :param path: 文件路径
+        :return: threading.RLock
+        """
+        key = os.path.normcase(os.path.abspath(path))
+        with FileManager._path_locks_guard:
+            lock = FileManager._path_locks.get(key)
+            if lock is None:
+                lock = threading.RLock()
+                FileManager._path_locks[key] = lock
+            return lock
+
+    @staticmethod
+    @contextmanager
+    def path_locks(paths):
+        """
+        按固定顺序获取多个路径的锁, 避免多线程之间相互等待造成死锁
+        :param paths: 文件路径集合
+        """
+        keys = sorted({os.path.normcase(os.path.abspath(path)) for path in paths})
+        with ExitStack() as stack:
+            for key in keys:
+                stack.enter_context(FileManager.path_lock(key))
+            yield
+
     @staticmethod
     def _create_directory(directory_path):
         os.makedirs(directory_path, exist_ok=True)
 
+    @staticmethod
+    def _atomic_write(file_path, content, mode):
+        """
+        先写入同目录下的临时文件, 再整体替换目标文件, 避免读到写了一半的文件
+        """
+        if 'b' in mode:
+            FileManager._atomic_stream_write(file_path, lambda file: file.write(content))
+        else:
+            FileManager._atomic_stream_write(file_path, lambda file: file.write(content), encoding='utf-8')
+
+    @staticmethod
+    def _atomic_stream_write(file_path, write_func, encoding=None, path_locked=False):
+        """
+        打开同目录下的临时文件交给 write_func 写入, 成功后整体替换目标文件, 失败时删除临时文件.
+        下载时边接收边写盘, 不需要在内存中缓存整个文件
+        :param write_func: 接收打开的临时文件对象
+        :param path_locked: 该路径的锁已由调用方(可能是其他线程)持有, 不再获取
+        :return: write_func 的返回值
+        """
+        directory_path, file_name = os.path.split(file_path)
+        with (nullcontext() if path_locked else FileManager.path_lock(file_path)):
+            fd, tmp_path = tempfile.mkstemp(prefix=f'.{file_name}.', suffix='.tmp', dir=directory_path)
+            try:
+                if encoding is None:
+                    file = os.fdopen(fd, 'wb')
+                else:
+                    file = os.fdopen(fd, 'w', encoding=encoding)
+                with file:
+                    result = write_func(file)
+                os.replace(tmp_path, file_path)
+                return result
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
     @staticmethod
     def _write_file(directory_path, file_name, content):
         file_path = os.path.join(directory_path, file_name)
-        with open(file_path, "w", encoding='utf-8') as file:
-            file.write(content)
+        FileManager._atomic_write(file_path, content, "w")
 
     @staticmethod
     def _write_bfile(directory_path, file_name, content):
         file_path = os.path.join(directory_path, file_name)
-        with open(file_path, "wb") as file:
-            file.write(content)
+        FileManager._atomic_write(file_path, content, "wb")
 
     @staticmethod
     def sanitize_filename(filename):
@@ -65,27 +136,53 @@ class FileManager:
         return safe_filename
 
     @staticmethod
-    def save_md_to_file(category, title, content):
+    def get_md_file_path(category, title):
         """
-        保存md文件
+        获取笔记 md 文件的路径
         :param category:  笔记的目录 eg: /xx1/xx2/
         :param title: 笔记标题
-        :param content:
-        :return:
+        :return: md 文件的绝对路径
         """
         # 使用绝对路径
         app_root = FileManager.get_app_root()
         output_directory = os.path.join(app_root, "output", "note", category.strip("/").replace("/", os.path.sep))
-        FileManager._create_directory(output_directory)
 
         # 清理标题，确保文件名安全
         safe_title = FileManager.sanitize_filename(title)
-        
+
         # 如果 title 是以 .md 结尾, 新文件的文件名无需添加 .md
         if safe_title.endswith(".md"):
             safe_title = safe_title[:-3]
 
-        FileManager._write_file(output_directory, safe_title + '.md', content)
+        return os.path.join(output_directory, safe_title + '.md')
+
+    @staticmethod
+    def save_md_to_file(category, title, content):
+        """
+        保存md文件
+        :param category:  笔记的目录 eg: /xx1/xx2/
+        :param title: 笔记标题
+        :param content:
+        :return: md 文件的绝对路径
+        """
+        file_path = FileManager.get_md_file_path(category, title)
+        output_directory, file_name = os.path.split(file_path)
+        FileManager._create_directory(output_directory)
+        FileManager._write_file(output_directory, file_name, content)
+        return file_path
+
+    @staticmethod
+    def remove_md_file(category, title):
+        """
+        删除笔记 md 文件, 写入同一路径的线程持有路径锁时等待写入结束
+        :return: 是否删除了文件
+        """
+        file_path = FileManager.get_md_file_path(category, title)
+        with FileManager.path_lock(file_path):
+            if not os.path.exists(file_path):
+                return False
+            os.remove(file_path)
+            return True
 
     # 保存图片到本地
     @staticmethod
@@ -107,6 +204,25 @@ class FileManager:
         app_root = FileManager.get_app_root()
         return os.path.join(app_root, "output", "note", record['category'].strip("/").replace("/", os.path.sep), "images")
 
+    @staticmethod
+    def move_image(from_record, to_record, img_file_name):
+        """
+        把图片从 from_record 分类的 ./images/ 移动到 to_record 分类的 ./images/, 目标已存在时不移动
+        :return: 目标分类下是否有这张图片
+        """
+        target_directory = FileManager.get_img_directory(to_record)
+        target_path = os.path.join(target_directory, img_file_name)
+        source_path = os.path.join(FileManager.get_img_directory(from_record), img_file_name)
+        with FileManager.path_locks([source_path, target_path]):
+            if os.path.exists(target_path):
+                return True
+            if not os.path.exists(source_path):
+                return False
+            FileManager._create_directory(target_directory)
+            os.replace(source_path, target_path)
+            log.info(f"move_image {source_path} -> {target_path}")
+            return True
+
     @staticmethod
     def get_attachments_directory(record):
         """
@@ -117,6 +233,13 @@ class FileManager:
         app_root = FileManager.get_app_root()
         return os.path.join(app_root, "output", "note", record['category'].strip("/").replace("/", os.path.sep), "attachments")
 
+    @staticmethod
+    def get_blob_directory():
+        """
+        获取按内容寻址的图片/附件存储目录: output/blobs
+        """
+        return os.path.join(FileManager.get_app_root(), "output", "blobs")
+
     @staticmethod
     def image_file_is_not_exist(record, img_file_name):
         img_directory = FileManager.get_img_directory(record)
@@ -124,26 +247,41 @@ class FileManager:
         return not os.path.exists(full_path)
 
     @staticmethod
-    def download_img_from_url(record, img_file_name, url):
+    def download_img_from_url(record, img_file_name, url, session=None, path_locked=False):
+        """
+        下载图片到笔记同级目录 ./images/
+        :param session: 复用连接的 requests.Session, 为空时使用 requests 单独建立连接
+        :param path_locked: 图片路径的锁已由调用方持有
+        """
         img_directory = FileManager.get_img_directory(record)
         FileManager._create_directory(img_directory)
         full_path = os.path.join(img_directory, img_file_name)
         log.info(f"download_img_from_url {full_path}")
 
-        response = requests.get(url)
-        response.raise_for_status()  # 检查请求是否成功
-        with open(full_path, 'wb') as file:
-            file.write(response.content)
+        if session is not None:
+            # 图片地址可能不在为知域名下, 不携带会话默认的 X-Wiz-Token
+            response = session.get(url, headers={'X-Wiz-Token': None}, stream=True)
+        else:
+            response = requests.get(url, stream=True)
+        with response:
+            response.raise_for_status()  # 检查请求是否成功
+            FileManager._atomic_stream_write(full_path, lambda file: FileManager._copy_response(response, file),
+                                             path_locked=path_locked)
         log.info(f"文件下载完成 {img_file_name}")
 
+    @staticmethod
+    def _copy_response(response, file):
+        for chunk in response.iter_content(chunk_size=FileManager.DOWNLOAD_CHUNK_SIZE):
+            if chunk:
+                file.write(chunk)
+
     @staticmethod
     def download_img_from_byte(record, img_file_name, byte):
         img_directory = FileManager.get_img_directory(record)
         FileManager._create_directory(img_directory)
         full_path = os.path.join(img_directory, img_file_name)
         log.info(f"download_img_from_byte {full_path}")
-        with open(full_path, "wb") as file:
-            file.write(byte)
+        FileManager._write_bfile(img_directory, img_file_name, byte)
 
     @staticmethod
     def download_attachment_from_byte(record, att_file_name, byte_content):
@@ -158,9 +296,37 @@ class FileManager:
         FileManager._create_directory(attachments_directory)
         full_path = os.path.join(attachments_directory, att_file_name)
         log.info(f"download_attachment_from_byte {full_path}")
-        with open(full_path, "wb") as file:
-            file.write(byte_content)
+        FileManager._write_bfile(attachments_directory, att_file_name, byte_content)
+
+    @staticmethod
+    def download_img_from_stream(record, img_file_name, download_func, path_locked=False):
+        """
+        下载图片到笔记同级目录 ./images/, 下载内容直接写入临时文件, 完成后重命名为目标文件
+        :param download_func: 接收打开的文件对象, 把图片内容写入其中
+        :param path_locked: 图片路径的锁已由调用方持有
+        """
+        img_directory = FileManager.get_img_directory(record)
+        FileManager._create_directory(img_directory)
+        full_path = os.path.join(img_directory, img_file_name)
+        log.info(f"download_img_from_stream {full_path}")
+        FileManager._atomic_stream_write(full_path, download_func, path_locked=path_locked)
 
+    @staticmethod
+    def download_attachment_resumable(record, att_file_name, download_func):
+        """
+        断点续传下载附件: 下载内容写入 .part 文件, 失败时保留已接收的部分, 下次调用从断点继续, 完成后重命名为目标文件
+        :param record: 笔记同步记录
+        :param att_file_name: 附件文件名
+        :param download_func: 接收 PartialFile 对象, 从 offset 处继续写入附件内容
+        """
+        attachments_directory = FileManager.get_attachments_directory(record)
+        FileManager._create_directory(attachments_directory)
+        full_path = os.path.join(attachments_directory, att_file_name)
+        log.info(f"download_attachment_resumable {full_path}")
+        with FileManager.path_lock(full_path):
+            with PartialFile(full_path) as part:
+                download_func(part)
+                part.commit()
 
     @staticmethod
     def get_not_in_local_img(record, need_upload_images):
@@ -1,13 +1,16 @@
+from sync.html_to_markdown import get_engine
 from sync.note_parser import NoteParser
 from sync.note_fixer import NoteFixer
-import html2text
 
 
 class HtmlNoteParser(NoteParser):
+    def __init__(self, engine=None):
+        # html 转 markdown 的引擎, 为空时使用 configure_engine 设置的引擎
+        self.engine = engine
+
     def parse_content(self, origin_content):
-        markdown_content = html2text.html2text(origin_content)
+        engine = self.engine or get_engine()
+        markdown_content = engine.convert(origin_content)
         # 一些后置处理
         file_content = NoteFixer.fix(markdown_content)
         return file_content
-
-
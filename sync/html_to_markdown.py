@@ -0,0 +1,106 @@
+import threading
+from abc import ABC, abstractmethod
+
+import html2text
+
+from log import log
+
+
+class HtmlToMarkdownEngine(ABC):
+    """
+    html 转 markdown 的引擎, 同一个引擎会被多个同步线程同时使用
+    """
+    name = None
+
+    @abstractmethod
+    def convert(self, html):
+        pass
+
+
+class Html2TextEngine(HtmlToMarkdownEngine):
+    """
+    使用 html2text 转换. 不设置选项时与 html2text.html2text() 的输出一致.
+    HTML2Text 会保留上一篇文档的解析状态, 每次转换创建一个新的实例并应用选项, 多个线程之间不共享实例
+    """
+    name = 'html2text'
+
+    def __init__(self, **options):
+        """
+        :param options: HTML2Text 的属性, 例如 body_width=0 不自动换行, inline_links=False 使用引用式链接,
+                        ignore_images=True 忽略图片
+        """
+        probe = html2text.HTML2Text()
+        for option in options:
+            if option.startswith('_') or not hasattr(probe, option) or callable(getattr(probe, option)):
+                raise Exception(f'不支持的 html2text 选项: {option}')
+        self.options = options
+
+    def _converter(self):
+        converter = html2text.HTML2Text()
+        for option, value in self.options.items():
+            setattr(converter, option, value)
+        return converter
+
+    def convert(self, html):
+        return self._converter().handle(html)
+
+
+# 可选的引擎, 其他实现(例如更快的转换库)注册后通过名称选择
+ENGINES = {
+    Html2TextEngine.name: Html2TextEngine,
+}
+
+_default_engine = None
+_default_engine_config = (Html2TextEngine.name, {})
+_default_engine_lock = threading.Lock()
+
+
+def register_engine(engine_class):
+    """
+    注册引擎, 引擎类需要有 name 属性, 构造参数为引擎的选项
+    """
+    ENGINES[engine_class.name] = engine_class
+
+
+def create_engine(name=Html2TextEngine.name, options=None):
+    """
+    :param name: 引擎名称
+    :param options: 引擎的选项
+    :return: HtmlToMarkdownEngine
+    """
+    engine_class = ENGINES.get(name)
+    if engine_class is None:
+        raise Exception(f'不支持的 html 转换引擎: {name}, 可选: {", ".join(ENGINES)}')
+    return engine_class(**(options or {}))
+
+
+def configure_engine(name=Html2TextEngine.name, options=None):
+    """
+    设置解析普通笔记使用的引擎, 解析进程池的子进程启动时也会调用
+    """
+    global _default_engine, _default_engine_config
+    engine = create_engine(name, options)
+    with _default_engine_lock:
+        _default_engine = engine
+        _default_engine_config = (name, dict(options or {}))
+    if options:
+        log.info(f'html 转换引擎: {name}, 选项: {options}')
+
+
+def get_engine_config():
+    """
+    :return: 当前引擎的 (名称, 选项), 用于在子进程中创建相同的引擎
+    """
+    with _default_engine_lock:
+        return _default_engine_config
+
+
+def get_engine():
+    """
+    :return: 当前使用的引擎, 没有设置时使用默认选项的 html2text
+    """
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            _default_engine = create_engine(*_default_engine_config)
+        return _default_engine
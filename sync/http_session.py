@@ -0,0 +1,87 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class _StatsHTTPAdapter(HTTPAdapter):
+    """
+    连接池被淘汰或关闭时先回调 on_pool_disposed, 由会话累加池上的计数
+    """
+
+    def __init__(self, on_pool_disposed, **kwargs):
+        # HTTPAdapter.__init__ 中会调用 init_poolmanager, 需要先设置回调
+        self._on_pool_disposed = on_pool_disposed
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        pools = self.poolmanager.pools
+        dispose = pools.dispose_func
+
+        def dispose_pool(pool):
+            self._on_pool_disposed(pool)
+            if dispose is not None:
+                dispose(pool)
+
+        pools.dispose_func = dispose_pool
+
+
+class WizHttpSession(requests.Session):
+    """
+    为知 http 请求共用的会话: 复用 keep-alive 连接, 统一设置默认请求头, 并统计连接复用情况
+    """
+    # 每个 host 的最大空闲连接数
+    DEFAULT_POOL_MAXSIZE = 10
+    # 缓存连接池的 host 数, 为知会用到 as/kb/资源等多个域名
+    DEFAULT_POOL_CONNECTIONS = 10
+
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_connections=DEFAULT_POOL_CONNECTIONS):
+        super().__init__()
+        self.pool_maxsize = pool_maxsize
+        # 已淘汰或关闭的连接池上的计数, 连接池只缓存 pool_connections 个 host, 计数保存在会话上才不会丢失
+        self._disposed_requests = 0
+        self._disposed_connections = 0
+        self._stats_lock = threading.Lock()
+        adapter = _StatsHTTPAdapter(self._count_disposed_pool, pool_connections=pool_connections,
+                                    pool_maxsize=pool_maxsize)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+        self.headers['Connection'] = 'keep-alive'
+
+    def set_token(self, token):
+        """
+        设置默认请求头 X-Wiz-Token, 之后的请求无需再单独传入
+        """
+        self.headers['X-Wiz-Token'] = token
+
+    def _count_disposed_pool(self, pool):
+        with self._stats_lock:
+            self._disposed_requests += pool.num_requests
+            self._disposed_connections += pool.num_connections
+
+    def stats(self):
+        """
+        统计连接池情况: 新建连接数和复用连接数, 用于确认 keep-alive 节省的握手次数
+        :return: dict
+        """
+        with self._stats_lock:
+            connections_opened = self._disposed_connections
+            request_count = self._disposed_requests
+        pool_count = 0
+        adapters = {id(adapter): adapter for adapter in self.adapters.values()}
+        for adapter in adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                pool_count += 1
+                connections_opened += pool.num_connections
+                request_count += pool.num_requests
+        return {
+            'pools': pool_count,
+            'requests': request_count,
+            'connections_opened': connections_opened,
+            'connections_reused': max(0, request_count - connections_opened),
+        }
@@ -1,10 +1,16 @@
 import os
 import datetime
+import threading
+import time
 from sync.file_manager import FileManager
 from log import log # 导入 log
 
 
 class ImageHandler:
+    # 多个同步线程可能在同一毫秒生成相同的文件名, 生成和重命名需要串行
+    _rename_lock = threading.Lock()
+    # 处理后的图片地址前缀, 相对笔记所在目录
+    RELATIVE_URL_PREFIX = './images/'
 
     @staticmethod
     def handle(record, image_name):
@@ -25,21 +31,26 @@ class ImageHandler:
 
         # 提取文件扩展名
         _, ext = os.path.splitext(image_name)
-        # 生成新文件名 (YYYYMMDDHHMMSSmmm)
-        new_name_part = datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')[:-3]
-        new_image_name = f"{new_name_part}{ext}"
-        new_img_path = os.path.join(base_img_directory, new_image_name)
+        with ImageHandler._rename_lock:
+            # 生成新文件名 (YYYYMMDDHHMMSSmmm), 文件名已被占用时等待下一毫秒
+            while True:
+                new_name_part = datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')[:-3]
+                new_image_name = f"{new_name_part}{ext}"
+                new_img_path = os.path.join(base_img_directory, new_image_name)
+                if not os.path.exists(new_img_path):
+                    break
+                time.sleep(0.001)
 
-        # 重命名文件
-        try:
-            os.rename(old_img_path, new_img_path)
-            log.info(f"Image renamed from {old_img_path} to {new_img_path}") # 使用 log.info
-        except OSError as e:
-            log.error(f"Error renaming file {old_img_path} to {new_img_path}: {e}") # 使用 log.error
-            return None # 或者根据需要返回错误指示
+            # 重命名文件
+            try:
+                os.rename(old_img_path, new_img_path)
+                log.info(f"Image renamed from {old_img_path} to {new_img_path}") # 使用 log.info
+            except OSError as e:
+                log.error(f"Error renaming file {old_img_path} to {new_img_path}: {e}") # 使用 log.error
+                return None # 或者根据需要返回错误指示
 
         # 返回相对路径 ./images/new_image_name.ext
         # 注意: 这里必须使用 POSIX 风格的分隔符，以保证 Obsidian 等 Markdown 渲染器识别
         # 避免在 Windows 下出现 .\images\xxx 的反斜杠路径
-        relative_path = f"./images/{new_image_name}"
+        relative_path = f"{ImageHandler.RELATIVE_URL_PREFIX}{new_image_name}"
         return relative_path
@@ -19,6 +19,7 @@ def init_output_dirs():
         os.path.join(application_path, 'output', 'db'),
         os.path.join(application_path, 'output', 'log'),
         os.path.join(application_path, 'output', 'note'),
+        os.path.join(application_path, 'output', 'blobs'),
     ]
     
     # 创建目录
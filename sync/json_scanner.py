@@ -0,0 +1,186 @@
+import json
+import re
+from collections import OrderedDict
+from collections.abc import Mapping
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# 成员的键和冒号, 键中没有转义字符时不需要再解析
+_MEMBER_KEY = re.compile(r'[ \t\n\r]*"([^"\\]*(?:\\.[^"\\]*)*)"[ \t\n\r]*:[ \t\n\r]*', re.DOTALL)
+_DELIMITER = re.compile(r'[ \t\n\r]*([,}\]])')
+_DECODER = json.JSONDecoder()
+# 跳过值时使用, 解析出的对象直接丢弃
+_DISCARD_DECODER = json.JSONDecoder(object_pairs_hook=lambda pairs: None)
+
+
+def _scan_value(scan_once, text, idx):
+    """
+    解析 idx 处的值. 成员的值和数组元素的位置已经跳过了空白, 直接调用 scan_once, 失败时再跳过空白重试
+    :param scan_once: JSONDecoder.scan_once
+    :return: (值, 值之后的位置)
+    """
+    try:
+        return scan_once(text, idx)
+    except StopIteration:
+        pass
+    idx = _WHITESPACE.match(text, idx).end()
+    try:
+        return scan_once(text, idx)
+    except StopIteration as err:
+        raise json.JSONDecodeError('Expecting value', text, err.value) from None
+
+
+class JsonScanner:
+    """
+    在 json 文本上逐个成员、逐个元素地解析, 只把当前需要的值解析成 Python 对象.
+    用于很大的协作笔记: 不需要同时持有整篇文档解析后的对象.
+    members() 和 items() 返回生成器, 每次产出后游标停在成员值或数组元素的开头,
+    调用方在继续迭代前必须消费这个值(value() / skip() / members() / items()).
+    """
+
+    # 跳过对象时逐个成员解析的层数. 协作笔记 data.data 有上万个成员, 一次解析会同时持有所有成员
+    SKIP_MEMBER_DEPTH = 2
+
+    def __init__(self, text, idx=0):
+        self.text = text
+        self.idx = idx
+
+    def _skip_whitespace(self):
+        self.idx = _WHITESPACE.match(self.text, self.idx).end()
+
+    def _expect(self, char):
+        self._skip_whitespace()
+        if not self.text.startswith(char, self.idx):
+            raise json.JSONDecodeError(f'Expecting {char!r}', self.text, self.idx)
+        self.idx += 1
+
+    def _at_end(self, close):
+        """
+        读取成员或元素之后的分隔符
+        :return: 是否读到结束符
+        """
+        match = _DELIMITER.match(self.text, self.idx)
+        if match is None or match.group(1) not in (',', close):
+            raise json.JSONDecodeError("Expecting ',' delimiter", self.text, self.idx)
+        self.idx = match.end()
+        return match.group(1) == close
+
+    def end(self):
+        """
+        确认游标之后只有空白, 与 json.loads 一样拒绝多余的内容
+        """
+        self._skip_whitespace()
+        if self.idx != len(self.text):
+            raise json.JSONDecodeError('Extra data', self.text, self.idx)
+
+    def value(self):
+        """
+        解析游标处的一个完整的值
+        """
+        value, self.idx = _scan_value(_DECODER.scan_once, self.text, self.idx)
+        return value
+
+    def skip(self, depth=SKIP_MEMBER_DEPTH):
+        """
+        跳过游标处的值. 与 value() 一样校验格式, 但不保留解析出的对象
+        :param depth: 对象逐个成员跳过的层数
+        """
+        if depth:
+            self._skip_whitespace()
+            if self.text.startswith('{', self.idx):
+                for _ in self.members():
+                    self.skip(depth - 1)
+                return
+        _, self.idx = _scan_value(_DISCARD_DECODER.scan_once, self.text, self.idx)
+
+    def members(self):
+        """
+        遍历游标处的对象
+        :return: 生成器, 依次产出成员的键
+        """
+        text = self.text
+        self._expect('{')
+        self._skip_whitespace()
+        if text.startswith('}', self.idx):
+            self.idx += 1
+            return
+        while True:
+            match = _MEMBER_KEY.match(text, self.idx)
+            if match is None:
+                raise json.JSONDecodeError('Expecting property name enclosed in double quotes', text, self.idx)
+            key = match.group(1)
+            if '\\' in key:
+                key = _DECODER.decode(f'"{key}"')
+            self.idx = match.end()
+            yield key
+            # 与 _at_end('}') 相同, 成员很多时内联以减少调用
+            match = _DELIMITER.match(text, self.idx)
+            if match is None:
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, self.idx)
+            delimiter = match.group(1)
+            if delimiter == '}':
+                self.idx = match.end()
+                return
+            if delimiter != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, self.idx)
+            self.idx = match.end()
+
+    def items(self):
+        """
+        遍历游标处的数组
+        :return: 生成器, 每个元素产出一次元素的起始位置
+        """
+        self._expect('[')
+        self._skip_whitespace()
+        if self.text.startswith(']', self.idx):
+            self.idx += 1
+            return
+        while True:
+            self._skip_whitespace()
+            yield self.idx
+            if self._at_end(']'):
+                return
+
+    def values(self):
+        """
+        逐个解析游标处数组的元素
+        :return: 生成器, 依次产出元素
+        """
+        for _ in self.items():
+            yield self.value()
+
+
+class LazyJsonObject(Mapping):
+    """
+    访问成员时才解析的 json 对象, 只保存每个成员值在文本中的位置.
+    保留最近访问的 CACHE_SIZE 个值, 反复访问的成员(例如评论)不会重复解析
+    """
+    CACHE_SIZE = 64
+
+    def __init__(self, text, offsets, cache_size=CACHE_SIZE):
+        """
+        :param offsets: {键: 值在 text 中的起始位置}
+        """
+        self.text = text
+        self._offsets = offsets
+        self._cache = OrderedDict()
+        self.cache_size = cache_size
+
+    def __getitem__(self, key):
+        cache = self._cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        value = _scan_value(_DECODER.scan_once, self.text, self._offsets[key])[0]
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def __contains__(self, key):
+        return key in self._offsets
+
+    def __iter__(self):
+        return iter(self._offsets)
+
+    def __len__(self):
+        return len(self._offsets)
@@ -1,9 +1,26 @@
+import re
+
 from sync.note_parser import NoteParser
 from bs4 import BeautifulSoup
 from sync.note_fixer import NoteFixer
 
 
 class LiteNoteParser(NoteParser):
+    # 轻量笔记的 markdown 原文在 body 下的第一个 pre 标签中
+    _BODY_OPEN = re.compile(r'<body(?:\s(?:[^<>"\']|"[^"]*"|\'[^\']*\')*)?>', re.IGNORECASE)
+    _PRE_OPEN = re.compile(r'<pre(?:\s(?:[^<>"\']|"[^"]*"|\'[^\']*\')*)?>', re.IGNORECASE)
+    _PRE_CLOSE = re.compile(r'</pre\s*>', re.IGNORECASE)
+    _BODY_CLOSE = re.compile(r'</body', re.IGNORECASE)
+    # 注释、CDATA、处理指令、script 和 style 会改变后面内容的解析方式, 出现在 pre 之前时交给 BeautifulSoup
+    _SPECIAL_MARKUP = re.compile(r'<!--|<!\[|<\?|<script|<style', re.IGNORECASE)
+    # 属性值中的 < 会让正则把属性值里的 <body / <pre 当成标签, 出现在 pre 之前时交给 BeautifulSoup
+    _QUOTED_LT = re.compile(r'=\s*(?:"[^"]*<|\'[^\']*<)')
+    # 快速路径只解码结果和 BeautifulSoup 一致的字符引用, 其他 & 后面跟字母或数字时交给 BeautifulSoup
+    _UNSUPPORTED_ENTITY = re.compile(r'&(?!(?:amp|lt|gt|quot|nbsp);)(?=[0-9A-Za-z])')
+    _NUMERIC_ENTITY = re.compile(r'&#(?:(\d{1,7})|[xX]([0-9a-fA-F]{1,6}))?(;?)')
+    # 按顺序替换, &amp; 最后替换, 避免 &amp;lt; 被解码两次
+    _NAMED_ENTITIES = (('&lt;', '<'), ('&gt;', '>'), ('&quot;', '"'), ('&nbsp;', '\xa0'), ('&amp;', '&'))
+
     def parse_content(self, origin_content):
         markdown_content = self.parse(origin_content)
         file_content = NoteFixer.fix(markdown_content)
@@ -11,6 +28,93 @@ class LiteNoteParser(NoteParser):
 
     @staticmethod
     def parse(origin_content):
+        # 结构规整的笔记直接截取 pre 中的文本, 不构建整棵 DOM 树
+        text_content = LiteNoteParser._parse_fast(origin_content)
+        if text_content is None:
+            text_content = LiteNoteParser._parse_with_soup(origin_content)
+        return text_content
+
+    @staticmethod
+    def _parse_fast(origin_content):
+        """
+        用正则截取 body 下第一个 pre 中的文本并解码字符引用
+        :return: pre 中的文本, 内容不规整、结果可能和 BeautifulSoup 不一致时返回 None
+        """
+        body_match = LiteNoteParser._BODY_OPEN.search(origin_content)
+        if body_match is None:
+            return None
+        pre_match = LiteNoteParser._PRE_OPEN.search(origin_content, body_match.end())
+        if pre_match is None:
+            return None
+        if LiteNoteParser._SPECIAL_MARKUP.search(origin_content, 0, pre_match.start()):
+            return None
+        if LiteNoteParser._inside_tag(origin_content, body_match.start()) \
+                or LiteNoteParser._inside_tag(origin_content, pre_match.start()):
+            return None
+        if LiteNoteParser._QUOTED_LT.search(origin_content, 0, pre_match.end()):
+            return None
+        # pre 在 body 结束之后时不属于 body
+        if LiteNoteParser._BODY_CLOSE.search(origin_content, body_match.end(), pre_match.start()):
+            return None
+        close_match = LiteNoteParser._PRE_CLOSE.search(origin_content, pre_match.end())
+        if close_match is None:
+            return None
+
+        text = origin_content[pre_match.end():close_match.start()]
+        # pre 中有子标签时, 文本需要拼接各个子节点, 交给 BeautifulSoup
+        if '<' in text:
+            return None
+        if '&' not in text:
+            return text
+        if LiteNoteParser._UNSUPPORTED_ENTITY.search(text):
+            return None
+        if '&#' in text:
+            text = LiteNoteParser._decode_numeric_entities(text)
+            if text is None:
+                return None
+        for entity, char in LiteNoteParser._NAMED_ENTITIES:
+            text = text.replace(entity, char)
+        return text
+
+    @staticmethod
+    def _inside_tag(origin_content, position):
+        """
+        :return: position 之前最后一个 < 之后没有 >, 即 position 处于另一个标签的属性中
+        """
+        return origin_content.rfind('<', 0, position) > origin_content.rfind('>', 0, position)
+
+    @staticmethod
+    def _decode_numeric_entities(text):
+        """
+        :return: 解码数字字符引用后的文本, 有格式不完整或需要特殊处理的码位时返回 None
+        """
+        pieces = []
+        position = 0
+        for entity in LiteNoteParser._NUMERIC_ENTITY.finditer(text):
+            decimal, hexadecimal, semicolon = entity.groups()
+            if (decimal is None and hexadecimal is None) or not semicolon:
+                return None
+            code_point = int(decimal) if decimal is not None else int(hexadecimal, 16)
+            if not LiteNoteParser._is_safe_code_point(code_point):
+                return None
+            # 解码出的 & 不能再和后面的文本组成命名字符引用
+            char = chr(code_point)
+            if char == '&':
+                char = '&amp;'
+            pieces.append(text[position:entity.start()])
+            pieces.append(char)
+            position = entity.end()
+        pieces.append(text[position:])
+        return ''.join(pieces)
+
+    @staticmethod
+    def _is_safe_code_point(code_point):
+        # 控制字符、非字符等 html.unescape 会替换或丢弃, 而 BeautifulSoup 原样保留
+        return code_point in (9, 10, 13) or 32 <= code_point < 127 or 160 <= code_point < 0xD800 \
+            or 0xE000 <= code_point < 0xFDD0
+
+    @staticmethod
+    def _parse_with_soup(origin_content):
         # 使用BeautifulSoup解析HTML内容
         soup = BeautifulSoup(origin_content, 'html.parser')
         # 首先找到body标签
@@ -73,17 +73,111 @@ def fix_markdown_list(content):
     return content.replace('\- ', '- ')
 
 
+class _SpaceLineCollapser:
+    """
+    逐段处理 "两个换行 + 空格 + 两个换行" 替换为两个换行, 结果与对整个文本调用一次 str.replace 相同.
+    文本按 (换行数, 内容行) 依次输入, 内容行为 None 表示结束.
+    str.replace 从左到右替换且不重叠: 只有一个空格的行, 前面连续的换行中还没被上一次替换用掉的至少 2 个,
+    后面至少 2 个时被替换, 替换后前后两段换行合并, 下一次替换只能使用后一段中剩下的换行
+    """
+    __slots__ = ('downstream', 'run', 'free', 'pending', 'started')
+
+    def __init__(self, downstream):
+        self.downstream = downstream
+        # 待输出内容行之前的换行数
+        self.run = 0
+        # run 中还没被替换用掉的换行数
+        self.free = 0
+        self.pending = None
+        self.started = False
+
+    def feed(self, run, content):
+        if not self.started:
+            self.started = True
+            self.run = run
+            self.free = run
+        elif self.pending == ' ' and self.free >= 2 and run >= 2:
+            self.run += run - 2
+            self.free = run - 2
+        else:
+            self.downstream.feed(self.run, self.pending)
+            self.run = run
+            self.free = run
+        self.pending = content
+        if content is None:
+            self.downstream.feed(self.run, None)
+
+
+class _Output:
+    __slots__ = ('pieces',)
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+
+    def feed(self, run, content):
+        if run:
+            self.pieces.append('\n' * run)
+        if content is not None:
+            self.pieces.append(content)
+
+
 class NoteFixer:
 
     @staticmethod
     def fix(markdown_content):
-        # 一些后置处理
-        file_content = fix_markdown_title(markdown_content)
-        file_content = fix_markdown_code_block(file_content)
-        file_content = fix_markdown_list(file_content)
-        # 将四个 \n 替换为两个 \n
-        file_content = file_content.replace('\n\n\n\n', '\n\n')
-        file_content = file_content.replace('\n\n \n\n', '\n\n').replace('\n\n \n\n', '\n\n')
-        return file_content
-
+        """
+        一些后置处理, 一次遍历所有行完成: 标题 # 后补空格, 删除代码块中多余的空行, 还原转义的列表符号 -,
+        四个换行替换为两个换行, 删除两个空行之间只有一个空格的行. 结果与依次调用 fix_markdown_title 等函数逐个修复相同
+        """
+        pieces = []
+        # 只有一个空格的行不会由其他修复产生, 原文中没有时不需要逐段判断
+        collapser = None
+        if NoteFixer._has_space_line(markdown_content):
+            # 与逐个修复时一致, 替换执行两次
+            collapser = _SpaceLineCollapser(_SpaceLineCollapser(_Output(pieces)))
+        # 当前内容行之前的换行数, 第一行之前没有换行
+        run = -1
+        # 代码块中的行号, 与 fix_markdown_code_block 相同
+        line_num = 0
+        code_block = False
+        append = pieces.append
+        for line in markdown_content.split('\n'):
+            first_char = line[:1]
+            if first_char == '#':
+                line = fix_markdown_title_line_by_line(line)
+            elif first_char == '`' and line.startswith('```'):
+                code_block = not code_block
+                line_num = 0
+            if code_block:
+                line_num += 1
+                if line_num % 2 == 0:
+                    if not line or line.isspace():
+                        continue
+                    line_num += 1
+
+            run += 1
+            if not line:
+                continue
+            if '\\- ' in line:
+                line = line.replace('\\- ', '- ')
+            # 连续换行中每四个替换为两个
+            if run >= 4:
+                run = run // 4 * 2 + run % 4
+            if collapser is not None:
+                collapser.feed(run, line)
+            else:
+                if run:
+                    append('\n' * run)
+                append(line)
+            run = 0
+        if run >= 4:
+            run = run // 4 * 2 + run % 4
+        if collapser is not None:
+            collapser.feed(run, None)
+        elif run > 0:
+            pieces.append('\n' * run)
+        return ''.join(pieces)
 
+    @staticmethod
+    def _has_space_line(content):
+        return '\n \n' in content or content.startswith(' \n') or content.endswith('\n ') or content == ' '
@@ -0,0 +1,91 @@
+import logging
+import logging.handlers
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from log import log
+from sync.html_to_markdown import configure_engine, get_engine_config
+from sync.note_parser_factory import NoteParserFactory
+
+
+def parse_note(note_type, title, origin_content):
+    """
+    根据笔记类型解析笔记, 在子进程中执行. 入参只有笔记原始内容, 返回 ParsedNote, 都可以 pickle
+    :return: ParsedNote
+    """
+    parser = NoteParserFactory.create_parser(note_type, title)
+    return parser.process_content(origin_content)
+
+
+def _init_worker(log_queue, log_level, engine_name, engine_options):
+    """
+    子进程启动时执行, 只设置解析需要的状态:
+    日志使用主进程的级别, 通过队列交给主进程写入, 子进程不写日志文件, 避免多个进程各自在零点轮转同一个文件;
+    使用和主进程相同的 html 转换引擎
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(log_level)
+    configure_engine(engine_name, engine_options)
+
+
+class NoteParsePool:
+    """
+    在进程池中解析笔记.
+    html2text、BeautifulSoup 和协作笔记的转换都是纯 Python 计算, 在同步线程中执行时持有 GIL,
+    解析大笔记期间其他线程的网络和磁盘操作都会停顿. 放到子进程中解析, 同步线程只等待结果.
+    processes 为 0 时不创建进程池, 在调用线程中解析.
+    """
+
+    # 子进程在第一次提交时由同步线程启动, 此时其他线程可能持有数据库连接、锁和 http 连接池,
+    # fork 会把这些状态复制到子进程, 使用 spawn 启动全新的解释器
+    MP_START_METHOD = 'spawn'
+
+    def __init__(self, processes=0):
+        """
+        :param processes: 子进程数, 0 表示不使用进程池
+        """
+        self.processes = max(0, processes)
+        self._executor = None
+        self._log_queue = None
+        self._log_listener = None
+        if self.processes:
+            context = multiprocessing.get_context(self.MP_START_METHOD)
+            # 子进程的日志由主进程的 handler 输出
+            self._log_queue = context.Queue()
+            self._log_listener = logging.handlers.QueueListener(self._log_queue, *log.handlers,
+                                                                respect_handler_level=True)
+            self._log_listener.start()
+            self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=context,
+                                                 initializer=_init_worker,
+                                                 initargs=(self._log_queue, log.level, *get_engine_config()))
+            log.info(f'笔记解析进程池: {self.processes} 个进程')
+
+    def parse(self, note_type, title, origin_content):
+        """
+        解析笔记, 阻塞到解析完成, 子进程中的异常会在这里重新抛出
+        :return: ParsedNote
+        """
+        if self._executor is None:
+            return parse_note(note_type, title, origin_content)
+        return self._executor.submit(parse_note, note_type, title, origin_content).result()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._log_listener is not None:
+            # 等待子进程的日志全部输出
+            self._log_listener.stop()
+            self._log_listener = None
+            self._log_queue.close()
+            self._log_queue = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,52 +1,231 @@
+import asyncio
+import hashlib
+import os
 import re
+import threading
+from collections import Counter
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from log import log
 import time
+from sync.blob_store import BlobStore
 from sync.database import Database
 from sync.file_manager import FileManager
 from sync.image_handler import ImageHandler
 from sync.image_uploader import ImageUploader
 from sync.note import Note
+from sync.note_parse_pool import NoteParsePool
 from sync.note_parser_factory import NoteParserFactory
 from sync.note_property import NoteProperty
 from sync.parsed_note import ParsedNote
-from sync.wiz_open_api import WizOpenApi
+from sync.resource_fetcher import ResourceFetcher
+from sync.sync_pipeline import PipelineStage, SyncPipeline
+from sync.collaboration_editor_session import HandshakeRejected
+from sync.wiz_open_api import WizOpenApi, WizAuthError
+
+
+class NoteSyncJob:
+    """
+    一篇笔记的同步任务, 在同步的各个步骤之间传递中间结果
+    """
+
+    def __init__(self, record, origin_content=None):
+        self.record = record
+        # 笔记原始内容, 解析后释放
+        self.origin_content = origin_content
+        self.parsed_note = None
+        # 附件下载失败的原因, 为空表示附件全部成功
+        self.attachment_fail_reason = None
 
 
 class NoteSynchronizer:
     # 同步的步长
     PAGE_SIZE = 200
+    # 异步同步时同时获取笔记内容的最大数量
+    ASYNC_FETCH_CONCURRENCY = 100
+    # 资源地址中随每次授权变化的参数(token、签名、过期时间), 生成资源标识时去掉
+    VOLATILE_URL_PARAM = re.compile(r'token|signature|expires|accesskeyid', re.IGNORECASE)
+    # 每个同步线程最多排队的笔记数, 线程池中已提交未完成的笔记不超过 workers * IN_FLIGHT_PER_WORKER
+    IN_FLIGHT_PER_WORKER = 2
     ATTACHMENT_DOWNLOAD_MAX_ATTEMPTS = 3
     ATTACHMENT_DOWNLOAD_RETRY_SLEEP_S = 1
-
-    def __init__(self, api_client: WizOpenApi, db: Database):
+    # 流水线各阶段的默认线程数: 获取内容、图片和附件以网络等待为主, 解析占用 CPU, 写文件和更新状态在本地磁盘
+    PIPELINE_STAGE_WORKERS = {
+        'content': 8,
+        'parse': 2,
+        'images': 4,
+        'attachments': 4,
+        'write': 2,
+        'status': 1,
+    }
+
+    def __init__(self, api_client: WizOpenApi, db: Database, workers=1, resource_workers=1, blob_store: BlobStore = None,
+                 parse_pool: NoteParsePool = None):
         self.api_client = api_client
         self.db = db
+        # 同时同步的笔记数
+        self.workers = max(1, workers)
+        # 每篇笔记同时下载的图片/附件数
+        self.resource_fetcher = ResourceFetcher(max_workers=resource_workers)
+        # 按内容寻址的图片/附件存储, 为空时不去重
+        self.blob_store = blob_store
+        # 解析笔记的进程池, 为空时在同步线程中解析
+        self.parse_pool = parse_pool
+        # 正在同步的笔记的详情缓存, key 为 doc_guid, 笔记同步结束后移除
+        self._note_details = {}
+        self._note_details_lock = threading.Lock()
+        # 本次运行的统计计数
+        self.run_stats = Counter()
+        self._run_stats_lock = threading.Lock()
+        # 最近一次流水线同步的各阶段统计
+        self.pipeline_stats = None
+
+    def _count(self, name, value=1):
+        with self._run_stats_lock:
+            self.run_stats[name] += value
 
     def synchronize_notes(self):
         log.info('synchronize_notes to db start')
         # 从 wiz 获取待同步记录到db
         self._sync_from_wiz_to_db()
-        # 分页获取未同步的笔记
-        unsync_records = self.db.get_unsync_note_list(0, self.PAGE_SIZE)
-        # 同步笔记到到本地
-        while unsync_records:
-            self._sync_note_to_local(unsync_records)
-            # get_next_max_version
-            max_version = max([record['id'] for record in unsync_records]) if unsync_records else 99999999
-            log.info(f'unsync_records max_version: {max_version}')
-            unsync_records = self.db.get_unsync_note_list(max_version, self.PAGE_SIZE)
+        # 分页获取未同步的笔记, 同步笔记到到本地
+        self._sync_note_to_local(self._iter_unsync_records())
+        self._log_run_summary()
         log.info('synchronize_notes to db end')
 
+    async def synchronize_notes_async(self, async_api_client, fetch_concurrency=ASYNC_FETCH_CONCURRENCY):
+        """
+        同步笔记的异步入口: 笔记列表和笔记内容通过 AsyncWizOpenApi 在同一个事件循环中并发获取,
+        解析、图片、附件和写文件仍交给 workers 个线程执行.
+        :param async_api_client: AsyncWizOpenApi
+        :param fetch_concurrency: 同时获取笔记内容的最大数量
+        """
+        log.info('synchronize_notes_async start')
+        await self._sync_from_wiz_to_db_async(async_api_client)
+
+        semaphore = asyncio.Semaphore(fetch_concurrency)
+        # 跨页连续创建任务, 不等待上一页全部完成; 未完成的任务数有上限, 避免一次读入所有页
+        max_pending = fetch_concurrency + self.workers
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='note-sync') as executor:
+            for record in self._iter_unsync_records():
+                if len(pending) >= max_pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                pending.add(asyncio.ensure_future(
+                    self._sync_single_note_async(async_api_client, executor, semaphore, record)))
+            if pending:
+                await asyncio.gather(*pending)
+        self._log_run_summary()
+        log.info('synchronize_notes_async end')
+
+    def synchronize_notes_pipeline(self, stage_workers=None, queue_size=SyncPipeline.QUEUE_SIZE):
+        """
+        按阶段流水线同步笔记: 笔记列表 -> 获取内容 -> 解析 -> 图片 -> 附件 -> 写文件 -> 更新状态.
+        每个阶段有各自的线程数, 阶段之间用有界队列连接, 一篇笔记完成一个阶段后立即进入下一阶段,
+        不必等待其他笔记. 运行期间定期打印各阶段的队列深度和吞吐.
+        :param stage_workers: {阶段名称: 线程数}, 未配置的阶段使用 PIPELINE_STAGE_WORKERS
+        :param queue_size: 每个阶段输入队列的长度
+        :return: 各阶段的统计
+        """
+        log.info('synchronize_notes_pipeline start')
+        workers = {**self.PIPELINE_STAGE_WORKERS, **(stage_workers or {})}
+        stages = [
+            PipelineStage('content', self._fetch_note_content, workers['content']),
+            PipelineStage('parse', self._parse_note, workers['parse']),
+            PipelineStage('images', self._handle_pipeline_note_images, workers['images']),
+            PipelineStage('attachments', self._handle_note_attachments, workers['attachments']),
+            PipelineStage('write', self._write_note, workers['write']),
+            PipelineStage('status', self._finish_pipeline_note, workers['status']),
+        ]
+        pipeline = SyncPipeline(stages, queue_size=queue_size, on_error=self._on_pipeline_error, source_name='metadata')
+        self.pipeline_stats = pipeline.run(self._iter_pipeline_jobs())
+        self._log_run_summary()
+        log.info('synchronize_notes_pipeline end')
+        return self.pipeline_stats
+
+    def _iter_pipeline_jobs(self):
+        # 元数据阶段: 从 wiz 获取待同步记录到 db, 再分页读取未同步的笔记
+        self._sync_from_wiz_to_db()
+        for unsync_records in self._iter_unsync_note_pages():
+            for record in unsync_records:
+                log.info(f'开始执行同步 doc_guid: {record["doc_guid"]} title: {record["title"]}')
+                # 笔记详情缓存到图片阶段结束, 缓存的数量不超过流水线中的笔记数
+                self._open_note_detail(record['doc_guid'])
+                yield NoteSyncJob(record)
+
+    def _handle_pipeline_note_images(self, job):
+        try:
+            return self._handle_note_images(job)
+        finally:
+            # 之后的阶段不再使用笔记详情
+            self._close_note_detail(job.record['doc_guid'])
+
+    def _finish_pipeline_note(self, job):
+        self._update_note_status(job)
+        return None
+
+    def _on_pipeline_error(self, stage_name, job, error):
+        log.error(f'sync_single_note_to_local error at {stage_name}: ', exc_info=error)
+        self._close_note_detail(job.record['doc_guid'])
+        # 出现异常时更新同步状态和错误原因
+        self.db.update_note_sync_status(job.record['doc_guid'], sync_status=False, fail_reason=str(error))
+
+    def _iter_unsync_note_pages(self):
+        """
+        按 id 顺序分页读取未同步的笔记, 以上一页最后一条的 id 作为下一页的起点.
+        处理当前页时在后台线程预读下一页, 下一页只包含 id 更大的笔记, 不受当前页同步状态变化的影响
+        """
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='note-page-reader') as reader:
+            unsync_records = self.db.get_unsync_note_list(0, self.PAGE_SIZE)
+            while unsync_records:
+                last_id = unsync_records[-1]['id']
+                log.info(f'unsync_records: {len(unsync_records)}, last_id: {last_id}')
+                next_page = reader.submit(self.db.get_unsync_note_list, last_id, self.PAGE_SIZE)
+                yield unsync_records
+                unsync_records = next_page.result()
+
+    def _iter_unsync_records(self):
+        """
+        逐条返回各页的未同步笔记, 下一页仍在后台预读
+        """
+        for unsync_records in self._iter_unsync_note_pages():
+            yield from unsync_records
+
+    def _log_run_summary(self):
+        """
+        打印本次同步的统计信息
+        """
+        log.info(f'连接统计: {self.api_client.stats()}')
+        if self.blob_store is not None:
+            log.info(f'资源存储统计: {self.blob_store.stats()}')
+        with self._run_stats_lock:
+            log.info(f'同步统计: {dict(self.run_stats)}')
+
+    async def _sync_single_note_async(self, async_api_client, executor, semaphore, record):
+        async with semaphore:
+            try:
+                origin_content, note_detail = await self._get_note_origin_content_async(async_api_client, record['type'], record['doc_guid'])
+            except Exception as e:
+                log.exception('sync_single_note_async error: ')
+                self.db.update_note_sync_status(record['doc_guid'], sync_status=False, fail_reason=str(e))
+                return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, self._sync_single_note_to_local, record, origin_content, note_detail)
+
     def _download_img_if_absent(self, record, need_upload_images):
         # 获取本地不存在的图片文件
         not_in_local_img = FileManager.get_not_in_local_img(record, need_upload_images)
         if not not_in_local_img:
             return
 
+        img_directory = FileManager.get_img_directory(record)
         # 根据笔记的类型, 调用 wiz api 获取授权下载地址, 获取二进制内容保存到本地
         if not Note.is_collaboration_note(record['type']):
             # 如果是普通笔记, 直接获取所有图片的上传地址
-            detail_resp = self.api_client.get_note_detail(record['doc_guid'])
+            detail_resp = self._get_note_detail(record['doc_guid'])
             resources = detail_resp['resources']
             log.info(f'resources: {resources}')
 
@@ -54,19 +233,44 @@ class NoteSynchronizer:
             resources_map = {res['name']: res['url'] for res in resources if 'name' in res and 'url' in res}
             log.info(f'Built resources_map with {len(resources_map)} items.')
 
+            img_names = []
             for img_name in not_in_local_img:
                 if img_name in resources_map:
-                    img_url = resources_map[img_name]
-                    FileManager.download_img_from_url(record, img_name, img_url)
+                    img_names.append(img_name)
                 else:
                     log.warning(f"Image '{img_name}' needed but not found in resources list for doc {record.get('doc_guid', 'N/A')}")
+            # 图片路径的锁由同步线程持有, 下载线程写文件时不再获取
+            results = self.resource_fetcher.fetch_all(
+                img_names,
+                lambda img_name: self._fetch_resource(
+                    self._url_resource_key(resources_map[img_name]),
+                    os.path.join(img_directory, img_name),
+                    lambda: FileManager.download_img_from_url(
+                        record, img_name, resources_map[img_name], session=self.api_client.http, path_locked=True,
+                    ),
+                ),
+            )
         else:
-            # 如果是协作笔记, 需要循环获取所有图片的上传地址
-            token = self.api_client.get_collaboration_token(record['doc_guid'])
-            for img_file_name in need_upload_images:
-                # 如果图片不存在 api 获取图片内容, 将图片下载到本地
-                img_byte = self.api_client.get_collaboration_image_byte(token, record['doc_guid'], img_file_name)
-                FileManager.download_img_from_byte(record, img_file_name, img_byte)
+            # 如果是协作笔记, 需要获取所有图片的内容, 将图片下载到本地
+            results = self.resource_fetcher.fetch_all(
+                need_upload_images,
+                lambda img_file_name: self._fetch_resource(
+                    f"collab:{record['doc_guid']}/{img_file_name}",
+                    os.path.join(img_directory, img_file_name),
+                    lambda: self._call_with_collaboration_token(
+                        record['doc_guid'],
+                        lambda token: FileManager.download_img_from_stream(
+                            record, img_file_name,
+                            lambda out: self.api_client.get_collaboration_resource_to(out, token, record['doc_guid'], img_file_name),
+                            path_locked=True,
+                        ),
+                    ),
+                ),
+            )
+        # 与逐个下载时一致, 有图片下载失败时整篇笔记同步失败
+        for _, _, error in results:
+            if error is not None:
+                raise error
 
     def _save_img_and_get_url(self, record: dict, need_upload_images: list[str]) -> dict[str, str]:
         """
@@ -81,11 +285,46 @@ class NoteSynchronizer:
 
         # db查询 判断哪些图片没有上传过
         uploaded_images = self.db.get_uploaded_images(record['doc_guid'], need_upload_images)
-        need_upload_images = list( set(need_upload_images) - set(uploaded_images) )
+        # 定义 ret_map key: 图片名称 value: 图片上传地址
+        # 笔记重新同步时, 已经处理过的图片沿用之前的地址
+        uploaded_image_urls = self.db.get_uploaded_image_urls(record['doc_guid'], uploaded_images)
+        ret_map = self._move_previous_images(record, uploaded_image_urls)
+        # 无法沿用地址的图片重新下载
+        need_upload_images = list(
+            set(need_upload_images) - set(uploaded_images) | (set(uploaded_image_urls) - set(ret_map))
+        )
         log.info(f'now need_upload_images: {need_upload_images}')
 
-        # 定义 ret_map key: 图片名称 value: 图片上传地址
+        # 同分类下的笔记共用 images 目录, 下载到重命名期间锁住这些图片路径, 避免并发同步的笔记互相覆盖
+        img_directory = FileManager.get_img_directory(record)
+        with FileManager.path_locks([os.path.join(img_directory, name) for name in need_upload_images]):
+            self._download_and_handle_images(record, need_upload_images, ret_map)
+        return ret_map
+
+    @staticmethod
+    def _move_previous_images(record, image_urls):
+        """
+        笔记分类变化后, 之前处理过的图片还在旧分类的 ./images/ 下, 而图片地址是相对笔记所在目录的.
+        把这些图片移动到新分类的 ./images/ 后沿用地址, 旧文件已不存在的图片不能沿用
+        :param image_urls: <图片名称, 之前的图片地址>
+        :return: 可以沿用的 <图片名称, 图片地址>
+        """
+        if record.get('prev_title') is None:
+            return dict(image_urls)
+        prev_record = {'category': record.get('prev_category') or ''}
+        if FileManager.get_img_directory(prev_record) == FileManager.get_img_directory(record):
+            return dict(image_urls)
+
         ret_map = {}
+        for img_file_name, url in image_urls.items():
+            # 上传到图床的图片地址与笔记所在目录无关
+            if not url.startswith(ImageHandler.RELATIVE_URL_PREFIX):
+                ret_map[img_file_name] = url
+            elif FileManager.move_image(prev_record, record, url[len(ImageHandler.RELATIVE_URL_PREFIX):]):
+                ret_map[img_file_name] = url
+        return ret_map
+
+    def _download_and_handle_images(self, record, need_upload_images, ret_map):
         # 如果图片不存在则下载图片
         self._download_img_if_absent(record, need_upload_images)
         for img_file_name in need_upload_images:
@@ -101,48 +340,147 @@ class NoteSynchronizer:
             except Exception as e:
                 # 更新上传记录的状态
                 self.db.update_img_sync_status(record['doc_guid'], img_file_name, sync_status=False, fail_reason=str(e), upload_url='')
-        return ret_map
 
-    def _sync_single_note_to_local(self, record):
+    def _sync_single_note_to_local(self, record, origin_content=None, note_detail=None):
         log.info(f'开始执行同步 doc_guid: {record["doc_guid"]} title: {record["title"]}')
-        # 根据笔记的类型，获取不同类型的解析器
-        parser = NoteParserFactory.create_parser(record['type'], record['title'])
-
-        try:
-            # 获取笔记的原始内容
-            origin_content = self._get_note_origin_content(record['type'], record['doc_guid'])
+        job = NoteSyncJob(record, origin_content)
 
+        # 笔记同步期间缓存笔记详情, 获取内容和下载图片时共用一次请求
+        with self._note_detail_scope(record['doc_guid'], note_detail):
+            try:
+                self._fetch_note_content(job)
+                self._parse_note(job)
+                self._handle_note_images(job)
+                self._handle_note_attachments(job)
+                self._write_note(job)
+                self._update_note_status(job)
+            except Exception as e:
+                log.exception('sync_single_note_to_local error: ')
+                # 出现异常时更新同步状态和错误原因
+                error_reason = str(e)
+                self.db.update_note_sync_status(record['doc_guid'], sync_status=False, fail_reason=error_reason)
+
+    # 以下是同步一篇笔记的各个步骤, 逐条同步和流水线同步共用
+    def _fetch_note_content(self, job):
+        # 获取笔记的原始内容, 异步入口会预先获取好
+        if job.origin_content is None:
+            job.origin_content = self._get_note_origin_content(job.record['type'], job.record['doc_guid'])
+        return job
+
+    def _parse_note(self, job):
+        if self.parse_pool is not None:
+            # 在子进程中解析, 不占用同步线程的 GIL
+            job.parsed_note = self.parse_pool.parse(job.record['type'], job.record['title'], job.origin_content)
+        else:
+            # 根据笔记的类型，获取不同类型的解析器
+            parser = NoteParserFactory.create_parser(job.record['type'], job.record['title'])
             # 使用解析器解析笔记，将笔记转化为md, 并提取笔记中需要上传的图片
-            parsed_note = parser.process_content(origin_content)
-            # 上传并获取上传图片地址
-            origin_img_image_url_map = self._save_img_and_get_url(record, parsed_note.need_upload_images)
-
-            # 替换笔记中的上传图片地址
-            parsed_note.replace_image_url(origin_img_image_url_map)
-
-            # 处理笔记附件方法
-            attachment_fail_reason = self._process_note_attachment(record, parsed_note)
-
-            # 拼接笔记属性和 md 原文，写入本地文件中
-            note_content = parsed_note.content
-            if not isinstance(note_content, str):
-                raise Exception(
-                    f"parsed_note.content must be str, got {type(note_content).__name__}"
-                )
-            note_prop = NoteProperty.from_sync_record(record).to_string()
-            joined_note_content = note_prop + note_content
-            FileManager.save_md_to_file(record['category'], record['title'], joined_note_content)
-
-            # 更新笔记的同步状态
-            if attachment_fail_reason:
-                self.db.update_note_sync_status(record['doc_guid'], sync_status=False, fail_reason=attachment_fail_reason)
-            else:
-                self.db.update_note_sync_status(record['doc_guid'], sync_status=True, fail_reason='')
-        except Exception as e:
-            log.exception('sync_single_note_to_local error: ')
-            # 出现异常时更新同步状态和错误原因
-            error_reason = str(e)
-            self.db.update_note_sync_status(record['doc_guid'], sync_status=False, fail_reason=error_reason)
+            job.parsed_note = parser.process_content(job.origin_content)
+        # 原始内容不再需要, 释放内存
+        job.origin_content = None
+        return job
+
+    def _handle_note_images(self, job):
+        # 上传并获取上传图片地址
+        origin_img_image_url_map = self._save_img_and_get_url(job.record, job.parsed_note.need_upload_images)
+        # 替换笔记中的上传图片地址
+        job.parsed_note.replace_image_url(origin_img_image_url_map)
+        return job
+
+    def _handle_note_attachments(self, job):
+        # 处理笔记附件方法
+        job.attachment_fail_reason = self._process_note_attachment(job.record, job.parsed_note)
+        return job
+
+    def _write_note(self, job):
+        # 拼接笔记属性和 md 原文，写入本地文件中
+        note_content = job.parsed_note.content
+        if not isinstance(note_content, str):
+            raise Exception(
+                f"parsed_note.content must be str, got {type(note_content).__name__}"
+            )
+        note_prop = NoteProperty.from_sync_record(job.record).to_string()
+        joined_note_content = note_prop + note_content
+        self._write_note_if_changed(job.record, joined_note_content)
+        self._remove_previous_note_file(job.record)
+        return job
+
+    def _update_note_status(self, job):
+        # 更新笔记的同步状态
+        if job.attachment_fail_reason:
+            self.db.update_note_sync_status(job.record['doc_guid'], sync_status=False, fail_reason=job.attachment_fail_reason)
+        else:
+            self.db.update_note_sync_status(job.record['doc_guid'], sync_status=True, fail_reason='')
+
+    def _remove_previous_note_file(self, record):
+        """
+        笔记的标题或分类变化后, 新路径写入完成再删除旧路径的文件, 避免本地留下重复的笔记.
+        旧路径仍被其他笔记使用时保留文件
+        """
+        prev_title = record.get('prev_title')
+        if prev_title is None:
+            return
+        prev_category = record.get('prev_category') or ''
+        if FileManager.get_md_file_path(prev_category, prev_title) != \
+                FileManager.get_md_file_path(record['category'], record['title']) \
+                and not self.db.is_note_path_used(prev_category, prev_title, record['doc_guid']) \
+                and FileManager.remove_md_file(prev_category, prev_title):
+            log.info(f'笔记标题或分类已变化, 删除旧文件: {prev_category}{prev_title}')
+            self._count('previous_note_files_removed')
+        self.db.clear_note_previous_path(record['doc_guid'])
+
+    def _write_note_if_changed(self, record, joined_note_content):
+        """
+        笔记内容和上次写入的一致且文件仍存在时跳过写入, 保持文件修改时间不变
+        """
+        content_hash = hashlib.sha256(joined_note_content.encode('utf-8')).hexdigest()
+        md_file_path = FileManager.get_md_file_path(record['category'], record['title'])
+        if record.get('content_hash') == content_hash and os.path.exists(md_file_path):
+            log.info(f'笔记内容未变化, 跳过写入: {md_file_path}')
+            self._count('notes_unchanged_skipped')
+            return
+
+        FileManager.save_md_to_file(record['category'], record['title'], joined_note_content)
+        self.db.update_note_content_hash(record['doc_guid'], content_hash)
+        self._count('notes_written')
+
+    def _fetch_resource(self, resource_key, file_path, download_func):
+        """
+        获取图片/附件到 file_path: 资源已在内容存储中时直接链接, 否则下载后放入存储.
+        资源标识相同的资源只下载一次, 跨笔记能否跳过下载取决于标识:
+        普通笔记的图片使用去掉授权参数的下载地址, 附件有服务端 md5 时使用 md5 和大小, 多篇笔记引用同一资源时只下载一次;
+        协作笔记的图片和附件只有笔记内的文件名, 标识限定在笔记内, 只有同一篇笔记再次同步时跳过下载,
+        不同笔记中内容相同的资源仍会各下载一次, 只在磁盘上通过硬链接共用一份
+        :param resource_key: 资源标识
+        :param download_func: 把资源下载到 file_path
+        """
+        if self.blob_store is None:
+            download_func()
+            return
+        if self.blob_store.link_known(resource_key, file_path):
+            return
+        download_func()
+        self.blob_store.ingest(resource_key, file_path)
+
+    @classmethod
+    def _url_resource_key(cls, url):
+        """
+        :return: 去掉授权参数的下载地址, 同一地址在不同笔记和不同授权下相同
+        """
+        parts = urlsplit(url)
+        query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                 if not cls.VOLATILE_URL_PARAM.search(name)]
+        return 'url:' + urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(sorted(query)), ''))
+
+    @staticmethod
+    def _attachment_resource_key(record, attachment):
+        """
+        :return: 附件有服务端 md5 时使用 md5 和大小, 否则使用笔记内的附件 GUID
+        """
+        data_md5 = attachment.get('dataMd5')
+        if data_md5:
+            return f"md5:{data_md5.lower()}/{attachment.get('dataSize', '')}"
+        return f"attachment:{record['doc_guid']}/{attachment.get('attGuid', 'unknown')}"
 
     def _download_with_retry(self, label, download_func):
         max_attempts = self.ATTACHMENT_DOWNLOAD_MAX_ATTEMPTS
@@ -189,24 +527,38 @@ class NoteSynchronizer:
             return None
 
         try:
-            token = self.api_client.get_collaboration_token(record['doc_guid'])
+            self.api_client.get_collaboration_token(record['doc_guid'])
         except Exception as e:
             return f'协作笔记获取附件token失败: {type(e).__name__}: {e}'
 
+        attachments_directory = FileManager.get_attachments_directory(record)
+
+        def download(attachment_name):
+            # 失败时保留已接收的部分, 重试时从断点继续下载
+            self._fetch_resource(
+                f"collab:{record['doc_guid']}/{attachment_name}",
+                os.path.join(attachments_directory, attachment_name),
+                lambda: self._download_with_retry(
+                    f'{attachment_name} (doc_guid={record.get("doc_guid")})',
+                    lambda: self._call_with_collaboration_token(
+                        record['doc_guid'],
+                        lambda token: FileManager.download_attachment_resumable(
+                            record, attachment_name,
+                            lambda out: self.api_client.get_collaboration_resource_to(out, token, record['doc_guid'], attachment_name),
+                        ),
+                    ),
+                ),
+            )
+
         attachment_url_map = {}
         failures = []
-        for attachment_name in attachment_links:
-            label = f'{attachment_name} (doc_guid={record.get("doc_guid")})'
-            try:
-                attachment_byte = self._download_with_retry(
-                    label,
-                    lambda: self.api_client.get_collaboration_image_byte(token, record['doc_guid'], attachment_name),
-                )
-                FileManager.download_attachment_from_byte(record, attachment_name, attachment_byte)
+        # 同名附件只下载一次
+        for attachment_name, _, e in self.resource_fetcher.fetch_all(dict.fromkeys(attachment_links), download):
+            if e is None:
                 relative_path = f"./attachments/{attachment_name}"
                 attachment_url_map[attachment_name] = relative_path
                 log.info(f'协作笔记附件下载完成: {attachment_name}')
-            except Exception as e:
+            else:
                 failures.append(f'{attachment_name}: {type(e).__name__}: {e}')
                 log.warning(f'协作笔记附件下载失败(已重试): {attachment_name}, 错误: {type(e).__name__}: {e}')
 
@@ -234,22 +586,32 @@ class NoteSynchronizer:
         if not attachments:
             return None
 
+        attachments_directory = FileManager.get_attachments_directory(record)
+
+        def download(attachment):
+            att_guid = attachment.get('attGuid', 'unknown')
+            att_name = attachment.get('name', 'unknown')
+            self._fetch_resource(
+                self._attachment_resource_key(record, attachment),
+                os.path.join(attachments_directory, att_name),
+                lambda: self._download_with_retry(
+                    f'{att_name} (att_guid={att_guid}, doc_guid={record.get("doc_guid")})',
+                    lambda: FileManager.download_attachment_resumable(
+                        record, att_name,
+                        lambda out: self.api_client.download_attachment_to(out, record['doc_guid'], att_guid, att_name=att_name),
+                    ),
+                ),
+            )
+
         attachment_list = []
         failures = []
-        for attachment in attachments:
-            att_guid = attachment.get('attGuid', 'unknown')
+        for attachment, _, e in self.resource_fetcher.fetch_all(attachments, download):
             att_name = attachment.get('name', 'unknown')
-            label = f'{att_name} (att_guid={att_guid}, doc_guid={record.get("doc_guid")})'
-            try:
-                attachment_byte = self._download_with_retry(
-                    label,
-                    lambda: self.api_client.download_attachment(record['doc_guid'], att_guid, att_name=att_name),
-                )
-                FileManager.download_attachment_from_byte(record, att_name, attachment_byte)
+            if e is None:
                 relative_path = f"./attachments/{att_name}"
                 attachment_list.append(f"- [{att_name}]({relative_path})")
                 log.info(f'普通笔记附件下载完成: {att_name}')
-            except Exception as e:
+            else:
                 failures.append(f'{att_name}: {type(e).__name__}: {e}')
                 log.warning(f'普通笔记附件下载失败(已重试): {att_name}, 错误: {type(e).__name__}: {e}')
 
@@ -273,43 +635,159 @@ class NoteSynchronizer:
 
     # 将笔记和笔记图片写入图片, 并将图片上传到图床
     def _sync_note_to_local(self, unsync_records):
-        for unsync_record in unsync_records:
-            self._sync_single_note_to_local(unsync_record)
-
-    def _sync_from_wiz_to_db(self):
-        # 调用 wiz api 查询笔记总数
-        wiz_note_count = self.api_client.get_note_count()
-        # 调用 db 查询笔记同步记录总数
-        db_note_count = self.db.get_note_count()
-        log.info(f'wiz_note_count: {wiz_note_count}, db_note_count: {db_note_count}')
-
-        # 如果两个个数不一致, 则说明有需要同步的笔记
-        if wiz_note_count == db_note_count:
+        """
+        同步笔记到本地. 整个运行共用一个线程池, 从 unsync_records 中按需提交笔记,
+        已提交未完成的笔记不超过 workers * IN_FLIGHT_PER_WORKER. 线程空闲时立即取下一条, 不等待同一页中最慢的笔记
+        :param unsync_records: 笔记记录的可迭代对象, 可以跨越多页
+        """
+        if self.workers <= 1:
+            for unsync_record in unsync_records:
+                self._sync_single_note_to_local(unsync_record)
             return
 
+        # 笔记同步的耗时主要在网络等待上, 使用有界线程池同时同步多条笔记
+        max_in_flight = self.workers * self.IN_FLIGHT_PER_WORKER
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='note-sync') as executor:
+            for unsync_record in unsync_records:
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    # 将未预期的异常抛出
+                    for future in done:
+                        future.result()
+                pending.add(executor.submit(self._sync_single_note_to_local, unsync_record))
+            for future in pending:
+                future.result()
+
+    def _sync_from_wiz_to_db(self):
+        # 从上次同步到的版本号之后开始获取笔记列表, 新增和编辑过的笔记版本号都会变大
+        start_version = self._get_list_start_version()
         # 调用 wiz api 获取笔记列表
-        wiz_note_list = self.api_client.get_note_list(0, self.PAGE_SIZE)
+        wiz_note_list = self.api_client.get_note_list(start_version, self.PAGE_SIZE)
         # 如果一直不等于空集合
         while wiz_note_list:
-            # 比较并获取待同步记录
-            pending_sync_note_list = self.db.get_pending_sync_note_list(wiz_note_list)
-            # 调用 db 插入待同步笔记记录
-            self.db.insert_note_list(pending_sync_note_list)
-            # 获取 wiz_note_list 中的最大 version
-            max_version = NoteSynchronizer._get_max_version(wiz_note_list)
-            log.info(f"max_version: {max_version}")
+            max_version = self._save_wiz_note_page(wiz_note_list)
             wiz_note_list = self.api_client.get_note_list(max_version + 1, self.PAGE_SIZE)
         log.info('_sync_from_wiz_to_db end')
 
+    async def _sync_from_wiz_to_db_async(self, async_api_client):
+        start_version = self._get_list_start_version()
+        wiz_note_list = await async_api_client.get_note_list(start_version, self.PAGE_SIZE)
+        while wiz_note_list:
+            max_version = self._save_wiz_note_page(wiz_note_list)
+            wiz_note_list = await async_api_client.get_note_list(max_version + 1, self.PAGE_SIZE)
+        log.info('_sync_from_wiz_to_db_async end')
+
+    def _get_list_start_version(self):
+        watermark = self.db.get_sync_watermark(self.api_client.kb_guid)
+        log.info(f'sync watermark: {watermark}')
+        return 0 if watermark is None else watermark + 1
+
+    def _save_wiz_note_page(self, wiz_note_list):
+        """
+        保存一页为知笔记列表: 插入新笔记, 标记编辑过的笔记重新同步, 并记录同步到的版本号
+        :return: 这一页的最大版本号
+        """
+        # 比较并获取待同步记录
+        pending_sync_note_list = self.db.get_pending_sync_note_list(wiz_note_list)
+        # 调用 db 插入待同步笔记记录
+        self.db.insert_note_list(pending_sync_note_list)
+        # 已存在但版本号变大的笔记需要重新同步
+        resync_count = self.db.mark_updated_notes_for_resync(wiz_note_list)
+        # 获取 wiz_note_list 中的最大 version
+        max_version = NoteSynchronizer._get_max_version(wiz_note_list)
+        self.db.set_sync_watermark(self.api_client.kb_guid, max_version)
+        log.info(f"max_version: {max_version}, resync_count: {resync_count}")
+        return max_version
+
     @staticmethod
     def _get_max_version(note_list):
         # 如果集合空返回最大值 否则返回最大值
         return max([note['version'] for note in note_list]) if note_list else 999999999
 
+    def _call_with_collaboration_token(self, doc_guid, func):
+        """
+        使用缓存的协作笔记 token 调用 func, token 失效时刷新 token 后重试一次
+        :param doc_guid: 笔记GUID
+        :param func: 入参为 token 的函数
+        """
+        token = self.api_client.get_collaboration_token(doc_guid)
+        try:
+            return func(token)
+        except (WizAuthError, HandshakeRejected) as e:
+            log.warning(f'协作笔记 token 已失效, 重新获取: doc_guid={doc_guid}, 错误: {e}')
+            self.api_client.invalidate_collaboration_token(doc_guid)
+            token = self.api_client.get_collaboration_token(doc_guid)
+            return func(token)
+
+    async def _call_with_collaboration_token_async(self, async_api_client, doc_guid, func):
+        """
+        _call_with_collaboration_token 的异步版本
+        :param func: 入参为 token, 返回 awaitable 的函数
+        """
+        token = await async_api_client.get_collaboration_token(doc_guid)
+        try:
+            return await func(token)
+        except (WizAuthError, HandshakeRejected) as e:
+            log.warning(f'协作笔记 token 已失效, 重新获取: doc_guid={doc_guid}, 错误: {e}')
+            async_api_client.invalidate_collaboration_token(doc_guid)
+            token = await async_api_client.get_collaboration_token(doc_guid)
+            return await func(token)
+
     # 调用api, 根据笔记的类型获取笔记的原始内容, 入参笔记类型和doc_guid
     def _get_note_origin_content(self, note_type, doc_guid):
         if Note.is_collaboration_note(note_type):
-            collaboration_token = self.api_client.get_collaboration_token(doc_guid)
-            return self.api_client.get_collaboration_content(collaboration_token, doc_guid)
-        detail = self.api_client.get_note_detail(doc_guid)
+            return self._call_with_collaboration_token(
+                doc_guid,
+                lambda token: self.api_client.get_collaboration_content(token, doc_guid),
+            )
+        detail = self._get_note_detail(doc_guid)
         return detail['html']
+
+    @contextmanager
+    def _note_detail_scope(self, doc_guid, note_detail=None):
+        """
+        笔记同步期间缓存该笔记的详情, 结束后释放, 缓存占用的内存不超过同时同步的笔记数
+        :param note_detail: 已经获取的笔记详情
+        """
+        self._open_note_detail(doc_guid, note_detail)
+        try:
+            yield
+        finally:
+            self._close_note_detail(doc_guid)
+
+    def _open_note_detail(self, doc_guid, note_detail=None):
+        with self._note_details_lock:
+            self._note_details[doc_guid] = note_detail
+
+    def _close_note_detail(self, doc_guid):
+        with self._note_details_lock:
+            self._note_details.pop(doc_guid, None)
+
+    def _get_note_detail(self, doc_guid):
+        with self._note_details_lock:
+            cached = self._note_details.get(doc_guid)
+        if cached is not None:
+            self._count('note_detail_cache_hits')
+            return cached
+
+        detail = self.api_client.get_note_detail(doc_guid)
+        self._count('note_detail_requests')
+        with self._note_details_lock:
+            # 只在笔记同步期间缓存
+            if doc_guid in self._note_details:
+                self._note_details[doc_guid] = detail
+        return detail
+
+    async def _get_note_origin_content_async(self, async_api_client, note_type, doc_guid):
+        """
+        :return: (笔记原始内容, 笔记详情), 协作笔记没有笔记详情
+        """
+        if Note.is_collaboration_note(note_type):
+            content = await self._call_with_collaboration_token_async(
+                async_api_client, doc_guid,
+                lambda token: async_api_client.get_collaboration_content(token, doc_guid),
+            )
+            return content, None
+        detail = await async_api_client.get_note_detail(doc_guid)
+        return detail['html'], detail
@@ -0,0 +1,92 @@
+import json
+import os
+
+from log import log
+
+
+class PartialFile:
+    """
+    断点续传的下载文件.
+    未下载完成的内容保存在目标文件同目录的 .<文件名>.part 中, 已接收长度即 .part 文件的大小;
+    .<文件名>.part.json 记录服务端的 ETag/Last-Modified 和文件总大小, 用于续传时校验文件没有变化.
+    下载失败时保留 .part 文件, 重试或重新运行同步时从已接收的位置继续下载.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        directory_path, file_name = os.path.split(file_path)
+        self.part_path = os.path.join(directory_path, f'.{file_name}.part')
+        self.meta_path = f'{self.part_path}.json'
+        self.validator = None
+        self.total = None
+        self.offset = 0
+        self._file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def open(self):
+        meta = self._load_meta()
+        self.validator = meta.get('validator')
+        self.total = meta.get('total')
+        self._file = open(self.part_path, 'ab')
+        self.offset = self._file.tell()
+        if self.offset:
+            log.info(f'发现未完成的下载: {self.file_path}, 已接收 {self.offset} bytes, 从断点继续下载')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self.offset += len(chunk)
+
+    def restart(self):
+        """
+        服务端不支持续传或文件已变化, 丢弃已接收的内容从头下载
+        """
+        log.info(f'无法续传, 从头下载: {self.file_path}, 丢弃已接收的 {self.offset} bytes')
+        self._file.seek(0)
+        self._file.truncate()
+        self.offset = 0
+        self.set_validator(None, None)
+
+    def set_validator(self, validator, total):
+        """
+        记录服务端返回的文件标识和总大小, 进程重启后续传时使用
+        """
+        self.validator = validator
+        self.total = total
+        tmp_path = f'{self.meta_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'validator': validator, 'total': total}, file)
+        os.replace(tmp_path, self.meta_path)
+
+    def is_complete(self):
+        return self.total is not None and self.offset >= self.total
+
+    def commit(self):
+        """
+        下载完成, 把 .part 文件重命名为目标文件并删除记录
+        """
+        self.close()
+        os.replace(self.part_path, self.file_path)
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+
+    def _load_meta(self):
+        if not os.path.exists(self.part_path) or not os.path.exists(self.meta_path):
+            return {}
+        try:
+            with open(self.meta_path, encoding='utf-8') as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return meta if isinstance(meta, dict) else {}
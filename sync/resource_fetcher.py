@@ -0,0 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ResourceFetcher:
+    """
+    并发获取一篇笔记的图片和附件.
+    每个资源的下载(含重试)在线程池中执行, 同时执行的数量不超过 max_workers, 单个资源失败不影响其他资源.
+    """
+    DEFAULT_MAX_WORKERS = 4
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max(1, max_workers)
+
+    def fetch_all(self, items, fetch_func):
+        """
+        对每个资源调用 fetch_func
+        :param items: 资源列表
+        :param fetch_func: 接收单个资源, 返回下载结果
+        :return: [(item, result, exception)], 顺序与 items 一致, 成功时 exception 为 None
+        """
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [self._fetch_one(fetch_func, item) for item in items]
+
+        workers = min(self.max_workers, len(items))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='resource-fetch') as executor:
+            futures = [executor.submit(self._fetch_one, fetch_func, item) for item in items]
+            return [future.result() for future in futures]
+
+    @staticmethod
+    def _fetch_one(fetch_func, item):
+        try:
+            return item, fetch_func(item), None
+        except Exception as e:
+            return item, None, e
@@ -0,0 +1,104 @@
+import json
+import math
+import re
+import threading
+from collections import defaultdict
+
+from log import log
+
+
+class _StatementStats:
+
+    def __init__(self):
+        self.count = 0
+        self.rows = 0
+        self.durations = []
+
+    def to_dict(self, shape):
+        durations = sorted(self.durations)
+        total_s = sum(durations)
+        # 最近秩法计算 p95
+        p95_s = durations[max(0, math.ceil(len(durations) * 0.95) - 1)] if durations else 0.0
+        return {
+            'statement': shape,
+            'count': self.count,
+            'total_ms': round(total_s * 1000, 3),
+            'avg_ms': round(total_s * 1000 / self.count, 3) if self.count else 0.0,
+            'p95_ms': round(p95_s * 1000, 3),
+            'rows': self.rows,
+        }
+
+
+class SqlProfiler:
+    """
+    SQL 语句统计: 按语句结构(去掉字面量和参数后的 sql)汇总执行次数、总耗时、p95 耗时和返回/影响的行数,
+    退出时打印耗时最多的前 N 条, 或写入 json 文件
+    """
+    DEFAULT_TOP_N = 20
+
+    _WHITESPACE = re.compile(r'\s+')
+    _COMMENT = re.compile(r'--[^\n]*')
+    _STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+    _NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+    _IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+    def __init__(self, top_n=DEFAULT_TOP_N, json_path=None):
+        """
+        :param top_n: 汇总中输出的语句数
+        :param json_path: 汇总写入的 json 文件路径, 为空时打印到日志
+        """
+        self.top_n = top_n
+        self.json_path = json_path
+        self._stats = defaultdict(_StatementStats)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def normalize(cls, sql):
+        """
+        sql 转换为语句结构: 去掉注释, 字面量替换为 ?, IN 列表合并为 (?...), 空白合并为一个空格
+        """
+        shape = cls._COMMENT.sub(' ', sql)
+        shape = cls._STRING_LITERAL.sub('?', shape)
+        shape = cls._NUMBER_LITERAL.sub('?', shape)
+        shape = cls._WHITESPACE.sub(' ', shape).strip()
+        return cls._IN_LIST.sub('(?...)', shape)
+
+    def record(self, sql, elapsed_s, rows):
+        """
+        记录一次语句执行
+        :param elapsed_s: 耗时(秒)
+        :param rows: 返回或影响的行数
+        """
+        shape = self.normalize(sql)
+        with self._lock:
+            stats = self._stats[shape]
+            stats.count += 1
+            stats.rows += max(0, rows)
+            stats.durations.append(elapsed_s)
+
+    def summary(self, top_n=None):
+        """
+        :return: 按总耗时倒序的语句统计
+        """
+        top_n = self.top_n if top_n is None else top_n
+        with self._lock:
+            items = [stats.to_dict(shape) for shape, stats in self._stats.items()]
+        items.sort(key=lambda item: item['total_ms'], reverse=True)
+        return items[:top_n]
+
+    def report(self):
+        """
+        输出统计汇总: 配置了 json_path 时写入文件, 否则打印到日志
+        """
+        summary = self.summary()
+        if self.json_path:
+            with open(self.json_path, 'w', encoding='utf-8') as file:
+                json.dump(summary, file, ensure_ascii=False, indent=2)
+            log.info(f'SQL 统计已写入: {self.json_path}')
+            return
+        lines = [f'SQL 统计(按总耗时前 {self.top_n} 条):',
+                 f'{"count":>8} {"total_ms":>10} {"avg_ms":>8} {"p95_ms":>8} {"rows":>8}  statement']
+        for item in summary:
+            lines.append(f'{item["count"]:>8} {item["total_ms"]:>10.1f} {item["avg_ms"]:>8.3f} '
+                         f'{item["p95_ms"]:>8.3f} {item["rows"]:>8}  {item["statement"]}')
+        log.info('\n'.join(lines))
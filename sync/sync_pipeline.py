@@ -0,0 +1,216 @@
+import queue
+import threading
+import time
+
+from log import log
+
+
+class PipelineStage:
+    """
+    流水线的一个阶段: workers 个线程从有界的输入队列取出任务处理, 结果放入下一阶段的输入队列
+    """
+
+    def __init__(self, name, func, workers=1):
+        """
+        :param name: 阶段名称
+        :param func: 处理函数, 入参为任务, 返回值交给下一阶段, 返回 None 时任务不再往下传
+        :param workers: 线程数
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+
+class _StageStats:
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        # 处理任务的耗时
+        self.busy_s = 0.0
+        # 下一阶段队列已满, 等待放入的耗时
+        self.blocked_s = 0.0
+        # 输入队列的最大深度
+        self.queue_max = 0
+        self.lock = threading.Lock()
+
+    def add(self, busy_s, failed=False):
+        with self.lock:
+            self.processed += 1
+            self.busy_s += busy_s
+            if failed:
+                self.failed += 1
+
+    def add_blocked(self, blocked_s):
+        with self.lock:
+            self.blocked_s += blocked_s
+
+    def observe_queue(self, depth):
+        with self.lock:
+            self.queue_max = max(self.queue_max, depth)
+
+
+class SyncPipeline:
+    """
+    多阶段流水线: 相邻阶段之间用有界队列连接, 下游处理不过来时上游放入队列会阻塞(背压),
+    在途的任务数不超过 队列长度 + 线程数 之和, 内存占用有上限.
+    运行期间定期打印各阶段的队列深度、吞吐和忙碌比例, 用于判断瓶颈在网络、CPU 还是磁盘.
+    """
+    # 每个阶段输入队列的长度
+    QUEUE_SIZE = 16
+    # 打印各阶段状态的间隔(秒)
+    STATS_INTERVAL_S = 10.0
+
+    _STOP = object()
+
+    def __init__(self, stages, queue_size=QUEUE_SIZE, on_error=None, source_name='source',
+                 stats_interval_s=STATS_INTERVAL_S):
+        """
+        :param stages: PipelineStage 列表, 按执行顺序
+        :param queue_size: 每个阶段输入队列的长度
+        :param on_error: 阶段处理任务抛出异常时的回调, 入参为 (阶段名称, 任务, 异常), 任务不再往下传
+        :param source_name: 任务来源在统计中的名称
+        :param stats_interval_s: 打印状态的间隔, 小于等于 0 时只在结束时打印
+        """
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.on_error = on_error
+        self.source_name = source_name
+        self.stats_interval_s = stats_interval_s
+        self._queues = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        self._stats = {source_name: _StageStats(1)}
+        for stage in stages:
+            self._stats[stage.name] = _StageStats(stage.workers)
+        self._started = None
+
+    def run(self, source):
+        """
+        从 source 依次取出任务放入第一个阶段, 等待所有任务处理完成.
+        source 抛出异常时, 已放入的任务仍会处理完, 之后再抛出该异常
+        :param source: 任务的可迭代对象
+        :return: 各阶段的统计
+        """
+        self._started = time.monotonic()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            stage_threads = [
+                threading.Thread(target=self._work, args=(index,), name=f'pipeline-{stage.name}-{i}', daemon=True)
+                for i in range(stage.workers)
+            ]
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+
+        stop_monitor = threading.Event()
+        monitor = None
+        if self.stats_interval_s > 0:
+            monitor = threading.Thread(target=self._monitor, args=(stop_monitor,), name='pipeline-monitor', daemon=True)
+            monitor.start()
+
+        try:
+            self._feed(source)
+        finally:
+            # 按阶段顺序结束: 上一阶段的线程全部退出后, 下一阶段不会再有新任务
+            for index, stage in enumerate(self.stages):
+                for _ in range(stage.workers):
+                    self._queues[index].put(self._STOP)
+                for thread in threads[index]:
+                    thread.join()
+            stop_monitor.set()
+            if monitor is not None:
+                monitor.join()
+            log.info(self.format_stats(final=True))
+        return self.stats()
+
+    def _feed(self, source):
+        stats = self._stats[self.source_name]
+        iterator = iter(source)
+        while True:
+            started = time.monotonic()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            stats.add(time.monotonic() - started)
+            if self.stages:
+                self._put(0, item, stats)
+
+    def _put(self, index, item, producer_stats):
+        # 队列已满时阻塞, 等待下游处理
+        started = time.monotonic()
+        self._queues[index].put(item)
+        producer_stats.add_blocked(time.monotonic() - started)
+        self._stats[self.stages[index].name].observe_queue(self._queues[index].qsize())
+
+    def _work(self, index):
+        stage = self.stages[index]
+        stats = self._stats[stage.name]
+        inbox = self._queues[index]
+        has_next = index + 1 < len(self.stages)
+        while True:
+            item = inbox.get()
+            if item is self._STOP:
+                return
+            started = time.monotonic()
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                stats.add(time.monotonic() - started, failed=True)
+                self._handle_error(stage, item, e)
+                continue
+            stats.add(time.monotonic() - started)
+            if result is not None and has_next:
+                self._put(index + 1, result, stats)
+
+    def _handle_error(self, stage, item, error):
+        if self.on_error is None:
+            log.error(f'流水线阶段 {stage.name} 处理失败: {type(error).__name__}: {error}')
+            return
+        try:
+            self.on_error(stage.name, item, error)
+        except Exception:
+            # 回调失败不能让工作线程退出, 否则上游会一直阻塞
+            log.exception(f'流水线阶段 {stage.name} 错误处理失败: ')
+
+    def _monitor(self, stop_event):
+        while not stop_event.wait(self.stats_interval_s):
+            log.info(self.format_stats())
+
+    def stats(self):
+        """
+        :return: {阶段名称: 统计}, 包括线程数、完成数、失败数、当前和最大队列深度、吞吐(个/秒)、
+                 忙碌比例(处理耗时 / (线程数 * 运行时间)) 和等待下游的阻塞耗时
+        """
+        elapsed_s = max(time.monotonic() - self._started, 1e-9) if self._started is not None else 0.0
+        queue_depths = {stage.name: self._queues[index].qsize() for index, stage in enumerate(self.stages)}
+        result = {}
+        for name, stats in self._stats.items():
+            with stats.lock:
+                result[name] = {
+                    'workers': stats.workers,
+                    'processed': stats.processed,
+                    'failed': stats.failed,
+                    'queue': queue_depths.get(name, 0),
+                    'queue_max': stats.queue_max,
+                    'throughput': round(stats.processed / elapsed_s, 2) if elapsed_s else 0.0,
+                    'utilization': round(stats.busy_s / (stats.workers * elapsed_s), 3) if elapsed_s else 0.0,
+                    'blocked_s': round(stats.blocked_s, 3),
+                }
+        return result
+
+    def format_stats(self, final=False):
+        """
+        各阶段状态的单行文本, 结束时附带忙碌比例最高的阶段
+        """
+        stats = self.stats()
+        parts = []
+        for name, item in stats.items():
+            queue_text = '' if name == self.source_name else f' 队列={item["queue"]}/{self.queue_size}(最大 {item["queue_max"]})'
+            parts.append(f'{name}[{item["workers"]}]{queue_text} 完成={item["processed"]} 失败={item["failed"]} '
+                         f'{item["throughput"]}/s 忙碌={item["utilization"]:.0%} 阻塞={item["blocked_s"]}s')
+        text = ('流水线统计: ' if final else '流水线状态: ') + ' | '.join(parts)
+        if final and self.stages:
+            busiest = max(self.stages, key=lambda stage: stats[stage.name]['utilization'])
+            text += f' | 瓶颈阶段: {busiest.name}'
+        return text
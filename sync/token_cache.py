@@ -0,0 +1,67 @@
+import threading
+import time
+
+
+class TokenCache:
+    """
+    带过期时间的 token 缓存, 统计命中和未命中次数
+    """
+    DEFAULT_TTL_S = 600
+
+    def __init__(self, ttl_s=DEFAULT_TTL_S):
+        self.ttl_s = ttl_s
+        # key -> (token, 过期时间)
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_fetch(self, key, fetch):
+        """
+        获取缓存中未过期的 token, 不存在时调用 fetch 获取并缓存
+        :param key: 缓存 key
+        :param fetch: 获取 token 的函数
+        :return: token
+        """
+        found, token = self._get(key)
+        if found:
+            return token
+        token = fetch()
+        self._put(key, token)
+        return token
+
+    async def get_or_fetch_async(self, key, fetch):
+        """
+        与 get_or_fetch 相同, fetch 为返回 awaitable 的函数, 异步客户端和同步客户端可以共用同一个缓存
+        """
+        found, token = self._get(key)
+        if found:
+            return token
+        token = await fetch()
+        self._put(key, token)
+        return token
+
+    def _get(self, key):
+        """
+        :return: (是否命中, token)
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._tokens.get(key)
+            if cached is not None and cached[1] > now:
+                self.hits += 1
+                return True, cached[0]
+            self.misses += 1
+            return False, None
+
+    def _put(self, key, token):
+        with self._lock:
+            self._tokens[key] = (token, time.monotonic() + self.ttl_s)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._tokens.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._tokens)}
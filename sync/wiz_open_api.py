@@ -1,12 +1,19 @@
 from log import log
-import requests
 import json
+import re
 import time
-import ssl
-import certifi
-from websocket import create_connection
+import threading
 
+from sync.collaboration_editor_session import CollaborationEditorSession
 from sync.config import Config
+from sync.http_session import WizHttpSession
+from sync.token_cache import TokenCache
+
+
+class WizAuthError(Exception):
+    """
+    为知接口返回 401, 使用的 token 已失效
+    """
 
 
 class WizOpenApi:
@@ -17,6 +24,8 @@ class WizOpenApi:
     ATTACHMENT_READ_TIMEOUT_S = 60
     ATTACHMENT_CHUNK_SIZE = 64 * 1024
     ATTACHMENT_PROGRESS_LOG_INTERVAL_S = 5
+    # 协作笔记编辑器 token 的缓存时间
+    COLLABORATION_TOKEN_TTL_S = 600
 
     def __init__(self, config: Config):
         self.user_id = config.user_id
@@ -26,12 +35,35 @@ class WizOpenApi:
         # 知识库服务(knowledge base)
         self.kb_server = ''
         self.kb_guid = ''
+        # 所有为知 http 请求共用的连接池, 连接数需要覆盖同时同步的笔记数和每篇笔记同时下载的资源数
+        pool_maxsize = config.sync_workers * max(2, config.resource_workers)
+        self.http = WizHttpSession(pool_maxsize=max(WizHttpSession.DEFAULT_POOL_MAXSIZE, pool_maxsize))
+        # 协作笔记编辑器长连接会话, 第一次获取协作笔记内容时创建
+        self.editor_pool_size = config.sync_workers
+        self._editor_session = None
+        self._editor_session_lock = threading.Lock()
+        # 协作笔记编辑器 token 缓存, key 为 doc_guid
+        self.collaboration_tokens = TokenCache(ttl_s=self.COLLABORATION_TOKEN_TTL_S)
 
         self.auth()
 
+    def stats(self):
+        """
+        本次运行的连接统计: http 连接池和协作笔记编辑器连接
+        """
+        stats = {'http': self.http.stats(), 'collaboration_token': self.collaboration_tokens.stats()}
+        if self._editor_session is not None:
+            stats['editor'] = self._editor_session.stats()
+        return stats
+
+    def close(self):
+        if self._editor_session is not None:
+            self._editor_session.close()
+        self.http.close()
+
     def _login(self):
         login_url = f'{WizOpenApi.AS_URL}/as/user/login'
-        response = requests.post(login_url, data={'userId': self.user_id, 'password': self.password})
+        response = self.http.post(login_url, data={'userId': self.user_id, 'password': self.password})
         # 先判断http 状态码
         if response.status_code != 200:
             raise Exception(f'登录失败: http状态码为:{response.status_code}')
@@ -48,7 +80,7 @@ class WizOpenApi:
         获取群组知识库列表
         """
         group_list_url = f'{WizOpenApi.AS_URL}/as/user/groups'
-        response = requests.get(group_list_url, headers={'X-Wiz-Token': self.token})
+        response = self.http.get(group_list_url)
         # 先判断http 状态码
         if response.status_code != 200:
             raise Exception(f'获取群组列表失败: http状态码为:{response.status_code}')
@@ -63,6 +95,7 @@ class WizOpenApi:
     def auth(self):
         data = self._login()
         self.token = data['result']['token']
+        self.http.set_token(self.token)
         self.kb_server = data['result']['kbServer']
         self.kb_guid = data['result']['kbGuid']
         self.user_guid = data['result']['userGuid']
@@ -95,7 +128,7 @@ class WizOpenApi:
 
     def get_note_list(self, version, count):
         note_list_url = f'{self.kb_server}/ks/note/list/version/{self.kb_guid}'
-        response = requests.get(note_list_url, params={'version': version, 'count': count}, headers={'X-Wiz-Token': self.token})
+        response = self.http.get(note_list_url, params={'version': version, 'count': count})
         if response.status_code != 200:
             raise Exception(f'获取笔记列表失败: http状态码为:{response.status_code}')
         data = response.json()
@@ -105,7 +138,7 @@ class WizOpenApi:
 
     def get_note_detail(self, doc_guid):
         note_download_url = f'{self.kb_server}/ks/note/download/{self.kb_guid}/{doc_guid}?downloadInfo=0&downloadData=1'
-        response = requests.get(note_download_url, headers={'X-Wiz-Token': self.token})
+        response = self.http.get(note_download_url)
         if response.status_code != 200:
             raise Exception(f'下载笔记失败: http状态码为:{response.status_code}')
         data = response.json()
@@ -115,7 +148,7 @@ class WizOpenApi:
 
     def get_note_count(self):
         url = f'{self.kb_server}/ks/kb/info/{self.kb_guid}'
-        response = requests.get(url, headers={'X-Wiz-Token': self.token})
+        response = self.http.get(url)
         if response.status_code != 200:
             raise Exception(f'获取笔记总数失败: http状态码为:{response.status_code}')
         data = response.json()
@@ -125,10 +158,19 @@ class WizOpenApi:
             raise Exception(f'获取笔记总数失败: 为知响应报文为:{response.json()}')
         return data['result']['noteCount']
 
-    # 获取协作笔记token
+    # 获取协作笔记token, 同一篇笔记在缓存有效期内只请求一次
     def get_collaboration_token(self, doc_guid):
+        return self.collaboration_tokens.get_or_fetch(doc_guid, lambda: self._fetch_collaboration_token(doc_guid))
+
+    def invalidate_collaboration_token(self, doc_guid):
+        """
+        token 失效(401)时移除缓存, 下次获取时重新请求
+        """
+        self.collaboration_tokens.invalidate(doc_guid)
+
+    def _fetch_collaboration_token(self, doc_guid):
         url = f'{self.kb_server}/ks/note/{self.kb_guid}/{doc_guid}/tokens'
-        response = requests.post(url, headers={'X-Wiz-Token': self.token})
+        response = self.http.post(url)
         if response.status_code != 200:
             raise Exception(f'获取协作笔记token失败: http状态码为:{response.status_code}')
         data = response.json()
@@ -138,78 +180,22 @@ class WizOpenApi:
 
     # 获取协作笔记图片
     def get_collaboration_image_byte(self, editor_token, doc_guid, image_name):
-        url = f'{self.kb_server}/editor/{self.kb_guid}/{doc_guid}/resources/{image_name}'
-
-        timeout = (self.ATTACHMENT_CONNECT_TIMEOUT_S, self.ATTACHMENT_READ_TIMEOUT_S)
-        chunk_size = self.ATTACHMENT_CHUNK_SIZE
-        progress_interval = self.ATTACHMENT_PROGRESS_LOG_INTERVAL_S
-
-        log.info(
-            f"开始下载协作资源: {image_name} (doc_guid={doc_guid}, "
-            f"timeout={timeout[0]}/{timeout[1]}s, chunk_size={chunk_size})"
-        )
-
-        downloaded_bytes = 0
-        start_time = time.monotonic()
-        last_progress_log_time = start_time
         buf = bytearray()
+        self.get_collaboration_resource_to(buf, editor_token, doc_guid, image_name)
+        return bytes(buf)
 
+    def get_collaboration_resource_to(self, out, editor_token, doc_guid, image_name):
+        """
+        分块下载协作笔记资源(图片/附件), 每个分块直接写入 out, 内存占用与资源大小无关
+        :param out: 支持 write/extend 的对象, 例如打开的文件
+        :return: 下载的字节数
+        """
+        url = f'{self.kb_server}/editor/{self.kb_guid}/{doc_guid}/resources/{image_name}'
         headers = {
             'cookie': f'x-live-editor-token={editor_token}',
             'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
-
-        try:
-            with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
-                if response.status_code != 200:
-                    raise Exception(f'下载协作资源失败: http状态码为:{response.status_code}')
-
-                total_bytes = None
-                content_length = response.headers.get('Content-Length')
-                if content_length:
-                    try:
-                        total_bytes = int(content_length)
-                    except ValueError:
-                        total_bytes = None
-
-                for chunk in response.iter_content(chunk_size=chunk_size):
-                    if not chunk:
-                        continue
-                    buf.extend(chunk)
-                    downloaded_bytes += len(chunk)
-
-                    now = time.monotonic()
-                    if now - last_progress_log_time >= progress_interval:
-                        elapsed = now - start_time
-                        speed_mib_s = (downloaded_bytes / elapsed) / (1024 * 1024) if elapsed > 0 else 0.0
-
-                        if total_bytes and total_bytes > 0:
-                            pct = downloaded_bytes * 100.0 / total_bytes
-                            log.info(
-                                f"协作资源下载中: {image_name} {downloaded_bytes}/{total_bytes} bytes "
-                                f"({pct:.1f}%), {speed_mib_s:.2f} MiB/s, elapsed={elapsed:.1f}s"
-                            )
-                        else:
-                            log.info(
-                                f"协作资源下载中: {image_name} {downloaded_bytes} bytes, "
-                                f"{speed_mib_s:.2f} MiB/s, elapsed={elapsed:.1f}s"
-                            )
-
-                        last_progress_log_time = now
-
-        except Exception as e:
-            elapsed = time.monotonic() - start_time
-            log.warning(
-                f"协作资源下载失败: {image_name} (doc_guid={doc_guid}) "
-                f"downloaded={downloaded_bytes} bytes, elapsed={elapsed:.1f}s, error={type(e).__name__}: {e}"
-            )
-            raise
-
-        elapsed = time.monotonic() - start_time
-        log.info(
-            f"协作资源下载完成: {image_name} bytes={downloaded_bytes}, elapsed={elapsed:.1f}s"
-        )
-        return bytes(buf)
+        return self._download(out, url, headers, None, '协作资源', image_name, f'doc_guid={doc_guid}')
 
     # 升级笔记
     def upgrade_note(self, doc_guid):
@@ -220,7 +206,7 @@ class WizOpenApi:
         payload['status'] = 'localDataModified'
         payload['type'] = 'lite/markdown'
         log.info(f'升级笔记 payload: {json.dumps(payload)}')
-        response = requests.post(url, headers={'X-Wiz-Token': self.token}, json=payload)
+        response = self.http.post(url, json=payload)
         if response.status_code != 200:
             raise Exception(f'升级笔记失败: http状态码为:{response.status_code}')
         data = response.json()
@@ -231,69 +217,19 @@ class WizOpenApi:
 
     # 获取协作笔记内容
     def get_collaboration_content(self, editor_token, doc_guid):
-        wss_url = f"wss://{self.domain}/editor/{self.kb_guid}/{doc_guid}"
-
-        hs_request = {
-            "a": "hs",
-            "id": None,
-            "auth": {
-                "appId": self.kb_guid,
-                "docId": doc_guid,
-                "userId": self.user_guid,
-                "permission": "w",
-                "token": editor_token
-            }
-        }
-
-        f_request = {
-            "a": "f",
-            "c": self.kb_guid,
-            "d": doc_guid,
-            "v": None
-        }
-
-        s_request = {
-            "a":"s",
-            "c": self.kb_guid,
-            "d": doc_guid,
-            "v": None
-        }
-
-
         """
-        获取文档的data
-        三次hs,一次f, 才可以获取data
+        通过长连接会话获取协作笔记内容, 多篇笔记复用同一组 websocket 连接
         """
-        ws = create_connection(
-            wss_url,
-            sslopt={
-                'cert_reqs': ssl.CERT_REQUIRED,
-                'ca_certs': certifi.where(),
-            },
-        )
-        hs = json.dumps(hs_request)
-        f = json.dumps(f_request)
-        s = json.dumps(s_request)
-
-        ws.send(hs)
-        log.info(ws.recv())
-
-        ws.send(hs)
-        log.info(ws.recv())
-
-        ws.send(hs)
-        log.info(ws.recv())
+        return self._get_editor_session().fetch(doc_guid, editor_token)
 
-        ws.send(f)
-        log.info(ws.recv())
-        content = ws.recv()
-        log.info(content)
-
-        ws.send(s)
-        ws.recv()
-
-        ws.close()
-        return content
+    def _get_editor_session(self):
+        with self._editor_session_lock:
+            if self._editor_session is None:
+                self._editor_session = CollaborationEditorSession(
+                    self.kb_server, self.kb_guid, self.user_guid,
+                    pool_size=self.editor_pool_size,
+                )
+            return self._editor_session
 
     def get_note_attachments(self, doc_guid):
         """
@@ -308,7 +244,7 @@ class WizOpenApi:
             'clientVersion': '4.0',
             'lang': 'zh-cn'
         }
-        response = requests.get(url, params=params, headers={'X-Wiz-Token': self.token})
+        response = self.http.get(url, params=params)
         if response.status_code != 200:
             raise Exception(f'获取笔记附件列表失败: http状态码为:{response.status_code}')
         data = response.json()
@@ -324,38 +260,72 @@ class WizOpenApi:
         :param att_name: 附件文件名(可选, 用于日志)
         :return: 附件的二进制内容
         """
+        buf = bytearray()
+        self.download_attachment_to(buf, doc_guid, att_guid, att_name=att_name)
+        return bytes(buf)
+
+    def download_attachment_to(self, out, doc_guid, att_guid, att_name=None):
+        """
+        分块下载笔记附件, 每个分块直接写入 out, 内存占用与附件大小无关
+        :param out: 支持 write/extend 的对象, 例如打开的文件
+        :param doc_guid: 笔记GUID
+        :param att_guid: 附件GUID
+        :param att_name: 附件文件名(可选, 用于日志)
+        :return: 下载的字节数
+        """
         url = f'{self.kb_server}/ks/attachment/download/{self.kb_guid}/{doc_guid}/{att_guid}'
         params = {
             'clientType': 'web',
             'clientVersion': '4.0',
             'lang': 'zh-cn'
         }
+        attachment_label = att_name if att_name else att_guid
+        return self._download(out, url, None, params, '附件', attachment_label, f'doc_guid={doc_guid}, att_guid={att_guid}')
 
+    def _download(self, out, url, headers, params, kind, label, context):
+        """
+        分块下载资源并写入 out, 定期打印下载进度
+        :param kind: 资源类型, 用于日志和异常信息
+        :param label: 资源名称, 用于日志
+        :param context: 附加的日志上下文
+        :return: 下载的字节数
+        """
         timeout = (self.ATTACHMENT_CONNECT_TIMEOUT_S, self.ATTACHMENT_READ_TIMEOUT_S)
         chunk_size = self.ATTACHMENT_CHUNK_SIZE
         progress_interval = self.ATTACHMENT_PROGRESS_LOG_INTERVAL_S
+        write = out.write if hasattr(out, 'write') else out.extend
 
-        attachment_label = att_name if att_name else att_guid
         log.info(
-            f"开始下载附件: {attachment_label} (doc_guid={doc_guid}, att_guid={att_guid}, "
+            f"开始下载{kind}: {label} ({context}, "
             f"timeout={timeout[0]}/{timeout[1]}s, chunk_size={chunk_size})"
         )
 
+        # out 为 PartialFile 时, 从已接收的位置续传
+        offset = getattr(out, 'offset', 0)
+        if offset:
+            headers = dict(headers or {})
+            headers['Range'] = f'bytes={offset}-'
+            if getattr(out, 'validator', None):
+                headers['If-Range'] = out.validator
+            log.info(f"续传{kind}: {label} 从 {offset} bytes 开始")
+
         downloaded_bytes = 0
         start_time = time.monotonic()
         last_progress_log_time = start_time
-        buf = bytearray()
 
         try:
-            with requests.get(
-                url,
-                params=params,
-                headers={'X-Wiz-Token': self.token},
-                stream=True,
-                timeout=timeout,
-            ) as response:
-                if response.status_code != 200:
-                    raise Exception(f'下载附件失败: http状态码为:{response.status_code}')
+            with self.http.get(url, params=params, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 401:
+                    raise WizAuthError(f'下载{kind}失败: http状态码为:{response.status_code}')
+                if offset and response.status_code == 416:
+                    # 请求的起始位置超出文件大小: 已接收完整文件, 否则丢弃已接收内容后重试
+                    if out.is_complete():
+                        log.info(f"{kind}已下载完整: {label} bytes={offset}")
+                        return 0
+                    out.restart()
+                    raise Exception(f'下载{kind}失败: 续传位置无效, http状态码为:{response.status_code}')
+                if response.status_code not in (200, 206) or (response.status_code == 206 and not offset):
+                    raise Exception(f'下载{kind}失败: http状态码为:{response.status_code}')
 
                 total_bytes = None
                 content_length = response.headers.get('Content-Length')
@@ -365,10 +335,27 @@ class WizOpenApi:
                     except ValueError:
                         total_bytes = None
 
+                if offset:
+                    if response.status_code == 206:
+                        range_start, range_total = self._parse_content_range(response.headers.get('Content-Range'))
+                        if range_start != offset:
+                            out.restart()
+                            raise Exception(f'下载{kind}失败: 续传位置不一致, Content-Range={response.headers.get("Content-Range")}')
+                        total_bytes = range_total
+                    else:
+                        # 服务端不支持 Range 或文件已变化, 返回了完整内容
+                        out.restart()
+                if hasattr(out, 'set_validator'):
+                    out.set_validator(
+                        response.headers.get('ETag') or response.headers.get('Last-Modified'),
+                        total_bytes,
+                    )
+                resumed_bytes = getattr(out, 'offset', 0)
+
                 for chunk in response.iter_content(chunk_size=chunk_size):
                     if not chunk:
                         continue
-                    buf.extend(chunk)
+                    write(chunk)
                     downloaded_bytes += len(chunk)
 
                     now = time.monotonic()
@@ -377,14 +364,15 @@ class WizOpenApi:
                         speed_mib_s = (downloaded_bytes / elapsed) / (1024 * 1024) if elapsed > 0 else 0.0
 
                         if total_bytes and total_bytes > 0:
-                            pct = downloaded_bytes * 100.0 / total_bytes
+                            received_bytes = resumed_bytes + downloaded_bytes
+                            pct = received_bytes * 100.0 / total_bytes
                             log.info(
-                                f"附件下载中: {attachment_label} {downloaded_bytes}/{total_bytes} bytes "
+                                f"{kind}下载中: {label} {received_bytes}/{total_bytes} bytes "
                                 f"({pct:.1f}%), {speed_mib_s:.2f} MiB/s, elapsed={elapsed:.1f}s"
                             )
                         else:
                             log.info(
-                                f"附件下载中: {attachment_label} {downloaded_bytes} bytes, "
+                                f"{kind}下载中: {label} {downloaded_bytes} bytes, "
                                 f"{speed_mib_s:.2f} MiB/s, elapsed={elapsed:.1f}s"
                             )
 
@@ -393,13 +381,28 @@ class WizOpenApi:
         except Exception as e:
             elapsed = time.monotonic() - start_time
             log.warning(
-                f"附件下载失败: {attachment_label} (doc_guid={doc_guid}, att_guid={att_guid}) "
+                f"{kind}下载失败: {label} ({context}) "
                 f"downloaded={downloaded_bytes} bytes, elapsed={elapsed:.1f}s, error={type(e).__name__}: {e}"
             )
             raise
 
         elapsed = time.monotonic() - start_time
+        if total_bytes is not None and resumed_bytes + downloaded_bytes < total_bytes:
+            # 连接提前结束, 保留已接收的部分等待续传
+            raise Exception(f'下载{kind}不完整: {label} {resumed_bytes + downloaded_bytes}/{total_bytes} bytes')
         log.info(
-            f"附件下载完成: {attachment_label} bytes={downloaded_bytes}, elapsed={elapsed:.1f}s"
+            f"{kind}下载完成: {label} bytes={downloaded_bytes}, elapsed={elapsed:.1f}s"
         )
-        return bytes(buf)
+        return downloaded_bytes
+
+    @staticmethod
+    def _parse_content_range(content_range):
+        """
+        解析 Content-Range: bytes <start>-<end>/<total>
+        :return: (start, total), 无法解析时对应的值为 None
+        """
+        match = re.match(r'bytes\s+(\d+)-\d+/(\d+|\*)', content_range or '')
+        if not match:
+            return None, None
+        total = match.group(2)
+        return int(match.group(1)), (int(total) if total != '*' else None)
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from aiohttp import web, WSMsgType
+
+
+class _WizStandInServer:
+    """
+    为知服务的本地替身: 提供笔记列表、笔记详情、协作token、附件下载和协作笔记 websocket
+    """
+
+    def __init__(self, notes, delay_s=0.0):
+        self.notes = notes
+        self.delay_s = delay_s
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.token_requests = 0
+        # 不响应这些笔记的 f 请求
+        self.silent_docs = set()
+        self.runner = None
+        self.base_url = ''
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/ks/note/list/version/{kb}', self.note_list)
+        app.router.add_get('/ks/note/download/{kb}/{doc}', self.note_detail)
+        app.router.add_get('/ks/kb/info/{kb}', self.kb_info)
+        app.router.add_post('/ks/note/{kb}/{doc}/tokens', self.tokens)
+        app.router.add_get('/ks/attachment/download/{kb}/{doc}/{att}', self.attachment)
+        app.router.add_get('/editor/{kb}/{doc}', self.editor)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}'
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def _track(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay_s)
+        self.in_flight -= 1
+
+    async def note_list(self, request):
+        assert request.headers['X-Wiz-Token'] == 'token'
+        version = int(request.query['version'])
+        count = int(request.query['count'])
+        result = [note for note in self.notes if note['version'] >= version][:count]
+        return web.json_response({'returnCode': 200, 'result': result})
+
+    async def note_detail(self, request):
+        await self._track()
+        doc_guid = request.match_info['doc']
+        return web.json_response({'returnCode': 200, 'html': f'<html><body>{doc_guid}</body></html>', 'resources': []})
+
+    async def kb_info(self, request):
+        return web.json_response({'returnCode': 200, 'result': {'noteCount': len(self.notes)}})
+
+    async def tokens(self, request):
+        self.token_requests += 1
+        return web.json_response({'returnCode': 200, 'result': {'editorToken': f"editor-{request.match_info['doc']}"}})
+
+    async def attachment(self, request):
+        if request.headers.get('X-Wiz-Token') != 'token':
+            return web.Response(status=401)
+        return web.Response(body=b'attachment-' + request.match_info['att'].encode())
+
+    async def editor(self, request):
+        doc_guid = request.match_info['doc']
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                break
+            data = json.loads(msg.data)
+            if data['a'] == 'hs':
+                if data['auth']['token'] != f'editor-{doc_guid}':
+                    await ws.send_str(json.dumps({'a': 'hs', 'error': {'code': 4001, 'message': 'bad token'}}))
+                else:
+                    await ws.send_str(json.dumps({'a': 'hs'}))
+            elif data['a'] == 'f':
+                if doc_guid in self.silent_docs:
+                    continue
+                await ws.send_str(json.dumps({'a': 'init'}))
+                await ws.send_str(json.dumps({'a': 'f', 'd': doc_guid, 'data': {'v': 1, 'data': {'blocks': []}}}))
+            elif data['a'] == 's':
+                await ws.send_str(json.dumps({'a': 's'}))
+        return ws
+
+
+class TestAsyncWizOpenApi(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        from sync.async_wiz_open_api import AsyncWizOpenApi
+
+        self.notes = [{'docGuid': f'doc{i}', 'version': i, 'type': 'document'} for i in range(5)]
+        self.server = _WizStandInServer(self.notes, delay_s=0.2)
+        await self.server.start()
+
+        self.api = AsyncWizOpenApi()
+        self.api.kb_server = self.server.base_url
+        self.api.kb_guid = 'kb_guid'
+        self.api.user_guid = 'user_guid'
+        self.api.token = 'token'
+
+    async def asyncTearDown(self):
+        await self.api.close()
+        await self.server.stop()
+
+    async def test_get_note_list_and_count(self):
+        self.assertEqual(await self.api.get_note_count(), 5)
+        notes = await self.api.get_note_list(3, 200)
+        self.assertEqual([note['docGuid'] for note in notes], ['doc3', 'doc4'])
+
+    async def test_note_details_are_fetched_concurrently(self):
+        start = time.monotonic()
+        details = await asyncio.gather(*(self.api.get_note_detail(f'doc{i}') for i in range(50)))
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(len(details), 50)
+        self.assertIn('doc49', details[49]['html'])
+        self.assertGreater(self.server.max_in_flight, 1)
+        # 50 个 0.2s 的请求串行需要 10s
+        self.assertLess(elapsed, 5)
+
+    async def test_download_attachment(self):
+        content = await self.api.download_attachment('doc1', 'att1', att_name='a.bin')
+        self.assertEqual(content, b'attachment-att1')
+
+    async def test_download_attachment_raises_on_http_error_status(self):
+        self.api.token = 'expired'
+        with self.assertRaises(Exception) as ctx:
+            await self.api.download_attachment('doc1', 'att1', att_name='a.bin')
+        self.assertIn('下载附件失败', str(ctx.exception))
+
+    async def test_get_collaboration_content_over_websocket(self):
+        token = await self.api.get_collaboration_token('doc1')
+        content = await self.api.get_collaboration_content(token, 'doc1')
+        self.assertEqual(json.loads(content)['d'], 'doc1')
+
+    async def test_download_attachment_to_file(self):
+        import tempfile
+
+        with tempfile.TemporaryFile() as file:
+            downloaded = await self.api.download_attachment_to(file, 'doc1', 'att1', att_name='a.bin')
+            file.seek(0)
+            self.assertEqual(file.read(), b'attachment-att1')
+        self.assertEqual(downloaded, len(b'attachment-att1'))
+
+    async def test_collaboration_token_is_cached(self):
+        await self.api.get_collaboration_token('doc1')
+        await self.api.get_collaboration_token('doc1')
+        self.assertEqual(self.server.token_requests, 1)
+
+        self.api.invalidate_collaboration_token('doc1')
+        await self.api.get_collaboration_token('doc1')
+        self.assertEqual(self.server.token_requests, 2)
+
+    async def test_collaboration_content_deadline(self):
+        self.server.silent_docs.add('slow')
+        self.api.COLLABORATION_REQUEST_TIMEOUT_S = 0.5
+
+        start = time.monotonic()
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.api.get_collaboration_content('editor-slow', 'slow')
+        self.assertLess(time.monotonic() - start, 3)
+
+    async def test_rejected_handshake_raises(self):
+        from sync.collaboration_editor_session import HandshakeRejected
+
+        with self.assertRaises(HandshakeRejected):
+            await self.api.get_collaboration_content('wrong-token', 'doc1')
+
+    async def test_stale_collaboration_token_is_refreshed(self):
+        from sync.note_synchronizer import NoteSynchronizer
+
+        syncer = NoteSynchronizer(api_client=MagicMock(), db=MagicMock())
+        self.api.collaboration_tokens.get_or_fetch('doc1', lambda: 'stale')
+
+        content, _ = await syncer._get_note_origin_content_async(self.api, 'collaboration', 'doc1')
+
+        self.assertEqual(json.loads(content)['d'], 'doc1')
+        self.assertEqual(self.server.token_requests, 1)
+        # 重新获取的 token 留在缓存中, 之后下载图片时复用
+        self.assertEqual(await self.api.get_collaboration_token('doc1'), 'editor-doc1')
+        self.assertEqual(self.server.token_requests, 1)
+
+    async def test_synchronize_notes_async_fetches_origin_content(self):
+        from sync.note_synchronizer import NoteSynchronizer
+
+        db = MagicMock()
+        db.get_sync_watermark.return_value = None
+        records = [{'id': i + 1, 'doc_guid': f'doc{i}', 'type': 'document', 'title': 't'} for i in range(5)]
+        db.get_unsync_note_list.side_effect = [records, []]
+
+        syncer = NoteSynchronizer(api_client=MagicMock(), db=db, workers=2)
+        synced = {}
+        syncer._sync_single_note_to_local = (
+            lambda record, origin_content=None, note_detail=None: synced.update({record['doc_guid']: origin_content})
+        )
+
+        await syncer.synchronize_notes_async(self.api)
+
+        self.assertEqual(sorted(synced), [record['doc_guid'] for record in records])
+        self.assertIn('doc3', synced['doc3'])
+        syncer.api_client.get_note_detail.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+
+class TestBlobStore(unittest.TestCase):
+
+    def setUp(self):
+        from sync.blob_store import BlobStore
+        from sync.database import Database
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db = Database(os.path.join(self.tmp_dir.name, 'sync.db'))
+        self.db.__enter__()
+        self.addCleanup(self.db.__exit__, None, None, None)
+        self.db.init()
+        self.store = BlobStore(os.path.join(self.tmp_dir.name, 'blobs'), self.db)
+
+    def _write(self, relative_path, content):
+        path = os.path.join(self.tmp_dir.name, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(content)
+        return path
+
+    def test_same_content_is_stored_once(self):
+        first = self._write('a/attachments/logo.png', b'logo')
+        second = self._write('b/attachments/logo.png', b'logo')
+
+        sha_first = self.store.ingest('image:doc1/logo.png', first)
+        sha_second = self.store.ingest('image:doc2/logo.png', second)
+
+        self.assertEqual(sha_first, sha_second)
+        self.assertTrue(os.path.samefile(first, second))
+        self.assertTrue(os.path.samefile(first, self.store.blob_path(sha_first)))
+        self.assertEqual(self.store.stats(), {'blobs_stored': 1, 'blobs_reused': 1, 'disk_bytes_saved': 4})
+
+    def test_known_resource_is_linked_without_download(self):
+        first = self._write('a/attachments/report.pdf', b'report')
+        self.store.ingest('attachment:doc1/att1', first)
+
+        dest = os.path.join(self.tmp_dir.name, 'c', 'attachments', 'report.pdf')
+        self.assertTrue(self.store.link_known('attachment:doc1/att1', dest))
+        self.assertFalse(self.store.link_known('attachment:doc1/att2', dest + '.2'))
+
+        with open(dest, 'rb') as file:
+            self.assertEqual(file.read(), b'report')
+        self.assertEqual(self.store.stats()['downloads_skipped'], 1)
+        self.assertEqual(self.store.stats()['download_bytes_saved'], 6)
+
+    def test_missing_blob_needs_download(self):
+        first = self._write('a/attachments/report.pdf', b'report')
+        sha = self.store.ingest('attachment:doc1/att1', first)
+        os.remove(self.store.blob_path(sha))
+
+        self.assertFalse(self.store.link_known('attachment:doc1/att1', first))
+
+    def test_copy_when_hardlink_unsupported(self):
+        first = self._write('a/attachments/report.pdf', b'report')
+        with patch('sync.blob_store.os.link', side_effect=OSError('cross-device link')):
+            sha = self.store.ingest('attachment:doc1/att1', first)
+
+        self.assertFalse(os.path.samefile(first, self.store.blob_path(sha)))
+        with open(self.store.blob_path(sha), 'rb') as file:
+            self.assertEqual(file.read(), b'report')
+
+
+class TestNoteSynchronizerBlobStore(unittest.TestCase):
+
+    def setUp(self):
+        from sync.blob_store import BlobStore
+        from sync.database import Database
+        from sync.file_manager import FileManager
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        patcher = patch.object(FileManager, 'get_app_root', return_value=self.tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db = Database(os.path.join(self.tmp_dir.name, 'sync.db'))
+        self.db.__enter__()
+        self.addCleanup(self.db.__exit__, None, None, None)
+        self.db.init()
+        self.blob_store = BlobStore(FileManager.get_blob_directory(), self.db)
+
+    def test_attachment_downloaded_once_across_resyncs(self):
+        from sync.note_synchronizer import NoteSynchronizer
+        from sync.parsed_note import ParsedNote
+
+        syncer = NoteSynchronizer(api_client=MagicMock(), db=self.db, blob_store=self.blob_store)
+        syncer.api_client.get_note_attachments.return_value = [{'attGuid': 'att1', 'name': 'a.pdf'}]
+        syncer.api_client.download_attachment_to.side_effect = (
+            lambda out, doc_guid, att_guid, att_name=None: out.write(b'pdf')
+        )
+
+        for category in ('/cat1/', '/cat2/'):
+            record = {'doc_guid': 'doc1', 'category': category}
+            self.assertIsNone(syncer._process_normal_note_attachments(record, ParsedNote('hello', [])))
+
+        self.assertEqual(syncer.api_client.download_attachment_to.call_count, 1)
+        first = os.path.join(self.tmp_dir.name, 'output', 'note', 'cat1', 'attachments', 'a.pdf')
+        second = os.path.join(self.tmp_dir.name, 'output', 'note', 'cat2', 'attachments', 'a.pdf')
+        self.assertTrue(os.path.samefile(first, second))
+
+
+if __name__ == '__main__':
+    unittest.main()
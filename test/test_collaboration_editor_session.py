@@ -0,0 +1,189 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+from aiohttp import web, WSMsgType
+
+
+class _EditorStandInServer:
+    """
+    协作笔记编辑器的本地替身, 在后台线程的事件循环中运行
+    """
+
+    def __init__(self):
+        self.connections = 0
+        # 在每条连接上完成第 n 次 f 请求后断开连接
+        self.drop_after_fetches = None
+        # 不响应这些笔记的 f 请求
+        self.silent_docs = set()
+        # 这些笔记的 f 响应带有 error
+        self.error_docs = set()
+        # 在其他笔记建立的连接上请求时的响应: None 正常返回, 'error' 返回 error, 'silent' 不响应
+        self.foreign_doc_reply = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.runner = None
+        self.base_url = ''
+
+    def start(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get('/editor/{kb}/{doc}', self.editor)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.base_url = f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+    async def editor(self, request):
+        self.connections += 1
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_str(json.dumps({'a': 'init', 'protocol': 1}))
+        fetches = 0
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                break
+            data = json.loads(msg.data)
+            if data['a'] == 'hs':
+                if data['auth']['token'] != f"editor-{data['auth']['docId']}":
+                    await ws.send_str(json.dumps({'a': 'hs', 'error': {'code': 4001, 'message': 'bad token'}}))
+                else:
+                    await ws.send_str(json.dumps({'a': 'hs', 'id': 'session'}))
+            elif data['a'] == 'f':
+                foreign = data['d'] != request.match_info['doc']
+                if data['d'] in self.silent_docs or (foreign and self.foreign_doc_reply == 'silent'):
+                    continue
+                await ws.send_str(json.dumps({'a': 'p', 'd': data['d']}))
+                # 与编辑器一致, data 在 a / d 之前
+                reply = {'data': {'v': 1, 'data': {'blocks': [{'text': ['}', ']']}]}},
+                         'a': 'f', 'c': data['c'], 'd': data['d']}
+                if data['d'] in self.error_docs or (foreign and self.foreign_doc_reply == 'error'):
+                    reply['error'] = {'code': 4004, 'message': 'not found'}
+                await ws.send_str(json.dumps(reply))
+                fetches += 1
+                if self.drop_after_fetches and fetches >= self.drop_after_fetches:
+                    await ws.close()
+                    break
+        return ws
+
+
+class TestCollaborationEditorSession(unittest.TestCase):
+
+    def setUp(self):
+        self.server = _EditorStandInServer()
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _make_session(self, **kwargs):
+        from sync.collaboration_editor_session import CollaborationEditorSession
+
+        return CollaborationEditorSession(self.server.base_url, 'kb_guid', 'user_guid', **kwargs)
+
+    def test_fetches_many_documents_over_one_connection(self):
+        session = self._make_session(pool_size=1)
+        try:
+            for i in range(5):
+                content = session.fetch(f'doc{i}', f'editor-doc{i}')
+                self.assertEqual(json.loads(content)['d'], f'doc{i}')
+        finally:
+            session.close()
+
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(session.stats(), {'connections_opened': 1, 'fetches': 5})
+
+    def test_reconnects_when_connection_dropped(self):
+        self.server.drop_after_fetches = 1
+        session = self._make_session(pool_size=1)
+        try:
+            for i in range(3):
+                content = session.fetch(f'doc{i}', f'editor-doc{i}')
+                self.assertEqual(json.loads(content)['d'], f'doc{i}')
+        finally:
+            session.close()
+
+        self.assertEqual(self.server.connections, 3)
+
+    def test_rejected_handshake_raises_after_reconnect(self):
+        from sync.collaboration_editor_session import HandshakeRejected
+
+        session = self._make_session(pool_size=1)
+        try:
+            with self.assertRaises(HandshakeRejected):
+                session.fetch('doc1', 'wrong-token')
+        finally:
+            session.close()
+
+        self.assertEqual(self.server.connections, 2)
+
+    def test_fetch_error_raises(self):
+        from sync.collaboration_editor_session import FetchRejected
+
+        self.server.error_docs.add('missing')
+        session = self._make_session(pool_size=1)
+        try:
+            with self.assertRaisesRegex(FetchRejected, '获取协作笔记内容失败'):
+                session.fetch('missing', 'editor-missing')
+        finally:
+            session.close()
+
+        # 新连接上的失败不重试
+        self.assertEqual(self.server.connections, 1)
+
+    def test_reused_connection_failure_retries_on_fresh_connection(self):
+        for reply in ('error', 'silent'):
+            with self.subTest(reply=reply):
+                self.server.foreign_doc_reply = reply
+                self.server.connections = 0
+                session = self._make_session(pool_size=1, request_timeout_s=0.5)
+                try:
+                    session.fetch('doc0', 'editor-doc0')
+                    content = session.fetch('doc1', 'editor-doc1')
+                finally:
+                    session.close()
+
+                self.assertEqual(json.loads(content)['d'], 'doc1')
+                self.assertEqual(self.server.connections, 2)
+
+    def test_matches_reply_without_decoding_data(self):
+        from sync.collaboration_editor_session import CollaborationEditorSession
+
+        message = '{"data": {"v": 1, "data": {"blocks": [{"text": "]"}], "x": {"}": 1}}}, "a": "f", "c": "kb", "d": "doc1"}'
+        self.assertEqual(CollaborationEditorSession.read_header(message), {'a': 'f', 'd': 'doc1'})
+        for message in ['[{"a": "f"}]', '{"data": {"blocks": [NaNx]}, "a": "f"}', '{"a": "f"} {}']:
+            with self.subTest(message=message):
+                with self.assertRaises(ValueError):
+                    CollaborationEditorSession.read_header(message)
+
+    def test_request_deadline(self):
+        from websocket import WebSocketTimeoutException
+
+        self.server.silent_docs.add('slow')
+        session = self._make_session(pool_size=1, request_timeout_s=0.5)
+        try:
+            start = time.monotonic()
+            with self.assertRaises(WebSocketTimeoutException):
+                session.fetch('slow', 'editor-slow')
+            self.assertLess(time.monotonic() - start, 3)
+
+            # 超时的连接被丢弃, 之后的请求重新建立连接
+            content = session.fetch('doc1', 'editor-doc1')
+            self.assertEqual(json.loads(content)['d'], 'doc1')
+        finally:
+            session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import unittest
+from unittest.mock import patch
+
+from sync.collaboration_note_parser import CollaborationNoteParser, DocumentRenderer, MarkdownConverter, TextStrategy
+
+_TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _comment(group_id, name, text, created=1700000000000):
+    return {'groupId': group_id, 'displayName': name, 'created': created, 'blocks': [{'text': [{'insert': text}]}]}
+
+
+def _commented_block(text, comment_id):
+    return {'type': 'text', 'text': [{'insert': text, 'attributes': {f'comment-{comment_id}': comment_id}}]}
+
+
+def _mixed_document_data():
+    snapshot = json.dumps({'blocks': [{'type': 'text', 'text': [{'insert': 'in snapshot'}]},
+                                      {'type': 'list', 'level': 2, 'checkbox': 'checked', 'text': [{'insert': 'done'}]}]})
+    data = {
+        'comments': {'c1': _comment('g1', 'alice', 'main'), 'c2': _comment('g1', 'bob', 'reply')},
+        'cell-1': [{'text': [{'insert': 'h1'}]}], 'cell-2': [{'text': []}],
+        'cell-3': [{'text': [{'insert': 'v1'}]}], 'cell-4': [{'text': [{'insert': 'v2'}]}],
+        'code-1': [{'text': [{'insert': 'print(1)'}]}, {'text': []}],
+    }
+    data['blocks'] = [
+        _commented_block('title', 'c1'),
+        {'type': 'text', 'heading': 2, 'text': [{'insert': 'h'}, {'insert': 'b', 'attributes': {'style-bold': True}}]},
+        {'type': 'list', 'level': 1, 'ordered': True, 'start': 3, 'text': [{'insert': 'third'}]},
+        {'type': 'table', 'cols': 2, 'rows': 2, 'children': ['cell-1', 'cell-2', 'cell-3', 'cell-4']},
+        {'type': 'code', 'language': 'python', 'children': ['code-1']},
+        {'type': 'embed', 'embedType': 'snapshot', 'embedData': {'doc': snapshot}},
+        {'type': 'embed', 'embedType': 'hr', 'embedData': {}},
+        {'type': 'embed', 'embedType': 'snapshot', 'embedData': {'doc': snapshot}},
+        {'type': 'embed', 'embedType': 'snapshot', 'embedData': {'doc': '{broken'}},
+        {'type': 'embed', 'embedType': 'snapshot', 'embedData': {}},
+    ]
+    return data
+
+
+class _ScanAllCommentsTextStrategy(TextStrategy):
+    # 分组之前的实现, 作为对照
+    def get_sub_comments(self, group_id, main_comment_id):
+        return [self.format_comment(comment_data) for comment_id, comment_data in self.data.get('comments', {}).items()
+                if comment_data.get('groupId') == group_id and comment_id != main_comment_id]
+
+
+class TestCollaborationComments(unittest.TestCase):
+
+    def _document(self):
+        data = {
+            'blocks': [_commented_block('first', 'c1'), {'type': 'text', 'text': [{'insert': 'plain'}]},
+                       _commented_block('second', 'c4')],
+            'comments': {
+                'c1': _comment('g1', 'alice', 'main 1'),
+                'c2': _comment('g2', 'bob', 'other group'),
+                'c3': _comment('g1', 'carol', 'reply 1'),
+                'c4': _comment('g2', 'dave', 'main 2'),
+                'c5': _comment('g1', 'erin', 'reply 2'),
+            },
+        }
+        return json.dumps({'data': {'data': data}})
+
+    def test_sub_comments_keep_document_order(self):
+        output = CollaborationNoteParser().parse(self._document())
+
+        self.assertLess(output.index('main 1'), output.index('reply 1'))
+        self.assertLess(output.index('reply 1'), output.index('reply 2'))
+        self.assertLess(output.index('reply 2'), output.index('plain'))
+        self.assertLess(output.index('main 2'), output.index('other group'))
+
+    def test_output_matches_scanning_all_comments(self):
+        content = self._document()
+        expected_map = dict(MarkdownConverter.STRATEGY_MAP, text=_ScanAllCommentsTextStrategy)
+        with patch.dict(MarkdownConverter.STRATEGY_MAP, expected_map):
+            expected = CollaborationNoteParser().parse(content)
+
+        self.assertEqual(CollaborationNoteParser().parse(content), expected)
+
+    def test_snapshot_uses_its_own_comments(self):
+        nested = {'blocks': [_commented_block('nested', 'n1')],
+                  'comments': {'n1': _comment('ng', 'frank', 'nested main'), 'n2': _comment('ng', 'gina', 'nested reply')}}
+        data = {'blocks': [{'type': 'embed', 'embedType': 'snapshot', 'embedData': {'doc': json.dumps(nested)}}],
+                'comments': {'c1': _comment('ng', 'henry', 'outer')}}
+
+        output = CollaborationNoteParser().parse(json.dumps({'data': {'data': data}}))
+
+        self.assertIn('nested reply', output)
+        self.assertNotIn('outer', output)
+
+    def test_single_block_uses_document_comments(self):
+        data = json.loads(self._document())['data']['data']
+
+        text = MarkdownConverter.to_text(data, data['blocks'][0])
+
+        self.assertIn('reply 2', text)
+
+
+class TestDocumentRenderer(unittest.TestCase):
+
+    def test_output_matches_converting_block_by_block(self):
+        data = _mixed_document_data()
+        expected = ''.join(MarkdownConverter.to_text(data, block_row) for block_row in data['blocks'])
+
+        output = DocumentRenderer(data).render(data['blocks'])
+
+        self.assertEqual(output, expected)
+        self.assertIn('|h1||\n| ----- | ----- |\n|v1|v2|\n', output)
+        self.assertEqual(output.count('> in snapshot'), 2)
+
+    def test_identical_snapshots_are_parsed_once(self):
+        data = _mixed_document_data()
+        with patch('sync.collaboration_note_parser.json.loads', wraps=json.loads) as loads:
+            DocumentRenderer(data).render(data['blocks'])
+
+        # 两个相同的快照和一个解析失败的快照
+        self.assertEqual(loads.call_count, 2)
+
+    def test_unsupported_block_type_raises(self):
+        with self.assertRaises(Exception):
+            DocumentRenderer({}).render([{'type': 'unknown'}])
+
+
+class TestIncrementalDecode(unittest.TestCase):
+
+    def _parse_both(self, content):
+        expected = CollaborationNoteParser().parse(content)
+        with patch.object(CollaborationNoteParser, 'INCREMENTAL_DECODE_MIN_CHARS', 0), \
+                patch.object(CollaborationNoteParser, '_parse_incremental',
+                             wraps=CollaborationNoteParser._parse_incremental) as parse_incremental:
+            output = CollaborationNoteParser().parse(content)
+        self.assertEqual(parse_incremental.call_count, 1)
+        return output, expected
+
+    def test_output_matches_full_decode(self):
+        with open(os.path.join(_TEST_DIR, 'wss.json'), encoding='utf-8') as file:
+            contents = [file.read()]
+        contents.append(json.dumps({'a': 'f', 'data': {'v': 1, 'data': _mixed_document_data()}}, indent=2))
+        for content in contents:
+            output, expected = self._parse_both(content)
+            self.assertEqual(output, expected)
+
+    def test_invalid_documents_raise(self):
+        with self.assertRaises(KeyError):
+            CollaborationNoteParser._parse_incremental('{"data": {"data": {"comments": {}}}}')
+        with self.assertRaises(KeyError):
+            CollaborationNoteParser._parse_incremental('{"a": "f"}')
+        with self.assertRaises(json.JSONDecodeError):
+            CollaborationNoteParser._parse_incremental('{"data": {"data": {"blocks": [{"type": "text"}')
+
+    def test_large_payload_is_not_logged_in_full(self):
+        text = 'x' * 100000
+        content = json.dumps({'data': {'data': {'blocks': [{'type': 'text', 'text': [{'insert': text}]}]}}})
+
+        with self.assertLogs(level=logging.INFO) as logs:
+            output = CollaborationNoteParser().parse(content)
+
+        self.assertIn(text, output)
+        self.assertTrue(any('sha256=' in line for line in logs.output))
+        self.assertLess(sum(len(line) for line in logs.output), 5000)
+
+
+if __name__ == '__main__':
+    unittest.main()
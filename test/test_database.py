@@ -10,4 +10,323 @@
 #
 #
 # if __name__ == '__main__':
-#     unittest.main()
\ No newline at end of file
+#     unittest.main()
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from sync.database import Database
+
+
+def _wiz_note(doc_guid, version, title='t'):
+    return {'docGuid': doc_guid, 'type': 'document', 'title': title, 'category': '/cat/',
+            'created': 0, 'accessed': version, 'url': '', 'version': version}
+
+
+class TestDatabaseIncrementalSync(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp_dir.name, 'sync.db')).__enter__()
+        self.db.init()
+
+    def tearDown(self):
+        self.db.__exit__(None, None, None)
+        self.tmp_dir.cleanup()
+
+    def test_watermark_round_trip(self):
+        self.assertIsNone(self.db.get_sync_watermark('kb1'))
+        self.db.set_sync_watermark('kb1', 10)
+        self.db.set_sync_watermark('kb1', 42)
+        self.assertEqual(self.db.get_sync_watermark('kb1'), 42)
+        # 每个知识库单独记录
+        self.assertIsNone(self.db.get_sync_watermark('kb2'))
+
+    def test_two_knowledge_bases_share_database(self):
+        from unittest.mock import MagicMock
+        from sync.note_synchronizer import NoteSynchronizer
+
+        def list_notes(kb_notes):
+            return lambda start_version, count: [note for note in kb_notes if note['version'] >= start_version][:count]
+
+        personal = MagicMock(kb_guid='personal')
+        personal.get_note_list.side_effect = list_notes([_wiz_note('p1', 100), _wiz_note('p2', 200)])
+        group = MagicMock(kb_guid='group')
+        # 群组笔记的版本号低于个人知识库已同步到的版本号
+        group.get_note_list.side_effect = list_notes([_wiz_note('g1', 5), _wiz_note('g2', 50)])
+
+        for api_client in (personal, group, personal):
+            NoteSynchronizer(api_client=api_client, db=self.db)._sync_from_wiz_to_db()
+
+        self.assertEqual(sorted(row['doc_guid'] for row in self.db.get_unsync_note_list(0, 10)),
+                         ['g1', 'g2', 'p1', 'p2'])
+        self.assertEqual(self.db.get_sync_watermark('personal'), 200)
+        self.assertEqual(self.db.get_sync_watermark('group'), 50)
+        self.assertEqual(personal.get_note_list.call_args_list[-1].args[0], 201)
+
+    def test_updated_note_is_marked_for_resync(self):
+        self.db.insert_note_list([_wiz_note('doc1', 1), _wiz_note('doc2', 2)])
+        self.db.update_note_sync_status('doc1', sync_status=True, fail_reason='')
+        self.db.update_note_sync_status('doc2', sync_status=True, fail_reason='')
+
+        resync_count = self.db.mark_updated_notes_for_resync([_wiz_note('doc1', 5, title='new'), _wiz_note('doc2', 2)])
+
+        self.assertEqual(resync_count, 1)
+        unsync = self.db.get_unsync_note_list(0, 10)
+        self.assertEqual([row['doc_guid'] for row in unsync], ['doc1'])
+        self.assertEqual(unsync[0]['title'], 'new')
+
+    def test_record_without_version_is_resynced_once(self):
+        # 引入版本号之前同步的记录
+        self.db.insert_note_list([dict(_wiz_note('doc1', 1), version=None)])
+        self.db.update_note_sync_status('doc1', sync_status=True, fail_reason='')
+
+        self.assertEqual(self.db.mark_updated_notes_for_resync([_wiz_note('doc1', 7, title='new')]), 1)
+        unsync = self.db.get_unsync_note_list(0, 10)
+        self.assertEqual([(row['doc_guid'], row['title'], row['prev_title']) for row in unsync], [('doc1', 'new', 't')])
+
+        self.db.update_note_sync_status('doc1', sync_status=True, fail_reason='')
+        self.assertEqual(self.db.mark_updated_notes_for_resync([_wiz_note('doc1', 7, title='new')]), 0)
+
+    def _prev_path(self, doc_guid):
+        return self.db.conn.execute('SELECT prev_title, prev_category FROM note_sync_rec WHERE doc_guid = ?',
+                                    (doc_guid,)).fetchone()
+
+    def test_renamed_note_records_previous_path(self):
+        self.db.insert_note_list([_wiz_note('doc1', 1, title='a'), _wiz_note('doc2', 1, title='b')])
+        self.db.update_note_sync_status('doc1', sync_status=True, fail_reason='')
+
+        self.db.mark_updated_notes_for_resync([_wiz_note('doc1', 2, title='a2'), _wiz_note('doc2', 2, title='b2')])
+        # 还没有重新写入时再次改名, 保留最早写入过的路径
+        self.db.mark_updated_notes_for_resync([_wiz_note('doc1', 3, title='a3')])
+
+        self.assertEqual(tuple(self._prev_path('doc1')), ('a', '/cat/'))
+        # 从未写入过本地的笔记没有旧文件
+        self.assertEqual(tuple(self._prev_path('doc2')), (None, None))
+        self.assertEqual(self.db.get_unsync_note_list(0, 10)[0]['prev_title'], 'a')
+
+        self.db.clear_note_previous_path('doc1')
+        self.assertEqual(tuple(self._prev_path('doc1')), (None, None))
+
+    def test_note_path_used_by_other_note(self):
+        self.db.insert_note_list([_wiz_note('doc1', 1, title='a'), _wiz_note('doc2', 1, title='b')])
+
+        self.assertTrue(self.db.is_note_path_used('/cat/', 'b', 'doc1'))
+        self.assertFalse(self.db.is_note_path_used('/cat/', 'b', 'doc2'))
+
+    def test_init_is_idempotent(self):
+        self.db.init()
+        self.db.insert_note_list([_wiz_note('doc1', 1)])
+        self.assertEqual(self.db.get_note_count(), 1)
+
+
+class TestDatabaseBulkLookups(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp_dir.name, 'sync.db'))
+        self.db.__enter__()
+        self.db.init()
+
+    def tearDown(self):
+        self.db.__exit__(None, None, None)
+        self.tmp_dir.cleanup()
+
+    def test_pending_notes_exclude_existing(self):
+        self.db.insert_note_list([_wiz_note('doc1', 1), _wiz_note("it's", 2)])
+
+        pending = self.db.get_pending_sync_note_list([_wiz_note('doc1', 1), _wiz_note("it's", 2), _wiz_note('doc3', 3)])
+
+        self.assertEqual([note['docGuid'] for note in pending], ['doc3'])
+
+    def test_lookups_are_chunked_under_variable_limit(self):
+        notes = [_wiz_note(f'doc{i}', i) for i in range(2500)]
+        self.db.insert_note_list(notes[:1200])
+
+        pending = self.db.get_pending_sync_note_list(notes)
+
+        self.assertEqual(len(pending), 1300)
+        self.assertEqual(pending[0]['docGuid'], 'doc1200')
+
+    def test_uploaded_images_with_quotes_in_file_name(self):
+        names = ["a'b.png", 'c.png'] + [f'{i}.png' for i in range(1000)]
+        for name in names[:1001]:
+            self.db.create_image_upload_record("doc'1", name)
+
+        uploaded = self.db.get_uploaded_images("doc'1", names)
+
+        self.assertEqual(len(uploaded), 1001)
+        self.assertIn("a'b.png", uploaded)
+        self.assertEqual(self.db.get_uploaded_images("doc'1", []), [])
+
+    def test_unsync_notes_are_paged_by_id(self):
+        self.db.insert_note_list([_wiz_note(f'doc{i}', i) for i in range(10)])
+        self.db.update_note_sync_status('doc1', True, None)
+        self.db.update_note_sync_status('doc4', False, 'error')
+
+        pages, last_id = [], 0
+        while True:
+            page = self.db.get_unsync_note_list(last_id, 4)
+            if not page:
+                break
+            pages.append([note['doc_guid'] for note in page])
+            last_id = page[-1]['id']
+
+        self.assertEqual(pages, [['doc0', 'doc2', 'doc3', 'doc4'], ['doc5', 'doc6', 'doc7', 'doc8'], ['doc9']])
+
+    def test_unsync_page_query_uses_partial_index(self):
+        plan = self.db.conn.execute('EXPLAIN QUERY PLAN SELECT id FROM note_sync_rec '
+                                    'WHERE sync_status in (0, -1) and id > ? ORDER BY id LIMIT ?', (0, 10)).fetchall()
+
+        details = ' '.join(row[-1] for row in plan)
+        self.assertIn('idx_note_sync_rec_unsync_id', details)
+        self.assertNotIn('TEMP B-TREE', details)
+
+
+class TestDatabasePerformanceMode(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'sync.db')
+        self.db = Database(self.db_path, performance_mode=True, commit_every_notes=3, commit_interval_s=3600)
+        self.db.__enter__()
+        self.db.init()
+        self.db.insert_note_list([_wiz_note(f'doc{i}', i) for i in range(5)])
+
+    def tearDown(self):
+        if self.db.conn is not None:
+            self.db.__exit__(None, None, None)
+        self.tmp_dir.cleanup()
+
+    def _synced_count_seen_by_other_connection(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM note_sync_rec WHERE sync_status = 1').fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_wal_and_pragmas_enabled(self):
+        self.assertEqual(self.db.conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(self.db.conn.execute('PRAGMA synchronous').fetchone()[0], 1)
+
+    def test_status_writes_are_committed_every_n_notes(self):
+        self.db.update_note_sync_status('doc0', sync_status=True, fail_reason='')
+        self.db.update_note_sync_status('doc1', sync_status=True, fail_reason='')
+        # 未提交的写入对本连接可见, 对其他连接不可见
+        self.assertEqual(self.db.get_unsync_note_list(0, 10)[0]['doc_guid'], 'doc2')
+        self.assertEqual(self._synced_count_seen_by_other_connection(), 0)
+
+        self.db.update_note_sync_status('doc2', sync_status=True, fail_reason='')
+        self.assertEqual(self._synced_count_seen_by_other_connection(), 3)
+        self.assertEqual(self.db.commit_count, 1)
+
+    def test_status_writes_are_committed_after_interval(self):
+        self.db.commit_interval_s = 0
+        self.db.update_note_sync_status('doc0', sync_status=True, fail_reason='')
+        self.assertEqual(self._synced_count_seen_by_other_connection(), 1)
+
+    def test_pending_writes_flushed_on_exit(self):
+        self.db.update_note_sync_status('doc0', sync_status=True, fail_reason='')
+        self.db.__exit__(None, None, None)
+        self.db.conn = None
+        self.assertEqual(self._synced_count_seen_by_other_connection(), 1)
+
+    def test_listing_writes_keep_pending_status(self):
+        self.db.update_note_sync_status('doc0', sync_status=True, fail_reason='')
+        self.db.insert_note_list([_wiz_note('doc9', 9)])
+        self.assertEqual(self._synced_count_seen_by_other_connection(), 1)
+
+
+class TestDatabaseMigrations(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'sync.db')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _create_legacy_db(self):
+        # 引入版本管理之前的数据库: 没有 version/content_hash 列, 图片记录有重复
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE note_sync_rec (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, doc_guid TEXT NOT NULL UNIQUE, type TEXT, title TEXT NOT NULL,
+                category TEXT, created INTEGER, accessed INTEGER, url TEXT, sync_status INTEGER, fail_reason TEXT,
+                sync_time TEXT, create_time TIMESTAMP, update_time TIMESTAMP
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE note_image_sync_rec (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, doc_guid TEXT NOT NULL, file_name TEXT NOT NULL, upload_url TEXT,
+                created INTEGER, sync_status INTEGER, fail_reason TEXT, sync_time TEXT,
+                create_time TIMESTAMP, update_time TIMESTAMP
+            )
+        ''')
+        conn.executemany(
+            'INSERT INTO note_image_sync_rec (doc_guid, file_name, upload_url, sync_status) VALUES (?, ?, ?, ?)',
+            [('doc1', 'a.png', './images/1.png', 1), ('doc1', 'a.png', None, -1),
+             ('doc1', 'b.png', None, 0), ('doc1', 'b.png', None, -1)],
+        )
+        conn.commit()
+        conn.close()
+
+    def test_fresh_database_is_at_latest_version(self):
+        from sync.db_migrations import MIGRATIONS, get_schema_version
+
+        with Database(self.db_path) as db:
+            db.init()
+            self.assertEqual(get_schema_version(db.conn), MIGRATIONS[-1][0])
+            db.create_image_upload_record('doc1', 'a.png')
+            db.create_image_upload_record('doc1', 'a.png')
+            self.assertEqual(db.conn.execute('SELECT COUNT(*) FROM note_image_sync_rec').fetchone()[0], 1)
+
+    def test_legacy_database_is_upgraded(self):
+        from sync.db_migrations import MIGRATIONS
+
+        self._create_legacy_db()
+
+        with Database(self.db_path) as db:
+            db.init()
+            columns = [row[1] for row in db.conn.execute('PRAGMA table_info(note_sync_rec)')]
+            self.assertIn('version', columns)
+            self.assertIn('content_hash', columns)
+            rows = db.conn.execute(
+                'SELECT file_name, sync_status FROM note_image_sync_rec ORDER BY file_name'
+            ).fetchall()
+            # 已上传的记录优先保留, 否则保留最新的记录
+            self.assertEqual(rows, [('a.png', 1), ('b.png', -1)])
+            self.assertEqual(db.get_uploaded_image_urls('doc1', ['a.png']), {'a.png': './images/1.png'})
+            plan = db.conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM note_image_sync_rec WHERE doc_guid = 'doc1' AND file_name = 'a.png'"
+            ).fetchall()
+            self.assertIn('uk_note_image_sync_rec_doc_file', str(plan))
+
+        # 再次初始化不会重复执行
+        with Database(self.db_path) as db:
+            db.init()
+            self.assertEqual(db.conn.execute('SELECT COUNT(*) FROM schema_version').fetchone()[0], len(MIGRATIONS))
+
+    def test_failed_migration_is_rolled_back(self):
+        from sync.db_migrations import MIGRATIONS, get_schema_version, migrate
+
+        def broken_step(cursor):
+            cursor.execute('CREATE TABLE half_done (x INTEGER)')
+            raise ValueError('boom')
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            migrate(conn)
+            with self.assertRaises(Exception):
+                migrate(conn, MIGRATIONS + [(MIGRATIONS[-1][0] + 1, 'broken', broken_step)])
+            self.assertEqual(get_schema_version(conn), MIGRATIONS[-1][0])
+            tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            self.assertNotIn('half_done', tables)
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
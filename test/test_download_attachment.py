@@ -1,5 +1,6 @@
+import io
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock
 
 from requests.exceptions import ReadTimeout
 
@@ -32,11 +33,12 @@ class TestDownloadAttachment(unittest.TestCase):
         api.kb_server = "https://example.com"
         api.kb_guid = "kb_guid"
         api.token = "token"
+        api.http = MagicMock()
         return api
 
-    @patch("sync.wiz_open_api.requests.get")
-    def test_download_attachment_streaming_success(self, mock_get):
+    def test_download_attachment_streaming_success(self):
         api = self._make_api()
+        mock_get = api.http.get
 
         mock_get.return_value = _FakeResponse(
             status_code=200,
@@ -55,9 +57,9 @@ class TestDownloadAttachment(unittest.TestCase):
         self.assertTrue(called_kwargs.get("stream"))
         self.assertEqual(called_kwargs.get("timeout"), (10, 60))
 
-    @patch("sync.wiz_open_api.requests.get")
-    def test_download_attachment_raises_on_http_error_status(self, mock_get):
+    def test_download_attachment_raises_on_http_error_status(self):
         api = self._make_api()
+        mock_get = api.http.get
 
         mock_get.return_value = _FakeResponse(status_code=500)
 
@@ -66,9 +68,9 @@ class TestDownloadAttachment(unittest.TestCase):
 
         self.assertIn("下载附件失败", str(ctx.exception))
 
-    @patch("sync.wiz_open_api.requests.get")
-    def test_download_attachment_propagates_read_timeout(self, mock_get):
+    def test_download_attachment_propagates_read_timeout(self):
         api = self._make_api()
+        mock_get = api.http.get
 
         mock_get.return_value = _FakeResponse(
             status_code=200,
@@ -80,6 +82,31 @@ class TestDownloadAttachment(unittest.TestCase):
         with self.assertRaises(ReadTimeout):
             api.download_attachment("doc_guid", "att_guid", att_name="file.bin")
 
+    def test_download_attachment_to_writes_each_chunk(self):
+        api = self._make_api()
+        api.http.get.return_value = _FakeResponse(
+            status_code=200,
+            chunks=[b"hello", b"", b"world"],
+        )
+
+        out = io.BytesIO()
+        written = api.download_attachment_to(out, "doc_guid", "att_guid", att_name="file.bin")
+
+        self.assertEqual(written, 10)
+        self.assertEqual(out.getvalue(), b"helloworld")
+
+    def test_get_collaboration_resource_to_sends_editor_token_cookie(self):
+        api = self._make_api()
+        api.http.get.return_value = _FakeResponse(status_code=200, chunks=[b"png"])
+
+        out = io.BytesIO()
+        api.get_collaboration_resource_to(out, "editor", "doc_guid", "a.png")
+
+        self.assertEqual(out.getvalue(), b"png")
+        called_url = api.http.get.call_args[0][0]
+        self.assertTrue(called_url.endswith("/editor/kb_guid/doc_guid/resources/a.png"))
+        self.assertEqual(api.http.get.call_args.kwargs["headers"]["cookie"], "x-live-editor-token=editor")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,88 @@
+import os
+import threading
+import unittest
+
+import html2text
+
+from sync.html_to_markdown import (ENGINES, Html2TextEngine, HtmlToMarkdownEngine, configure_engine, create_engine,
+                                   get_engine, get_engine_config, register_engine)
+
+_TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestHtml2TextEngine(unittest.TestCase):
+
+    def test_default_engine_matches_html2text(self):
+        with open(os.path.join(_TEST_DIR, '1.html'), encoding='utf-8') as file:
+            content = file.read()
+
+        self.assertEqual(create_engine().convert(content), html2text.html2text(content))
+
+    def test_options_are_applied(self):
+        paragraph = '<p>' + ' '.join(['word'] * 40) + '</p>'
+
+        self.assertGreater(create_engine().convert(paragraph).strip().count('\n'), 0)
+        self.assertEqual(create_engine(options={'body_width': 0}).convert(paragraph).strip().count('\n'), 0)
+
+    def test_reused_converter_does_not_keep_previous_document(self):
+        engine = Html2TextEngine(inline_links=False)
+        first = '<p><a href="https://a.example">a</a></p>'
+        second = '<p><a href="https://b.example">b</a></p>'
+
+        engine.convert(first)
+        output = engine.convert(second)
+
+        self.assertEqual(output, Html2TextEngine(inline_links=False).convert(second))
+        self.assertNotIn('a.example', output)
+
+    def test_threads_convert_concurrently(self):
+        engine = create_engine()
+        documents = [f'<p><a href="https://{i}.example">{i}</a></p>' for i in range(8)]
+        outputs = {}
+
+        def convert(index):
+            for _ in range(20):
+                outputs[index] = engine.convert(documents[index])
+
+        threads = [threading.Thread(target=convert, args=(i,)) for i in range(len(documents))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for i, document in enumerate(documents):
+            self.assertEqual(outputs[i], html2text.html2text(document))
+
+    def test_unknown_option_or_engine_raises(self):
+        with self.assertRaises(Exception):
+            create_engine(options={'no_such_option': 1})
+        with self.assertRaises(Exception):
+            create_engine('no-such-engine')
+
+
+class TestEngineRegistry(unittest.TestCase):
+
+    def setUp(self):
+        saved_config = get_engine_config()
+        self.addCleanup(configure_engine, *saved_config)
+
+    def test_registered_engine_is_used_by_html_note_parser(self):
+        from sync.html_note_parser import HtmlNoteParser
+
+        class UpperEngine(HtmlToMarkdownEngine):
+            name = 'upper'
+
+            def convert(self, html):
+                return html.upper()
+
+        register_engine(UpperEngine)
+        self.addCleanup(ENGINES.pop, 'upper')
+        configure_engine('upper')
+
+        self.assertIsInstance(get_engine(), UpperEngine)
+        self.assertEqual(get_engine_config(), ('upper', {}))
+        self.assertEqual(HtmlNoteParser().parse_content('<p>x</p>'), '<P>X</P>')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _EchoTokenHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = (self.headers.get('X-Wiz-Token') or '').encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestWizHttpSession(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _EchoTokenHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive_connections_are_reused(self):
+        from sync.http_session import WizHttpSession
+
+        with WizHttpSession(pool_maxsize=2) as session:
+            session.set_token('token')
+            for _ in range(5):
+                self.assertEqual(session.get(f'{self.base_url}/ks/note').text, 'token')
+
+            stats = session.stats()
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['connections_opened'], 1)
+        self.assertEqual(stats['connections_reused'], 4)
+
+    def test_counts_survive_pool_eviction(self):
+        from sync.http_session import WizHttpSession
+
+        port = self.server.server_address[1]
+        with WizHttpSession(pool_connections=1) as session:
+            # 只缓存一个 host 的连接池, 交替请求两个 host 时每次都会淘汰另一个连接池
+            for _ in range(3):
+                session.get(f'http://127.0.0.1:{port}/a')
+                session.get(f'http://localhost:{port}/b')
+
+            stats = session.stats()
+        self.assertEqual(stats['pools'], 1)
+        self.assertEqual(stats['requests'], 6)
+        self.assertEqual(stats['connections_opened'], 6)
+
+    def test_default_token_can_be_dropped_per_request(self):
+        from sync.http_session import WizHttpSession
+
+        with WizHttpSession() as session:
+            session.set_token('token')
+            self.assertEqual(session.get(f'{self.base_url}/img.png', headers={'X-Wiz-Token': None}).text, '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import json
+import unittest
+
+from sync.json_scanner import JsonScanner, LazyJsonObject
+
+
+class TestJsonScanner(unittest.TestCase):
+
+    def test_members_and_values(self):
+        text = ' { "a" : 1 , "b" : [ {"x": "}"} , [] , "]" ] , "c" : {} } '
+        scanner = JsonScanner(text)
+        result = {}
+        for key in scanner.members():
+            if key == 'b':
+                result[key] = list(scanner.values())
+            elif key == 'c':
+                result[key] = list(scanner.members())
+            else:
+                result[key] = scanner.value()
+        scanner.end()
+
+        self.assertEqual(result, {'a': 1, 'b': [{'x': '}'}, [], ']'], 'c': []})
+
+    def test_resume_from_array_position(self):
+        text = '{"blocks": [1, {"a": 2}], "tail": true}'
+        scanner = JsonScanner(text)
+        for key in scanner.members():
+            if key == 'blocks':
+                blocks_idx = scanner.idx
+            scanner.value()
+
+        self.assertEqual(list(JsonScanner(text, blocks_idx).values()), [1, {'a': 2}])
+
+    def test_invalid_json_raises(self):
+        def scan(text):
+            scanner = JsonScanner(text)
+            for _ in scanner.members():
+                scanner.value()
+            scanner.end()
+
+        for text in ['{"a": 1', '{"a": 1,}', '{a: 1}', '{"a" 1}', '{"a": 1 "b": 2}', '[]']:
+            with self.subTest(text=text):
+                with self.assertRaises(json.JSONDecodeError):
+                    scan(text)
+        with self.assertRaises(json.JSONDecodeError):
+            list(JsonScanner('[1 2]').values())
+
+    def test_extra_data_raises(self):
+        scanner = JsonScanner('{} {}')
+        list(scanner.members())
+
+        with self.assertRaises(json.JSONDecodeError):
+            scanner.end()
+
+    def test_skip_values(self):
+        text = '{"data": {"x": ["}", "\\"]", {"y": [1, {}]}], "z": "a{"}, "s": "[", "n": -1.5, "a": "f"}'
+        scanner = JsonScanner(text)
+        result = {}
+        for key in scanner.members():
+            if key == 'a':
+                result[key] = scanner.value()
+            else:
+                scanner.skip()
+        scanner.end()
+
+        self.assertEqual(result, {'a': 'f'})
+
+    def test_skip_unterminated_raises(self):
+        for text in ['{"data": {"x": [1, 2}', '{"data": {"x": "]}', '{"data": "abc']:
+            with self.subTest(text=text):
+                scanner = JsonScanner(text)
+                with self.assertRaises(json.JSONDecodeError):
+                    for _ in scanner.members():
+                        scanner.skip()
+
+
+class TestLazyJsonObject(unittest.TestCase):
+
+    def test_values_are_decoded_on_access(self):
+        text = '{"a": [1, 2], "b\\u0041": {"c": null}, "d": "x"}'
+        scanner = JsonScanner(text)
+        offsets = {}
+        for key in scanner.members():
+            offsets[key] = scanner.idx
+            scanner.value()
+        lazy = LazyJsonObject(text, offsets, cache_size=1)
+
+        self.assertEqual(dict(lazy), json.loads(text))
+        self.assertIn('bA', lazy)
+        self.assertEqual(lazy.get('missing', 0), 0)
+        with self.assertRaises(KeyError):
+            lazy['missing']
+        self.assertEqual(len(lazy._cache), 1)
+        self.assertIs(lazy['d'], lazy['d'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import random
+import unittest
+
+from sync.lite_note_parser import LiteNoteParser
+
+
+def _lite_note(markdown, head='', before_pre=''):
+    return f'<!DOCTYPE html><html>{head}<body class="wiz">{before_pre}<pre>{markdown}</pre></body></html>'
+
+
+class TestLiteNoteParser(unittest.TestCase):
+
+    def assert_parity(self, origin_content, expect_fast=True):
+        expected = LiteNoteParser._parse_with_soup(origin_content)
+        fast = LiteNoteParser._parse_fast(origin_content)
+        if expect_fast:
+            self.assertIsNotNone(fast)
+        if fast is not None:
+            self.assertEqual(fast, expected)
+        self.assertEqual(LiteNoteParser.parse(origin_content), expected)
+
+    def test_plain_markdown_uses_fast_path(self):
+        self.assert_parity(_lite_note('# 标题\n\n- a\n- b\n\n```python\nprint(1)\n```\n'))
+
+    def test_escaped_characters(self):
+        self.assert_parity(_lite_note('a &lt;b&gt; &amp;&amp; &quot;c&quot; &nbsp;&#38;&#x4E2D; a && b & ;'))
+        self.assert_parity(_lite_note('&amp;lt; &#38;lt; &#38;amp; &#60;tag&#x3E;'))
+
+    def test_first_pre_inside_body(self):
+        self.assert_parity(_lite_note('second', before_pre='<div><pre>first</pre></div>'))
+        self.assert_parity('<html><head></head><BODY><PRE >upper case</PRE></BODY></html>')
+        self.assert_parity('<html><body><pre title="a>b">quoted attribute</pre></body></html>')
+
+    def test_irregular_markup_falls_back(self):
+        cases = [
+            _lite_note('a<br>b<span>c</span>'),
+            _lite_note('x', before_pre='<!-- <pre>comment</pre> -->'),
+            _lite_note('x', head='<head><script>var s = "<body><pre>no</pre>";</script></head>'),
+            _lite_note('Q&A'),
+            _lite_note('&copy; &notit; &apos; &amp'),
+            _lite_note('&#38 &#; &#x;'),
+            _lite_note('&#1;&#127;&#65535;'),
+            '<html><body><pre>not closed',
+            '<html><body><div title="<pre>fake</pre>"><pre>real</pre></div></body></html>',
+            "<html><body><div title='<pre>fake</pre>'><pre>real</pre></div></body></html>",
+            '<html><head><meta content="<body><pre>fake</pre>"></head><body><pre>real</pre></body></html>',
+            '<html><body><div data-x="a<b"><pre>real</pre></div></body></html>',
+        ]
+        for origin_content in cases:
+            with self.subTest(origin_content=origin_content):
+                self.assertIsNone(LiteNoteParser._parse_fast(origin_content))
+                self.assert_parity(origin_content, expect_fast=False)
+
+    def test_missing_body_still_raises(self):
+        with self.assertRaises(AttributeError):
+            LiteNoteParser.parse('<pre>no body</pre>')
+
+    def test_random_documents_match_beautiful_soup(self):
+        rnd = random.Random(20)
+        tokens = list('ab 中\n\r\t;#&<>/"\'=x09AF') + [
+            '&amp;', '&lt;', '&gt;', '&quot;', '&nbsp;', '&#38;', '&#x41;', '&#127;', '&#1;', '&copy;',
+            '&apos;', '&notit;', '&amp', '<b>', '</b>', '<br>', '<!--', '-->', '</pre>', '<pre>', '</body>',
+            '&#x1F600;', '&#65535;',
+        ]
+        before = ['', '<div>', '<!-- c -->', '<p>x</p>', '</body>', '<pre>h</pre>', '<div title="<pre>f</pre>">',
+                  "<i title='<b>'>"]
+        fast_count = 0
+        for _ in range(3000):
+            markdown = ''.join(rnd.choice(tokens) for _ in range(rnd.randint(0, 20)))
+            before_pre = ''.join(rnd.choice(before) for _ in range(rnd.randint(0, 2)))
+            origin_content = _lite_note(markdown, before_pre=before_pre)
+            fast = LiteNoteParser._parse_fast(origin_content)
+            if fast is None:
+                continue
+            fast_count += 1
+            self.assertEqual(fast, LiteNoteParser._parse_with_soup(origin_content), origin_content)
+        self.assertGreater(fast_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import random
+import unittest
+
+import html2text
+
+from benchmark.bench_note_fixer import fix_multi_pass
+from sync.note_fixer import NoteFixer
+
+_TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestNoteFixer(unittest.TestCase):
+
+    def test_golden_outputs(self):
+        cases = [
+            ('#标题\n##二级\n# 已有空格\n#\n', '# 标题\n## 二级\n# 已有空格\n#\n'),
+            ('```\ncode\n\nline\n\n```\n', '```\ncode\nline\n```\n'),
+            ('a\n\n\n\n\n\n\nb', 'a\n\n\n\n\nb'),
+            ('\\- item\n\\- item2', '- item\n- item2'),
+            ('a\n\n \n\n \n\nb', 'a\n\nb'),
+            ('a\n\n \n\n\n \n\nb', 'a\n\n\nb'),
+            ('', ''),
+        ]
+        for content, expected in cases:
+            with self.subTest(content=content):
+                self.assertEqual(NoteFixer.fix(content), expected)
+                self.assertEqual(fix_multi_pass(content), expected)
+
+    def test_same_as_multi_pass_on_fixtures(self):
+        with open(os.path.join(_TEST_DIR, '1.html'), encoding='utf-8') as file:
+            html_markdown = html2text.html2text(file.read())
+        with open(os.path.join(_TEST_DIR, 'co_md.md'), encoding='utf-8') as file:
+            collaboration_markdown = file.read()
+
+        for content in (html_markdown, collaboration_markdown):
+            self.assertEqual(NoteFixer.fix(content), fix_multi_pass(content))
+
+    def test_same_as_multi_pass_on_random_text(self):
+        rnd = random.Random(22)
+        tokens = ['\n', '\n', '\n', '\n', ' ', '  ', '#', '##a', '###b c', '```', '```py', '`x', '\\- x', '- y',
+                  'a', '\t', '中文', '\\-', '\\- ', '#1', '#```']
+        for _ in range(20000):
+            content = ''.join(rnd.choice(tokens) for _ in range(rnd.randint(0, 30)))
+            self.assertEqual(NoteFixer.fix(content), fix_multi_pass(content), repr(content))
+
+
+if __name__ == '__main__':
+    unittest.main()
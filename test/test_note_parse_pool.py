@@ -0,0 +1,56 @@
+import unittest
+from unittest.mock import MagicMock
+
+
+HTML = ('<html><body><h1>title</h1><p>hello <b>wiz</b></p>'
+        '<img src="index_files/a.png"><img src="https://example.com/b.png"></body></html>')
+
+
+class TestNoteParsePool(unittest.TestCase):
+
+    def test_process_pool_result_matches_in_thread(self):
+        from sync.note_parse_pool import NoteParsePool
+
+        with NoteParsePool(0) as in_thread, NoteParsePool(1) as pool:
+            expected = in_thread.parse('document', 't', HTML)
+            parsed = pool.parse('document', 't', HTML)
+
+        self.assertEqual(parsed.content, expected.content)
+        self.assertEqual(parsed.need_upload_images, ['a.png'])
+
+    def test_parse_error_is_raised_in_caller(self):
+        from sync.note_parse_pool import NoteParsePool
+
+        with NoteParsePool(1) as pool:
+            with self.assertRaises(Exception):
+                # 轻量笔记没有 body 时解析失败
+                pool.parse('lite/markdown', 't', '<pre>x</pre>')
+
+    def test_workers_are_spawned_and_log_through_parent(self):
+        from sync.note_parse_pool import NoteParsePool
+
+        with self.assertLogs(level='INFO') as logs:
+            with NoteParsePool(1) as pool:
+                self.assertEqual(pool._executor._mp_context.get_start_method(), 'spawn')
+                pool.parse('collaboration', 't', '{"data": {"data": {"blocks": []}}}')
+
+        self.assertTrue(any('协作笔记解析笔记' in line for line in logs.output))
+
+    def test_synchronizer_parses_in_pool(self):
+        from sync.note_synchronizer import NoteSyncJob, NoteSynchronizer
+        from sync.parsed_note import ParsedNote
+
+        parse_pool = MagicMock()
+        parse_pool.parse.return_value = ParsedNote('md', [])
+        syncer = NoteSynchronizer(api_client=MagicMock(), db=MagicMock(), parse_pool=parse_pool)
+        job = NoteSyncJob({'doc_guid': 'doc1', 'type': 'document', 'title': 't'}, origin_content=HTML)
+
+        syncer._parse_note(job)
+
+        parse_pool.parse.assert_called_once_with('document', 't', HTML)
+        self.assertEqual(job.parsed_note.content, 'md')
+        self.assertIsNone(job.origin_content)
+
+
+if __name__ == '__main__':
+    unittest.main()
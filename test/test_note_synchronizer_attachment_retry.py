@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -5,6 +7,16 @@ from requests.exceptions import ReadTimeout
 
 
 class TestNoteSynchronizerAttachmentRetry(unittest.TestCase):
+    def setUp(self):
+        from sync.file_manager import FileManager
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        patcher = patch.object(FileManager, "get_app_root", return_value=self.tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.attachments_dir = os.path.join(self.tmp_dir.name, "output", "note", "cat", "attachments")
+
     def _make_synchronizer(self):
         from sync.note_synchronizer import NoteSynchronizer
 
@@ -12,18 +24,27 @@ class TestNoteSynchronizerAttachmentRetry(unittest.TestCase):
         db = MagicMock()
         return NoteSynchronizer(api_client=api_client, db=db)
 
-    @patch("sync.note_synchronizer.FileManager.download_attachment_from_byte")
-    def test_normal_attachment_retries_then_succeeds(self, mock_save):
+    def _attachment_files(self):
+        if not os.path.isdir(self.attachments_dir):
+            return []
+        return sorted(os.listdir(self.attachments_dir))
+
+    def test_normal_attachment_retries_then_succeeds(self):
         syncer = self._make_synchronizer()
 
         syncer.api_client.get_note_attachments.return_value = [
             {"attGuid": "att1", "name": "a.bin"}
         ]
-        syncer.api_client.download_attachment.side_effect = [
-            Exception("net1"),
-            Exception("net2"),
-            b"data",
-        ]
+        offsets = []
+
+        def download_attachment_to(out, doc_guid, att_guid, att_name=None):
+            offsets.append(out.offset)
+            if len(offsets) < 3:
+                out.write(b"part")
+                raise Exception(f"net{len(offsets)}")
+            out.write(b"-data")
+
+        syncer.api_client.download_attachment_to.side_effect = download_attachment_to
 
         from sync.parsed_note import ParsedNote
 
@@ -33,18 +54,25 @@ class TestNoteSynchronizerAttachmentRetry(unittest.TestCase):
         fail_reason = syncer._process_normal_note_attachments(record, parsed_note)
 
         self.assertIsNone(fail_reason)
-        self.assertEqual(syncer.api_client.download_attachment.call_count, 3)
-        mock_save.assert_called_once()
+        # 每次重试从上一次已接收的位置继续
+        self.assertEqual(offsets, [0, 4, 8])
+        self.assertEqual(self._attachment_files(), ["a.bin"])
+        with open(os.path.join(self.attachments_dir, "a.bin"), "rb") as file:
+            self.assertEqual(file.read(), b"partpart-data")
         self.assertIn("## 附件", parsed_note.content)
 
-    @patch("sync.note_synchronizer.FileManager.download_attachment_from_byte")
-    def test_normal_attachment_fails_after_retries(self, mock_save):
+    def test_normal_attachment_fails_after_retries(self):
         syncer = self._make_synchronizer()
 
         syncer.api_client.get_note_attachments.return_value = [
             {"attGuid": "att1", "name": "a.bin"}
         ]
-        syncer.api_client.download_attachment.side_effect = ReadTimeout("read timed out")
+
+        def download_attachment_to(out, doc_guid, att_guid, att_name=None):
+            out.write(b"partial")
+            raise ReadTimeout("read timed out")
+
+        syncer.api_client.download_attachment_to.side_effect = download_attachment_to
 
         from sync.parsed_note import ParsedNote
 
@@ -55,15 +83,15 @@ class TestNoteSynchronizerAttachmentRetry(unittest.TestCase):
 
         self.assertIsNotNone(fail_reason)
         self.assertIn("普通笔记附件下载失败", fail_reason)
-        self.assertEqual(syncer.api_client.download_attachment.call_count, 3)
-        mock_save.assert_not_called()
+        self.assertEqual(syncer.api_client.download_attachment_to.call_count, 3)
+        # 只保留未完成的 .part 文件, 下次同步时续传
+        self.assertEqual(self._attachment_files(), [".a.bin.part"])
 
-    @patch("sync.note_synchronizer.FileManager.download_attachment_from_byte")
-    def test_collaboration_attachment_fails_after_retries(self, mock_save):
+    def test_collaboration_attachment_fails_after_retries(self):
         syncer = self._make_synchronizer()
 
         syncer.api_client.get_collaboration_token.return_value = "token"
-        syncer.api_client.get_collaboration_image_byte.side_effect = ReadTimeout("read timed out")
+        syncer.api_client.get_collaboration_resource_to.side_effect = ReadTimeout("read timed out")
 
         from sync.parsed_note import ParsedNote
 
@@ -74,8 +102,28 @@ class TestNoteSynchronizerAttachmentRetry(unittest.TestCase):
 
         self.assertIsNotNone(fail_reason)
         self.assertIn("协作笔记附件下载失败", fail_reason)
-        self.assertEqual(syncer.api_client.get_collaboration_image_byte.call_count, 3)
-        mock_save.assert_not_called()
+        self.assertEqual(syncer.api_client.get_collaboration_resource_to.call_count, 3)
+        self.assertNotIn("a.bin", self._attachment_files())
+
+    def test_collaboration_attachment_streams_to_file(self):
+        syncer = self._make_synchronizer()
+
+        syncer.api_client.get_collaboration_token.return_value = "token"
+        syncer.api_client.get_collaboration_resource_to.side_effect = (
+            lambda out, token, doc_guid, name: out.write(b"collab-" + name.encode())
+        )
+
+        from sync.parsed_note import ParsedNote
+
+        record = {"doc_guid": "doc1", "category": "/cat/"}
+        parsed_note = ParsedNote("[x](wiz-collab-attachment://a.bin)", [])
+
+        fail_reason = syncer._process_collaboration_note_attachments(record, parsed_note)
+
+        self.assertIsNone(fail_reason)
+        with open(os.path.join(self.attachments_dir, "a.bin"), "rb") as file:
+            self.assertEqual(file.read(), b"collab-a.bin")
+        self.assertIn("(./attachments/a.bin)", parsed_note.content)
 
     @patch("sync.note_synchronizer.FileManager.save_md_to_file")
     @patch("sync.note_synchronizer.NoteProperty.from_sync_record")
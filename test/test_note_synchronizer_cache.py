@@ -0,0 +1,247 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+
+class TestNoteDetailCache(unittest.TestCase):
+    def _make_synchronizer(self):
+        from sync.note_synchronizer import NoteSynchronizer
+
+        return NoteSynchronizer(api_client=MagicMock(), db=MagicMock())
+
+    @patch("sync.note_synchronizer.FileManager.download_img_from_url")
+    @patch("sync.note_synchronizer.FileManager.get_not_in_local_img")
+    def test_note_detail_is_downloaded_once_per_note(self, mock_not_in_local, mock_download_img):
+        syncer = self._make_synchronizer()
+        syncer.api_client.get_note_detail.return_value = {
+            "html": "<html></html>",
+            "resources": [{"name": "a.png", "url": "https://example.com/a.png"}],
+        }
+        mock_not_in_local.return_value = ["a.png"]
+        record = {"doc_guid": "doc1", "type": "document", "category": "/cat/"}
+
+        with syncer._note_detail_scope("doc1"):
+            self.assertEqual(syncer._get_note_origin_content("document", "doc1"), "<html></html>")
+            syncer._download_img_if_absent(record, ["a.png"])
+
+        self.assertEqual(syncer.api_client.get_note_detail.call_count, 1)
+        mock_download_img.assert_called_once()
+        self.assertEqual(syncer.run_stats["note_detail_cache_hits"], 1)
+        # 笔记同步结束后释放缓存
+        self.assertEqual(syncer._note_details, {})
+
+    def test_note_detail_not_cached_outside_scope(self):
+        syncer = self._make_synchronizer()
+        syncer.api_client.get_note_detail.return_value = {"html": "x"}
+
+        syncer._get_note_origin_content("document", "doc1")
+        syncer._get_note_origin_content("document", "doc1")
+
+        self.assertEqual(syncer.api_client.get_note_detail.call_count, 2)
+
+
+class TestSharedResourceKeys(unittest.TestCase):
+    def setUp(self):
+        from sync.blob_store import BlobStore
+        from sync.database import Database
+        from sync.file_manager import FileManager
+        from sync.note_synchronizer import NoteSynchronizer
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        patcher = patch.object(FileManager, "get_app_root", return_value=self.tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        db = Database(os.path.join(self.tmp_dir.name, "sync.db"))
+        db.__enter__()
+        self.addCleanup(db.__exit__, None, None, None)
+        db.init()
+        blob_store = BlobStore(os.path.join(self.tmp_dir.name, "blobs"), db)
+        self.syncer = NoteSynchronizer(api_client=MagicMock(), db=db, blob_store=blob_store)
+
+    def test_url_key_ignores_token_parameters(self):
+        from sync.note_synchronizer import NoteSynchronizer
+
+        first = NoteSynchronizer._url_resource_key("https://KS.example.com/res/a.png?objId=a&token=t1&Expires=1")
+        second = NoteSynchronizer._url_resource_key("https://ks.example.com/res/a.png?Expires=2&token=t2&objId=a")
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, NoteSynchronizer._url_resource_key("https://ks.example.com/res/a.png?objId=b"))
+
+    def test_attachment_key_uses_server_md5(self):
+        from sync.note_synchronizer import NoteSynchronizer
+
+        attachment = {"attGuid": "att1", "name": "a.pdf", "dataMd5": "ABC", "dataSize": 3}
+        other_note = dict(attachment, attGuid="att2")
+
+        self.assertEqual(NoteSynchronizer._attachment_resource_key({"doc_guid": "doc1"}, attachment),
+                         NoteSynchronizer._attachment_resource_key({"doc_guid": "doc2"}, other_note))
+        self.assertEqual(NoteSynchronizer._attachment_resource_key({"doc_guid": "doc1"}, {"attGuid": "att1"}),
+                         "attachment:doc1/att1")
+
+    @patch("sync.note_synchronizer.FileManager.get_not_in_local_img")
+    @patch("sync.note_synchronizer.FileManager.download_img_from_url")
+    def test_image_shared_by_notes_is_downloaded_once(self, mock_download_img, mock_not_in_local):
+        from sync.file_manager import FileManager
+
+        def download(record, img_name, url, session=None, path_locked=False):
+            path = os.path.join(FileManager.get_img_directory(record), img_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(b"png")
+
+        mock_download_img.side_effect = download
+        mock_not_in_local.return_value = ["a.png"]
+        for doc_guid, category in (("doc1", "/cat1/"), ("doc2", "/cat2/")):
+            self.syncer.api_client.get_note_detail.return_value = {
+                "resources": [{"name": "a.png", "url": f"https://example.com/a.png?token={doc_guid}"}],
+            }
+            record = {"doc_guid": doc_guid, "type": "document", "category": category}
+            self.syncer._download_img_if_absent(record, ["a.png"])
+
+        self.assertEqual(mock_download_img.call_count, 1)
+        second_path = os.path.join(FileManager.get_img_directory({"category": "/cat2/"}), "a.png")
+        with open(second_path, "rb") as f:
+            self.assertEqual(f.read(), b"png")
+
+
+class TestMovedNoteImages(unittest.TestCase):
+    def setUp(self):
+        from sync.database import Database
+        from sync.file_manager import FileManager
+        from sync.note_synchronizer import NoteSynchronizer
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        patcher = patch.object(FileManager, "get_app_root", return_value=self.tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db = Database(os.path.join(self.tmp_dir.name, "sync.db"))
+        self.db.__enter__()
+        self.addCleanup(self.db.__exit__, None, None, None)
+        self.db.init()
+        self.syncer = NoteSynchronizer(api_client=MagicMock(), db=self.db)
+
+    def _handled_image(self, category, img_file_name, handled_name):
+        from sync.file_manager import FileManager
+
+        img_directory = FileManager.get_img_directory({"category": category})
+        os.makedirs(img_directory, exist_ok=True)
+        with open(os.path.join(img_directory, handled_name), "wb") as f:
+            f.write(b"png")
+        self.db.create_image_upload_record("doc1", img_file_name)
+        self.db.update_img_sync_status("doc1", img_file_name, sync_status=True, fail_reason="",
+                                       upload_url=f"./images/{handled_name}")
+
+    def test_images_follow_note_to_new_category(self):
+        from sync.file_manager import FileManager
+
+        self._handled_image("/cat/", "a.png", "20240101000000000.png")
+        # b.png 的文件已被删除, 需要重新下载
+        self.db.create_image_upload_record("doc1", "b.png")
+        self.db.update_img_sync_status("doc1", "b.png", sync_status=True, fail_reason="",
+                                       upload_url="./images/20240101000000001.png")
+        record = {"doc_guid": "doc1", "type": "document", "title": "t", "category": "/other/",
+                  "prev_title": "t", "prev_category": "/cat/"}
+
+        with patch.object(self.syncer, "_download_and_handle_images") as mock_handle:
+            ret_map = self.syncer._save_img_and_get_url(record, ["a.png", "b.png"])
+
+        self.assertEqual(ret_map, {"a.png": "./images/20240101000000000.png"})
+        mock_handle.assert_called_once_with(record, ["b.png"], ret_map)
+        new_directory = FileManager.get_img_directory(record)
+        self.assertTrue(os.path.exists(os.path.join(new_directory, "20240101000000000.png")))
+        self.assertFalse(os.path.exists(
+            os.path.join(FileManager.get_img_directory({"category": "/cat/"}), "20240101000000000.png")))
+
+    def test_renamed_note_in_same_category_reuses_images(self):
+        self._handled_image("/cat/", "a.png", "20240101000000000.png")
+        record = {"doc_guid": "doc1", "type": "document", "title": "new", "category": "/cat/",
+                  "prev_title": "t", "prev_category": "/cat/"}
+
+        with patch.object(self.syncer, "_download_and_handle_images") as mock_handle:
+            ret_map = self.syncer._save_img_and_get_url(record, ["a.png"])
+
+        self.assertEqual(ret_map, {"a.png": "./images/20240101000000000.png"})
+        mock_handle.assert_called_once_with(record, [], ret_map)
+
+
+class TestWriteNoteIfChanged(unittest.TestCase):
+    def setUp(self):
+        from sync.file_manager import FileManager
+        from sync.note_synchronizer import NoteSynchronizer
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        patcher = patch.object(FileManager, "get_app_root", return_value=self.tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.syncer = NoteSynchronizer(api_client=MagicMock(), db=MagicMock())
+
+    def test_unchanged_note_is_not_rewritten(self):
+        from sync.file_manager import FileManager
+
+        record = {"doc_guid": "doc1", "category": "/cat/", "title": "t", "content_hash": None}
+        self.syncer._write_note_if_changed(record, "body")
+        path = FileManager.get_md_file_path("/cat/", "t")
+        content_hash = hashlib.sha256(b"body").hexdigest()
+        self.syncer.db.update_note_content_hash.assert_called_once_with("doc1", content_hash)
+
+        os.utime(path, (0, 0))
+        record["content_hash"] = content_hash
+        self.syncer._write_note_if_changed(record, "body")
+
+        self.assertEqual(os.path.getmtime(path), 0)
+        self.assertEqual(self.syncer.run_stats["notes_written"], 1)
+        self.assertEqual(self.syncer.run_stats["notes_unchanged_skipped"], 1)
+
+    def test_changed_or_missing_note_is_written(self):
+        from sync.file_manager import FileManager
+
+        record = {"doc_guid": "doc1", "category": "/cat/", "title": "t",
+                  "content_hash": hashlib.sha256(b"body").hexdigest()}
+        # 文件不存在时即使 hash 相同也要写入
+        self.syncer._write_note_if_changed(record, "body")
+        self.syncer._write_note_if_changed(record, "new body")
+
+        with open(FileManager.get_md_file_path("/cat/", "t"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "new body")
+        self.assertEqual(self.syncer.run_stats["notes_written"], 2)
+
+    def test_renamed_note_removes_previous_file(self):
+        from sync.file_manager import FileManager
+        from sync.note_synchronizer import NoteSyncJob
+        from sync.parsed_note import ParsedNote
+
+        self.syncer.db.is_note_path_used.return_value = False
+        record = {"doc_guid": "doc1", "category": "/cat/", "title": "old", "created": 0, "accessed": 0,
+                  "content_hash": None}
+        self.syncer._write_note_if_changed(record, "body")
+        old_path = FileManager.get_md_file_path("/cat/", "old")
+
+        renamed = dict(record, category="/other/", title="new", prev_title="old", prev_category="/cat/")
+        job = NoteSyncJob(renamed)
+        job.parsed_note = ParsedNote("body", [])
+        self.syncer._write_note(job)
+
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(FileManager.get_md_file_path("/other/", "new")))
+        self.syncer.db.clear_note_previous_path.assert_called_once_with("doc1")
+
+    def test_previous_file_used_by_other_note_is_kept(self):
+        from sync.file_manager import FileManager
+
+        self.syncer.db.is_note_path_used.return_value = True
+        record = {"doc_guid": "doc1", "category": "/cat/", "title": "old", "content_hash": None}
+        self.syncer._write_note_if_changed(record, "body")
+
+        self.syncer._remove_previous_note_file(dict(record, title="new", prev_title="old", prev_category="/cat/"))
+
+        self.assertTrue(os.path.exists(FileManager.get_md_file_path("/cat/", "old")))
+        self.syncer.db.clear_note_previous_path.assert_called_once_with("doc1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+
+class TestNoteSynchronizerWorkers(unittest.TestCase):
+    def _make_synchronizer(self, workers):
+        from sync.note_synchronizer import NoteSynchronizer
+
+        return NoteSynchronizer(api_client=MagicMock(), db=MagicMock(), workers=workers)
+
+    def test_sync_note_to_local_runs_records_concurrently(self):
+        syncer = self._make_synchronizer(workers=4)
+
+        lock = threading.Lock()
+        state = {"running": 0, "max_running": 0, "done": []}
+
+        def fake_sync(record):
+            with lock:
+                state["running"] += 1
+                state["max_running"] = max(state["max_running"], state["running"])
+            time.sleep(0.05)
+            with lock:
+                state["running"] -= 1
+                state["done"].append(record["doc_guid"])
+
+        syncer._sync_single_note_to_local = fake_sync
+        records = [{"doc_guid": f"doc{i}"} for i in range(8)]
+
+        syncer._sync_note_to_local(records)
+
+        self.assertEqual(sorted(state["done"]), sorted(r["doc_guid"] for r in records))
+        self.assertGreater(state["max_running"], 1)
+        self.assertLessEqual(state["max_running"], 4)
+
+    def test_sync_note_to_local_single_worker_keeps_order(self):
+        syncer = self._make_synchronizer(workers=1)
+
+        done = []
+        syncer._sync_single_note_to_local = lambda record: done.append(record["doc_guid"])
+        records = [{"doc_guid": f"doc{i}"} for i in range(5)]
+
+        syncer._sync_note_to_local(records)
+
+        self.assertEqual(done, [r["doc_guid"] for r in records])
+
+    def test_workers_do_not_wait_for_slowest_note_of_page(self):
+        syncer = self._make_synchronizer(workers=2)
+        slow_done = threading.Event()
+        started_before_slow_done = []
+
+        def fake_sync(record):
+            if record["doc_guid"] == "slow":
+                time.sleep(0.3)
+                slow_done.set()
+            elif not slow_done.is_set():
+                started_before_slow_done.append(record["doc_guid"])
+
+        syncer._sync_single_note_to_local = fake_sync
+        pages = [[{"doc_guid": "slow"}, {"doc_guid": "a"}], [{"doc_guid": "b"}, {"doc_guid": "c"}]]
+        syncer._iter_unsync_note_pages = lambda: iter(pages)
+
+        syncer._sync_note_to_local(syncer._iter_unsync_records())
+
+        # 第二页的笔记在第一页最慢的笔记完成之前就开始同步
+        self.assertEqual(started_before_slow_done, ["a", "b", "c"])
+
+    def test_in_flight_notes_are_bounded(self):
+        syncer = self._make_synchronizer(workers=2)
+        lock = threading.Lock()
+        state = {"submitted": 0, "finished": 0, "max_in_flight": 0}
+
+        def records():
+            for i in range(20):
+                with lock:
+                    state["submitted"] += 1
+                    state["max_in_flight"] = max(state["max_in_flight"], state["submitted"] - state["finished"])
+                yield {"doc_guid": f"doc{i}"}
+
+        def fake_sync(record):
+            time.sleep(0.01)
+            with lock:
+                state["finished"] += 1
+
+        syncer._sync_single_note_to_local = fake_sync
+
+        syncer._sync_note_to_local(records())
+
+        self.assertEqual(state["finished"], 20)
+        self.assertLessEqual(state["max_in_flight"], 2 * syncer.IN_FLIGHT_PER_WORKER + 1)
+
+    def test_unexpected_error_is_raised(self):
+        syncer = self._make_synchronizer(workers=2)
+
+        def fake_sync(record):
+            if record["doc_guid"] == "doc3":
+                raise RuntimeError("boom")
+
+        syncer._sync_single_note_to_local = fake_sync
+
+        with self.assertRaises(RuntimeError):
+            syncer._sync_note_to_local({"doc_guid": f"doc{i}"} for i in range(10))
+
+
+class TestFileManagerConcurrentWrite(unittest.TestCase):
+    def test_same_category_and_title_never_interleave(self):
+        from sync.file_manager import FileManager
+
+        with tempfile.TemporaryDirectory() as app_root:
+            with patch.object(FileManager, "get_app_root", return_value=app_root):
+                contents = [str(i) * 200000 for i in range(8)]
+                threads = [
+                    threading.Thread(target=FileManager.save_md_to_file, args=("/cat/", "same", content))
+                    for content in contents
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+                note_dir = os.path.join(app_root, "output", "note", "cat")
+                with open(os.path.join(note_dir, "same.md"), encoding="utf-8") as f:
+                    self.assertIn(f.read(), contents)
+                # 临时文件不应残留
+                self.assertEqual(os.listdir(note_dir), ["same.md"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+
+class TestResourceFetcher(unittest.TestCase):
+
+    def test_results_keep_input_order_and_capture_errors(self):
+        from sync.resource_fetcher import ResourceFetcher
+
+        def fetch(item):
+            time.sleep(0.01 * (5 - item))
+            if item == 2:
+                raise ValueError('bad')
+            return item * 10
+
+        results = ResourceFetcher(max_workers=4).fetch_all(range(5), fetch)
+
+        self.assertEqual([item for item, _, _ in results], [0, 1, 2, 3, 4])
+        self.assertEqual([result for _, result, _ in results], [0, 10, None, 30, 40])
+        self.assertIsInstance(results[2][2], ValueError)
+
+    def test_concurrency_is_limited(self):
+        from sync.resource_fetcher import ResourceFetcher
+
+        lock = threading.Lock()
+        state = {'running': 0, 'max_running': 0}
+
+        def fetch(item):
+            with lock:
+                state['running'] += 1
+                state['max_running'] = max(state['max_running'], state['running'])
+            time.sleep(0.05)
+            with lock:
+                state['running'] -= 1
+
+        ResourceFetcher(max_workers=3).fetch_all(range(10), fetch)
+
+        self.assertEqual(state['max_running'], 3)
+
+
+class TestNoteSynchronizerParallelResources(unittest.TestCase):
+
+    def setUp(self):
+        from sync.file_manager import FileManager
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        patcher = patch.object(FileManager, 'get_app_root', return_value=self.tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.record = {'doc_guid': 'doc1', 'type': 'collaboration', 'category': '/cat/'}
+
+    def _make_synchronizer(self, resource_workers):
+        from sync.note_synchronizer import NoteSynchronizer
+
+        syncer = NoteSynchronizer(api_client=MagicMock(), db=MagicMock(), resource_workers=resource_workers)
+        syncer.api_client.get_collaboration_token.return_value = 'token'
+        return syncer
+
+    def test_attachments_are_downloaded_in_parallel_with_failures_aggregated(self):
+        from sync.parsed_note import ParsedNote
+
+        syncer = self._make_synchronizer(resource_workers=8)
+        syncer.ATTACHMENT_DOWNLOAD_RETRY_SLEEP_S = 0
+        syncer.api_client.get_note_attachments.return_value = [
+            {'attGuid': f'att{i}', 'name': f'{i}.bin'} for i in range(8)
+        ]
+
+        def download_attachment_to(out, doc_guid, att_guid, att_name=None):
+            time.sleep(0.2)
+            if att_guid in ('att1', 'att5'):
+                raise Exception('net')
+            out.write(att_guid.encode())
+
+        syncer.api_client.download_attachment_to.side_effect = download_attachment_to
+        parsed_note = ParsedNote('hello', [])
+
+        start = time.monotonic()
+        fail_reason = syncer._process_normal_note_attachments(self.record, parsed_note)
+        elapsed = time.monotonic() - start
+
+        # 逐个下载至少需要 (6 + 2 * 3) * 0.2s
+        self.assertLess(elapsed, 1.5)
+        self.assertEqual(fail_reason, '普通笔记附件下载失败: 1.bin: Exception: net; 5.bin: Exception: net')
+        self.assertEqual(syncer.api_client.download_attachment_to.call_count, 12)
+        self.assertEqual(parsed_note.content.count('- ['), 6)
+
+    def test_collaboration_images_downloaded_while_image_paths_locked(self):
+        from sync.file_manager import FileManager
+
+        syncer = self._make_synchronizer(resource_workers=4)
+        syncer.api_client.get_collaboration_resource_to.side_effect = (
+            lambda out, token, doc_guid, name: out.write(name.encode())
+        )
+        names = [f'{i}.png' for i in range(6)]
+        img_directory = FileManager.get_img_directory(self.record)
+
+        # 同步线程持有图片路径的锁, 下载线程写文件时不能再等待这些锁
+        with FileManager.path_locks([os.path.join(img_directory, name) for name in names]):
+            syncer._download_img_if_absent(self.record, names)
+
+        self.assertEqual(sorted(os.listdir(img_directory)), names)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import os
+import re
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+
+class _AttachmentHandler(BaseHTTPRequestHandler):
+    """
+    附件下载的本地替身: 支持 Range/If-Range, 可以在传输中途断开连接
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        range_header = self.headers.get('Range')
+        server.range_headers.append(range_header)
+        server.if_range_headers.append(self.headers.get('If-Range'))
+
+        data = server.data
+        start = 0
+        match = re.match(r'bytes=(\d+)-', range_header or '')
+        if_range = self.headers.get('If-Range')
+        if match and server.support_range and (if_range is None or if_range == server.etag):
+            start = int(match.group(1))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(data)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(data) - 1}/{len(data)}')
+        else:
+            self.send_response(200)
+        body = data[start:]
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', server.etag)
+        self.end_headers()
+
+        if server.drop_after_bytes is not None:
+            # 只发送一部分内容后断开连接
+            self.wfile.write(body[:server.drop_after_bytes])
+            self.wfile.flush()
+            server.drop_after_bytes = None
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestResumableAttachmentDownload(unittest.TestCase):
+
+    def setUp(self):
+        from sync.file_manager import FileManager
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _AttachmentHandler)
+        self.server.data = os.urandom(300 * 1024)
+        self.server.etag = '"v1"'
+        self.server.support_range = True
+        self.server.drop_after_bytes = None
+        self.server.range_headers = []
+        self.server.if_range_headers = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        patcher = patch.object(FileManager, 'get_app_root', return_value=self.tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.attachments_dir = os.path.join(self.tmp_dir.name, 'output', 'note', 'cat', 'attachments')
+        self.record = {'doc_guid': 'doc1', 'category': '/cat/'}
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _make_api(self):
+        from sync.http_session import WizHttpSession
+        from sync.wiz_open_api import WizOpenApi
+
+        api = WizOpenApi.__new__(WizOpenApi)
+        api.kb_server = f'http://127.0.0.1:{self.server.server_address[1]}'
+        api.kb_guid = 'kb_guid'
+        api.http = WizHttpSession()
+        self.addCleanup(api.http.close)
+        return api
+
+    def _download(self, api):
+        from sync.file_manager import FileManager
+
+        FileManager.download_attachment_resumable(
+            self.record, 'a.bin',
+            lambda out: api.download_attachment_to(out, 'doc1', 'att1', att_name='a.bin'),
+        )
+
+    def _read_attachment(self):
+        with open(os.path.join(self.attachments_dir, 'a.bin'), 'rb') as file:
+            return file.read()
+
+    def test_resumes_after_connection_dropped_mid_stream(self):
+        self.server.drop_after_bytes = 100 * 1024
+
+        with self.assertRaises(Exception):
+            self._download(self._make_api())
+        # 已写入 .part 的是中断前完整读取的分块
+        received = os.path.getsize(os.path.join(self.attachments_dir, '.a.bin.part'))
+        self.assertGreater(received, 0)
+        self.assertLess(received, len(self.server.data))
+        self.assertFalse(os.path.exists(os.path.join(self.attachments_dir, 'a.bin')))
+
+        # 新建客户端模拟重新运行同步
+        self._download(self._make_api())
+
+        self.assertEqual(self._read_attachment(), self.server.data)
+        self.assertEqual(self.server.range_headers, [None, f'bytes={received}-'])
+        self.assertEqual(self.server.if_range_headers, [None, '"v1"'])
+        self.assertEqual(sorted(os.listdir(self.attachments_dir)), ['a.bin'])
+
+    def test_restarts_when_server_ignores_range(self):
+        self.server.drop_after_bytes = 100 * 1024
+        self.server.support_range = False
+        api = self._make_api()
+
+        with self.assertRaises(Exception):
+            self._download(api)
+        self._download(api)
+
+        self.assertEqual(self._read_attachment(), self.server.data)
+        self.assertIsNotNone(self.server.range_headers[1])
+
+    def test_restarts_when_file_changed_on_server(self):
+        self.server.drop_after_bytes = 100 * 1024
+        api = self._make_api()
+
+        with self.assertRaises(Exception):
+            self._download(api)
+        self.server.data = os.urandom(200 * 1024)
+        self.server.etag = '"v2"'
+        self._download(api)
+
+        self.assertEqual(self._read_attachment(), self.server.data)
+
+    def test_completed_part_file_is_finalized(self):
+        from sync.partial_file import PartialFile
+
+        os.makedirs(self.attachments_dir)
+        # 上次运行已接收完整内容, 但在重命名前退出
+        with PartialFile(os.path.join(self.attachments_dir, 'a.bin')) as part:
+            part.write(self.server.data)
+            part.set_validator('"v1"', len(self.server.data))
+
+        self._download(self._make_api())
+
+        self.assertEqual(self._read_attachment(), self.server.data)
+        self.assertEqual(self.server.range_headers, [f'bytes={len(self.server.data)}-'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+import unittest
+
+
+class TestSqlProfiler(unittest.TestCase):
+
+    def test_normalize_groups_statements_by_shape(self):
+        from sync.sql_profiler import SqlProfiler
+
+        self.assertEqual(
+            SqlProfiler.normalize("SELECT doc_guid FROM t1 WHERE doc_guid IN (?, ?,?)\n  AND id > 12 -- 注释"),
+            'SELECT doc_guid FROM t1 WHERE doc_guid IN (?...) AND id > ?',
+        )
+        self.assertEqual(
+            SqlProfiler.normalize("SELECT value FROM sync_meta WHERE key = 'it''s'"),
+            'SELECT value FROM sync_meta WHERE key = ?',
+        )
+
+    def test_summary_orders_by_total_time(self):
+        from sync.sql_profiler import SqlProfiler
+
+        profiler = SqlProfiler(top_n=1)
+        for i in range(1, 21):
+            profiler.record('SELECT * FROM a WHERE id = ?', i / 1000, 1)
+        profiler.record('SELECT * FROM b', 0.001, 5)
+
+        summary = profiler.summary()
+
+        self.assertEqual(len(summary), 1)
+        self.assertEqual(summary[0]['statement'], 'SELECT * FROM a WHERE id = ?')
+        self.assertEqual(summary[0]['count'], 20)
+        self.assertEqual(summary[0]['rows'], 20)
+        self.assertEqual(summary[0]['total_ms'], 210.0)
+        self.assertEqual(summary[0]['p95_ms'], 19.0)
+
+    def test_database_statements_are_profiled_and_written_as_json(self):
+        from sync.database import Database
+        from sync.sql_profiler import SqlProfiler
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = os.path.join(tmp_dir, 'sql.json')
+            profiler = SqlProfiler(json_path=json_path)
+            with Database(os.path.join(tmp_dir, 'sync.db'), profiler=profiler) as db:
+                db.init()
+                db.create_image_upload_record('doc1', 'a.png')
+                db.create_image_upload_record('doc1', 'b.png')
+                self.assertEqual(sorted(db.get_uploaded_images('doc1', ['a.png', 'b.png', 'c.png'])), ['a.png', 'b.png'])
+
+            with open(json_path, encoding='utf-8') as file:
+                summary = {item['statement']: item for item in json.load(file)}
+
+        insert = next(item for shape, item in summary.items() if shape.startswith('INSERT OR IGNORE INTO note_image_sync_rec'))
+        self.assertEqual(insert['count'], 2)
+        self.assertEqual(insert['rows'], 2)
+        select = next(item for shape, item in summary.items() if shape.startswith('SELECT file_name FROM note_image_sync_rec'))
+        self.assertIn('(?...)', select['statement'])
+        self.assertEqual(select['rows'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+
+class TestSyncPipeline(unittest.TestCase):
+
+    def test_items_pass_through_all_stages(self):
+        from sync.sync_pipeline import PipelineStage, SyncPipeline
+
+        done = []
+        lock = threading.Lock()
+
+        def collect(item):
+            with lock:
+                done.append(item)
+
+        pipeline = SyncPipeline([
+            PipelineStage('double', lambda item: item * 2, workers=3),
+            PipelineStage('collect', collect),
+        ], stats_interval_s=0)
+
+        stats = pipeline.run(range(20))
+
+        self.assertEqual(sorted(done), [i * 2 for i in range(20)])
+        self.assertEqual(stats['source']['processed'], 20)
+        self.assertEqual(stats['double']['processed'], 20)
+        self.assertEqual(stats['collect']['processed'], 20)
+
+    def test_slow_stage_bounds_items_in_flight(self):
+        from sync.sync_pipeline import PipelineStage, SyncPipeline
+
+        lock = threading.Lock()
+        state = {'produced': 0, 'finished': 0, 'max_in_flight': 0}
+
+        def source():
+            for i in range(30):
+                with lock:
+                    state['produced'] += 1
+                    state['max_in_flight'] = max(state['max_in_flight'], state['produced'] - state['finished'])
+                yield i
+
+        def slow(item):
+            time.sleep(0.005)
+            with lock:
+                state['finished'] += 1
+
+        pipeline = SyncPipeline([
+            PipelineStage('fast', lambda item: item, workers=2),
+            PipelineStage('slow', slow),
+        ], queue_size=2, stats_interval_s=0)
+
+        stats = pipeline.run(source())
+
+        # 两个队列各 2 个, 加上各阶段线程中处理的和生产者手中的
+        self.assertLessEqual(state['max_in_flight'], 2 + 2 + 2 + 1 + 1)
+        self.assertLessEqual(stats['slow']['queue_max'], 2)
+        self.assertGreater(stats['fast']['blocked_s'], 0)
+        self.assertEqual(state['finished'], 30)
+
+    def test_failed_item_is_reported_and_dropped(self):
+        from sync.sync_pipeline import PipelineStage, SyncPipeline
+
+        def check(item):
+            if item == 3:
+                raise ValueError('bad item')
+            return item
+
+        done = []
+        errors = []
+        pipeline = SyncPipeline([
+            PipelineStage('check', check),
+            PipelineStage('collect', done.append),
+        ], on_error=lambda stage, item, error: errors.append((stage, item, str(error))), stats_interval_s=0)
+
+        stats = pipeline.run(range(5))
+
+        self.assertEqual(done, [0, 1, 2, 4])
+        self.assertEqual(errors, [('check', 3, 'bad item')])
+        self.assertEqual(stats['check']['failed'], 1)
+
+    def test_source_error_raised_after_queued_items_finish(self):
+        from sync.sync_pipeline import PipelineStage, SyncPipeline
+
+        def source():
+            yield 1
+            yield 2
+            raise RuntimeError('list failed')
+
+        done = []
+        pipeline = SyncPipeline([PipelineStage('collect', done.append)], stats_interval_s=0)
+
+        with self.assertRaises(RuntimeError):
+            pipeline.run(source())
+        self.assertEqual(done, [1, 2])
+
+
+class TestNoteSynchronizerPipeline(unittest.TestCase):
+
+    def test_each_note_gets_one_status_update(self):
+        from sync.note_synchronizer import NoteSynchronizer
+
+        syncer = NoteSynchronizer(api_client=MagicMock(), db=MagicMock())
+        records = [{'id': i, 'doc_guid': f'doc{i}', 'title': f't{i}', 'type': 'document'} for i in range(1, 6)]
+        syncer.db.get_unsync_note_list.side_effect = lambda last_id, page_size: [r for r in records if r['id'] > last_id][:2]
+        syncer._sync_from_wiz_to_db = lambda: None
+
+        def parse(job):
+            if job.record['doc_guid'] == 'doc3':
+                raise Exception('parse failed')
+            return job
+
+        syncer._fetch_note_content = lambda job: job
+        syncer._parse_note = parse
+        syncer._handle_note_images = lambda job: job
+        syncer._handle_note_attachments = lambda job: job
+        syncer._write_note = lambda job: job
+
+        stats = syncer.synchronize_notes_pipeline({'content': 2}, queue_size=1)
+
+        calls = {c.args[0]: c.kwargs for c in syncer.db.update_note_sync_status.call_args_list}
+        self.assertEqual(len(syncer.db.update_note_sync_status.call_args_list), 5)
+        self.assertEqual(calls['doc3'], {'sync_status': False, 'fail_reason': 'parse failed'})
+        self.assertEqual(calls['doc1'], {'sync_status': True, 'fail_reason': ''})
+        self.assertEqual(stats['metadata']['processed'], 5)
+        self.assertEqual(stats['content']['workers'], 2)
+        # 流水线结束后不再缓存笔记详情
+        self.assertEqual(syncer._note_details, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+
+class TestTokenCache(unittest.TestCase):
+
+    def test_token_is_fetched_once_until_expired(self):
+        from sync.token_cache import TokenCache
+
+        cache = TokenCache(ttl_s=60)
+        fetch = MagicMock(side_effect=['t1', 't2'])
+
+        self.assertEqual(cache.get_or_fetch('doc1', fetch), 't1')
+        self.assertEqual(cache.get_or_fetch('doc1', fetch), 't1')
+        self.assertEqual(fetch.call_count, 1)
+
+        with patch('sync.token_cache.time.monotonic', return_value=10 ** 9):
+            self.assertEqual(cache.get_or_fetch('doc1', fetch), 't2')
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 2, 'size': 1})
+
+    def test_invalidate(self):
+        from sync.token_cache import TokenCache
+
+        cache = TokenCache()
+        fetch = MagicMock(side_effect=['t1', 't2'])
+        cache.get_or_fetch('doc1', fetch)
+        cache.invalidate('doc1')
+        self.assertEqual(cache.get_or_fetch('doc1', fetch), 't2')
+
+
+class TestCollaborationTokenRefresh(unittest.TestCase):
+
+    def test_token_refreshed_once_on_401(self):
+        from sync.note_synchronizer import NoteSynchronizer
+        from sync.wiz_open_api import WizAuthError
+
+        syncer = NoteSynchronizer(api_client=MagicMock(), db=MagicMock())
+        syncer.api_client.get_collaboration_token.side_effect = ['expired', 'fresh']
+
+        def get_collaboration_content(token, doc_guid):
+            if token == 'expired':
+                raise WizAuthError('401')
+            return 'content'
+
+        syncer.api_client.get_collaboration_content.side_effect = get_collaboration_content
+
+        content = syncer._get_note_origin_content('collaboration', 'doc1')
+
+        self.assertEqual(content, 'content')
+        syncer.api_client.invalidate_collaboration_token.assert_called_once_with('doc1')
+        self.assertEqual(syncer.api_client.get_collaboration_token.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
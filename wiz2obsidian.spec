@@ -18,6 +18,7 @@ a = Analysis(
         'sync.database',
         'sync.config',
         'sync.wiz_open_api',
+        'sync.async_wiz_open_api',
         'log',
         'bs4',
         'html2text',
@@ -25,6 +26,7 @@ a = Analysis(
         'requests',
         'urllib3',
         'websocket',
+        'aiohttp',
         'dotenv',
         'logging.handlers',
     ],